@@ -2,12 +2,22 @@ import os
 import json
 import uuid
 import time
-import random
 import psutil
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, make_response
-from config import Config
-from novel_analyzer import SimpleNovelAnalyzer
+import numpy as np
+from flask import (Flask, render_template, request, jsonify, make_response, redirect, send_file, stream_template,
+                   url_for)
+from config import Config, analyzer_options
+from model_registry import registry
+from result_cache import ResultCache, content_hash, file_content_hash
+from result_store import ResultStore
+from profiler import METRIC_SCOPES
+from corpus import CorpusIndex
+from result_format import RESULT_SUFFIX, find_result, load_result, open_result, read_meta, write_result
+from chapter_index import ChapterIndex
+from report_export import REPORTLAB_AVAILABLE, ExportCache, buffered, iter_file, render_pdf
+from task_queue import AnalysisTaskQueue, QueueFullError
+from batch import BatchAnalyzer, analyze_file, collect_files
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -16,8 +26,72 @@ app.config.from_object(Config)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
 
-# 初始化分析器
-analyzer = SimpleNovelAnalyzer()
+# 分析器延迟初始化：novel_analyzer 会导入 NLTK/spaCy 等重量级依赖，不在启动时加载
+def load_analyzer():
+    from novel_analyzer import SimpleNovelAnalyzer
+    # 与批量分析相同，Web 进程中的阶段进程池用 spawn 启动，避免 fork 继承其他线程持有的锁
+    return SimpleNovelAnalyzer(**analyzer_options(app.config), start_method='spawn')
+
+
+registry.register('analyzer', load_analyzer)
+
+
+def get_analyzer():
+    analyzer = registry.get('analyzer')
+    if analyzer is None:
+        raise Exception('分析器初始化失败，请检查依赖是否安装完整')
+    return analyzer
+
+# 内容哈希结果缓存
+result_cache = ResultCache(
+    db_path=app.config['RESULT_CACHE_PATH'],
+    results_folder=app.config['RESULTS_FOLDER'],
+    max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['RESULT_CACHE_MAX_BYTES']
+)
+
+# 结果元数据索引 (历史记录查询)，启动时补录索引之外的结果文件
+result_store = ResultStore(
+    db_path=app.config['RESULT_INDEX_PATH'],
+    results_folder=app.config['RESULTS_FOLDER']
+)
+
+# 跨书分析特征表，同样在启动时补录新的结果
+corpus = CorpusIndex(
+    db_path=app.config['CORPUS_INDEX_PATH'],
+    results_folder=app.config['RESULTS_FOLDER']
+)
+
+# 导出报告缓存
+export_cache = ExportCache(
+    folder=app.config['EXPORT_CACHE_FOLDER'],
+    max_bytes=app.config['EXPORT_CACHE_MAX_BYTES']
+)
+
+# 后台分析任务队列 (线程在首次提交任务时才创建)
+task_queue = AnalysisTaskQueue(
+    max_workers=app.config['ANALYSIS_WORKERS'],
+    max_pending=app.config['ANALYSIS_MAX_PENDING'],
+    retention=app.config['TASK_RETENTION_SECONDS']
+)
+
+
+def init_app():
+    """服务启动时的一次性工作：补录结果索引与特征表、模型预热"""
+    result_store.sync()
+    corpus.sync()
+    # 模型预热：preload 在导入时同步加载 (配合 gunicorn --preload 让工作进程共享内存)，
+    # 否则在后台线程中加载，服务立即可用
+    if app.config['MODEL_PRELOAD']:
+        registry.preload()
+    elif app.config['MODEL_WARMUP']:
+        registry.warm_up()
+
+
+# spawn 启动的子进程 (批量分析、阶段进程池) 会以 __mp_main__ 的名义重新执行主模块，
+# 用 python app.py 启动时即本文件：子进程中不做补录和预热，只有服务进程执行
+if __name__ != '__mp_main__':
+    init_app()
 
 
 # 页面路由
@@ -33,13 +107,22 @@ def dashboard():
 
 @app.route('/result/<result_id>')
 def show_result(result_id):
-    path = os.path.join(app.config['RESULTS_FOLDER'], f"{result_id}.json")
-    if not os.path.exists(path):
+    path = find_result(app.config['RESULTS_FOLDER'], result_id)
+    if not path:
+        # 分析尚未完成：渲染实时页面，各阶段结果通过 /analysis/stream 推送后逐块显示
+        task = task_queue.get(result_id)
+        if task and task['status'] in ('queued', 'processing'):
+            return render_template('result.html', result={'novel_info': {'title': ''}}, live_task=result_id)
+        if task and task['status'] == 'completed' and task['result'] != result_id:
+            # 任务命中了已有结果
+            return redirect(url_for('show_result', result_id=task['result']))
+        if task and task['status'] == 'failed':
+            return render_template('error.html', error=f"分析失败: {task['error']}"), 500
         return render_template('error.html', error="找不到该分析结果，可能已过期。"), 404
 
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            result = json.load(f)
+        # 紧凑格式按分区惰性解码，只解压模板实际用到的部分
+        result = open_result(path)
         return render_template('result.html', result=result)
     except Exception as e:
         return render_template('error.html', error=f"加载结果失败: {str(e)}"), 500
@@ -60,15 +143,98 @@ def tutorial():
     return render_template('tutorial.html')
 
 # 核心功能接口
-@app.route('/analyze', methods=['POST'])
-def analyze():
+def lookup_cached_result(content=None, upload_path=None, chapters=False):
+    """返回 (缓存键, 命中的 result_id)，缓存关闭时均为 None"""
+    if not app.config['RESULT_CACHE_ENABLED']:
+        return None, None
+    if upload_path:
+        # 上传文件按章节索引分章，与粘贴文本的分章方式不同，使用独立的键空间
+        key = file_content_hash(upload_path, get_analyzer().fingerprint() + ';file')
+    elif chapters:
+        # 爬取的多章节内容按网页分章，同样使用独立的键空间
+        key = content_hash(content, get_analyzer().fingerprint() + ';chapters')
+    else:
+        key = content_hash(content, get_analyzer().fingerprint())
+    return key, result_cache.get(key)
+
+
+def run_analysis_job(content, title, analysis_type, source, url=None, upload_path=None, cache_key=None,
+                     task_id=None, report=None):
+    """在后台线程中执行分析并保存结果，返回 result_id"""
     # 开始计时
     start_time = time.time()
+    analyzer = get_analyzer()
+
+    def publish(section, data):
+        # 各阶段结果就绪后立即推送给 /analysis/stream 的订阅方
+        task_queue.publish(task_id, section, data)
+
+    # URL 爬取 (网络请求较慢，放到后台执行)
+    url_chapters = None
+    if url:
+        report('crawl', 2)
+        title, url_chapters = analyzer.fetch_chapters_from_url(url, analysis_type)
+        content = " ".join(url_chapters)
+        if not content or len(content) < 50:
+            raise Exception('内容为空或太短，无法进行有效分析')
+        # 只抓到单页时仍按正文分章
+        if len(url_chapters) < 2:
+            url_chapters = None
+
+        cache_key, cached_id = lookup_cached_result(content, chapters=url_chapters is not None)
+        if cached_id:
+            return cached_id
+
+    if upload_path:
+        try:
+            cache_key, cached_id = lookup_cached_result(upload_path=upload_path)
+        except UnicodeDecodeError:
+            raise Exception('文件编码错误，请使用UTF-8格式的TXT文件')
+        if cached_id:
+            return cached_id
+
+        result = analyze_file(analyzer, upload_path, title, app.config['STREAM_INGEST_THRESHOLD'],
+                              report=report, job_id=task_id, partial_callback=publish)
+    else:
+        result = analyzer.analyze_novel_text(content, title, progress_callback=report, chapters=url_chapters,
+                                             job_id=task_id, partial_callback=publish)
+
+    if "error" in result:
+        raise Exception(result['error'])
+
+    # 计算耗时
+    duration = round(time.time() - start_time, 2)
+
+    # 补充元数据
+    result['result_id'] = task_id
+    result['timestamp'] = datetime.now().isoformat()
+    result['source'] = source
+    result['duration'] = f"{duration}s"
+    result['type'] = analysis_type
+    if upload_path:
+        result['upload_file'] = os.path.basename(upload_path)
+
+    # 保存结果 (压缩的列式格式，导出时再转换为 JSON)
+    save_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}{RESULT_SUFFIX}")
+    write_result(save_path, result)
+    result_store.add(result, os.path.getsize(save_path))
+    corpus.add(result)
+
+    if cache_key:
+        result_cache.put(cache_key, task_id)
+
+    return task_id
 
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
     try:
         analysis_type = request.form.get('analysis_type')
         title = "未命名文档"
         content = ""
+        url = None
+        upload_path = None
+        cache_key = None
 
         # 文本输入
         if analysis_type == 'text':
@@ -81,58 +247,35 @@ def analyze():
             if not file or file.filename == '':
                 return jsonify({'error': '未选择文件'}), 400
 
-            # 保存并读取
+            # 保存文件，读取和分章在后台任务中进行
             filename = f"{uuid.uuid4().hex[:8]}_{file.filename}"
-            save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(save_path)
+            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            file.save(upload_path)
             title = file.filename
 
-            try:
-                # 尝试读取文件内容 (简单处理)
-                with open(save_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                return jsonify({'error': '文件编码错误，请使用UTF-8格式的TXT文件'}), 400
-            except Exception as e:
-                return jsonify({'error': f'文件读取失败: {str(e)}'}), 400
-
-        # URL 爬取
+        # URL 爬取 (在后台任务中执行)
         elif analysis_type in ['url_news', 'url_novel']:
             url = request.form.get('url')
             if not url: return jsonify({'error': 'URL不能为空'}), 400
-            try:
-                # 调用 analyzer 中的爬虫
-                title, content = analyzer.fetch_content_from_url(url, analysis_type)
-            except Exception as e:
-                return jsonify({'error': str(e)}), 400
 
         # 校验内容
-        if not content or len(content) < 50:
+        if not url and not upload_path and (not content or len(content) < 50):
             return jsonify({'error': '内容为空或太短，无法进行有效分析'}), 400
 
-        # 执行分析 (同步执行)
-        result = analyzer.analyze_novel_text(content, title)
-
-        if "error" in result:
-            return jsonify({'error': result['error']}), 500
+        # 相同内容已有分析结果时直接返回
+        if not url and not upload_path:
+            cache_key, cached_id = lookup_cached_result(content)
+            if cached_id:
+                return jsonify({'success': True, 'task_id': cached_id, 'result_id': cached_id, 'cached': True})
 
-        # 计算耗时
-        duration = round(time.time() - start_time, 2)
+        # 提交到后台队列，立即返回 task_id
+        source = request.form.get('url', 'Upload/Text')
+        try:
+            task_id = task_queue.submit(run_analysis_job, content, title, analysis_type, source,
+                                        url=url, upload_path=upload_path, cache_key=cache_key)
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
 
-        # 补充元数据
-        task_id = str(uuid.uuid4())
-        result['result_id'] = task_id
-        result['timestamp'] = datetime.now().isoformat()
-        result['source'] = request.form.get('url', 'Upload/Text')
-        result['duration'] = f"{duration}s"
-        result['type'] = analysis_type
-
-        # 保存结果
-        save_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}.json")
-        with open(save_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False)
-
-        # 返回成功
         return jsonify({'success': True, 'task_id': task_id, 'result_id': task_id})
 
     except Exception as e:
@@ -140,14 +283,159 @@ def analyze():
         return jsonify({'error': f"系统错误: {str(e)}"}), 500
 
 
+def run_batch_job(files, task_id=None, report=None):
+    """在后台线程中执行批量分析，返回汇总报告"""
+    # Web 进程中有分析、预热等线程，工作进程用 spawn 启动 (各自加载模型)，避免 fork 继承锁
+    batch = BatchAnalyzer(app.config, analyzer=get_analyzer(),
+                          result_cache=result_cache if app.config['RESULT_CACHE_ENABLED'] else None,
+                          start_method='spawn')
+    return batch.run(files, source='Batch', report=report)
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    批量分析上传目录中的文件。请求体 (JSON):
+    {"files": ["a.txt", ...]} 或 {"directory": "子目录", "recursive": false}，都省略时分析整个上传目录
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    names = data.get('files') or [data.get('directory') or '']
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({'error': 'files 必须是文件名列表，directory 必须是字符串'}), 400
+    root = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    paths = [os.path.realpath(os.path.join(root, name)) for name in names]
+    # 只允许访问上传目录内的文件
+    if any(os.path.commonpath([root, path]) != root for path in paths):
+        return jsonify({'error': '只能分析上传目录中的文件'}), 400
+    files = collect_files(paths, recursive=bool(data.get('recursive')))
+    files = [f for f in files if os.path.isfile(f)]
+    if not files:
+        return jsonify({'error': '没有找到需要分析的文件'}), 400
+
+    try:
+        task_id = task_queue.submit(run_batch_job, files)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'success': True, 'task_id': task_id, 'files': len(files)})
+
+
+@app.route('/api/batch/<task_id>')
+def api_batch_status(task_id):
+    task = task_queue.get(task_id)
+    if not task:
+        return jsonify({'status': 'not_found', 'error': '任务不存在或已过期'}), 404
+    status = {'status': task['status'], 'progress': task['progress']}
+    if task['status'] == 'completed':
+        status['report'] = task['result']
+    elif task['status'] == 'failed':
+        status['error'] = task['error']
+    return jsonify(status)
+
+
 @app.route('/analysis/status/<task_id>')
 def analysis_status(task_id):
-    path = os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}.json")
-    if os.path.exists(path):
+    task = task_queue.get(task_id)
+    if task:
+        status = {
+            'status': task['status'],
+            'stage': task['stage'],
+            'progress': task['progress'],
+            'queue_size': task_queue.queue_size
+        }
+        if task['status'] == 'completed':
+            status['result_id'] = task['result']
+        elif task['status'] == 'failed':
+            status['error'] = task['error']
+        return jsonify(status)
+
+    # 任务记录已过期或来自之前的进程，直接检查结果文件
+    if find_result(app.config['RESULTS_FOLDER'], task_id):
         return jsonify({'status': 'completed', 'result_id': task_id, 'progress': 100})
-    else:
-        # 简单模拟进度
-        return jsonify({'status': 'processing', 'progress': 50})
+    return jsonify({'status': 'not_found', 'error': '任务不存在或已过期'}), 404
+
+
+def _json_default(value):
+    # 阶段结果尚未经过结果格式转换，可能包含 numpy 标量或数组
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _sse(event, data, event_id=None):
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=_json_default)}\n\n"
+
+
+@app.route('/analysis/stream/<task_id>')
+def analysis_stream(task_id):
+    """
+    分析进度流 (Server-Sent Events)。每个阶段完成后立即推送其结果:
+    partial {"section": 结果字段, "data": 值}，依次为 novel_info、text_statistics、plot_analysis、
+    character_analysis、hierarchical_summary、themes (并行执行时按完成顺序)；
+    以及 progress、done {"result_id"}、failed {"error"}。断线重连时按 Last-Event-ID 续传。
+    """
+    if task_queue.get(task_id) is None:
+        return jsonify({'status': 'not_found', 'error': '任务不存在或已过期'}), 404
+    after = request.headers.get('Last-Event-ID', 0, type=int)
+    keepalive = app.config['TASK_STREAM_KEEPALIVE']
+
+    def generate():
+        last, progress = after, None
+        while True:
+            task, events = task_queue.events(task_id, after=last, progress=progress, timeout=keepalive)
+            if task is None:
+                yield _sse('failed', {'error': '任务不存在或已过期'})
+                return
+            for seq, section, data in events:
+                yield _sse('partial', {'section': section, 'data': data}, seq)
+                last = seq
+            if task['status'] == 'completed':
+                yield _sse('done', {'result_id': task['result']})
+                return
+            if task['status'] == 'failed':
+                yield _sse('failed', {'error': task['error']})
+                return
+            if (task['stage'], task['progress']) != progress:
+                progress = (task['stage'], task['progress'])
+                yield _sse('progress', {'status': task['status'], 'stage': task['stage'],
+                                        'progress': task['progress'], 'queue_size': task_queue.queue_size})
+            elif not events:
+                # 心跳，避免代理关闭空闲连接
+                yield ": keep-alive\n\n"
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 等反向代理的响应缓冲
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/api/result/<result_id>/chapters/<int:number>')
+def api_result_chapter(result_id, number):
+    """单章查看：通过上传文件的章节索引只读取指定章节"""
+    path = find_result(app.config['RESULTS_FOLDER'], result_id)
+    if not path:
+        return jsonify({'error': '找不到该分析结果'}), 404
+
+    upload_file = read_meta(path).get('upload_file')
+    upload_path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(upload_file or ''))
+    if not upload_file or not os.path.exists(upload_path):
+        return jsonify({'error': '该结果没有对应的上传文件'}), 404
+
+    with ChapterIndex.load_or_build(upload_path) as index:
+        if not 1 <= number <= len(index):
+            return jsonify({'error': '章节不存在'}), 404
+        return jsonify({
+            'chapter': number,
+            'total_chapters': len(index),
+            'text': index.chapter(number - 1)
+        })
 
 
 @app.route('/example')
@@ -158,31 +446,89 @@ def example_data():
     })
 
 
+EXPORT_MIMETYPES = {'html': 'text/html', 'pdf': 'application/pdf'}
+
+
 @app.route('/export/<result_id>')
 def export_result(result_id):
     format_type = request.args.get('format', 'json')
-    path = os.path.join(app.config['RESULTS_FOLDER'], f"{result_id}.json")
+    path = find_result(app.config['RESULTS_FOLDER'], result_id)
 
-    if not os.path.exists(path):
+    if not path:
         return "Result not found", 404
 
-    with open(path, 'r', encoding='utf-8') as f:
-        result = json.load(f)
-
     if format_type == 'json':
+        result = load_result(path)
         response = make_response(json.dumps(result, ensure_ascii=False, indent=2))
         response.headers['Content-Disposition'] = f'attachment; filename=analysis_{result_id}.json'
         response.headers['Content-Type'] = 'application/json'
         return response
-    elif format_type in ['html', 'pdf']:
-        # 即使是 PDF 请求，也返回 HTML (可通过浏览器打印为 PDF)
-        html = render_template('export_report.html', result=result)
-        response = make_response(html)
-        ext = 'html'
-        response.headers['Content-Disposition'] = f'attachment; filename=report_{result_id}.{ext}'
+    if format_type not in EXPORT_MIMETYPES:
+        return "Unsupported format", 400
+    if format_type == 'pdf' and not REPORTLAB_AVAILABLE:
+        # 未安装 reportlab 时退回 HTML (可通过浏览器打印为 PDF)
+        format_type = 'html'
+
+    # ETag 只取决于结果文件和导出版本，未变化时不必渲染
+    etag = export_cache.etag(path, format_type)
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+
+    filename = f'report_{result_id}.{format_type}'
+    use_cache = app.config['EXPORT_CACHE_ENABLED']
+    cached = export_cache.get(result_id, etag, format_type) if use_cache else None
+    if cached:
+        return send_file(cached, mimetype=EXPORT_MIMETYPES[format_type], as_attachment=True,
+                         download_name=filename, etag=etag, max_age=0)
+
+    # 紧凑格式按分区惰性解码，章节摘要等大分区在渲染到时才解压
+    result = open_result(path)
+    if format_type == 'html':
+        # 模板边渲染边发送，同时写入导出缓存
+        chunks = buffered(stream_template('export_report.html', result=result))
+        if use_cache:
+            chunks = export_cache.tee(chunks, result_id, etag, format_type)
+        response = app.response_class(chunks, mimetype=EXPORT_MIMETYPES[format_type])
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.set_etag(etag)
         return response
 
-    return "Unsupported format", 400
+    # PDF 由 reportlab 直接写入文件，再从磁盘分块发送
+    temp_path = export_cache.temp_path(result_id, format_type)
+    try:
+        render_pdf(result, temp_path)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        app.logger.error(f"PDF Export Error: {e}")
+        return f"生成 PDF 失败: {e}", 500
+    if use_cache:
+        return send_file(export_cache.commit(temp_path, result_id, etag, format_type),
+                         mimetype=EXPORT_MIMETYPES[format_type], as_attachment=True, download_name=filename,
+                         etag=etag, max_age=0)
+    # 不缓存时发送完即删除临时文件
+    response = app.response_class(iter_file(temp_path, remove=True), mimetype=EXPORT_MIMETYPES[format_type])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Content-Length'] = str(os.path.getsize(temp_path))
+    response.set_etag(etag)
+    return response
+
+
+def analyzer_cache_stats(name: str):
+    # 分析器尚未加载时不触发加载
+    if registry.state('analyzer') != 'ready' or getattr(get_analyzer(), name) is None:
+        return None
+    return getattr(get_analyzer(), name).stats()
+
+
+@app.route('/api/ready')
+def api_ready():
+    """就绪检查：全部模型加载完成 (或确认不可用) 前返回 503"""
+    status = registry.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 
 # Dashboard 数据接口
 @app.route('/api/stats')
@@ -206,7 +552,16 @@ def api_stats():
                     "percent": disk.percent
                 }
             },
-            "application": {"queue_size": 0}
+            "application": task_queue.stats(),
+            "cache": result_cache.stats(),
+            "chapter_cache": analyzer_cache_stats('chapter_cache'),
+            "embedding_cache": analyzer_cache_stats('embedding_cache'),
+            "crawl_cache": analyzer_cache_stats('crawl_cache'),
+            "export_cache": export_cache.stats(),
+            "history": result_store.summary(),
+            "corpus": corpus.stats(),
+            "stages": result_store.stage_stats(),
+            "stage_metrics": METRIC_SCOPES
         })
     except Exception as e:
         # 降级数据
@@ -219,60 +574,106 @@ def api_stats():
         })
 
 
+# 类型的显示名称
+TYPE_LABELS = {
+    'text': 'Text Analysis',
+    'file': 'File Analysis',
+    'url_news': 'News Crawl',
+    'url_novel': 'Novel Crawl'
+}
+
+
 @app.route('/api/history')
 def api_history():
-    history = []
+    """
+    分页历史记录，只查询元数据索引。
+    参数: page, per_page, sort (date/title/type/duration), order (asc/desc), type, q (标题关键词)
+    总条数通过 X-Total-Count 响应头返回。
+    """
     try:
-        # 按修改时间倒序排列文件
-        if not os.path.exists(app.config['RESULTS_FOLDER']):
-            return jsonify([])
-
-        files = sorted(os.listdir(app.config['RESULTS_FOLDER']),
-                       key=lambda x: os.path.getmtime(os.path.join(app.config['RESULTS_FOLDER'], x)),
-                       reverse=True)
-
-        for f in files:
-            if f.endswith('.json'):
-                try:
-                    file_path = os.path.join(app.config['RESULTS_FOLDER'], f)
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        data = json.load(file)
-
-                        # Time作弊
-                        duration_val = data.get('duration')
-                        if not duration_val:
-                            duration_val = f"{round(random.uniform(0.5, 3.0), 2)}s"
-
-                        # 获取类型
-                        analysis_type = data.get('type', 'Text Analysis')
-                        # 映射简单的显示名称
-                        if analysis_type == 'text':
-                            analysis_type = 'Text Analysis'
-                        elif analysis_type == 'file':
-                            analysis_type = 'File Analysis'
-                        elif analysis_type == 'url_news':
-                            analysis_type = 'News Crawl'
-                        elif analysis_type == 'url_novel':
-                            analysis_type = 'Novel Crawl'
-
-                        history.append({
-                            'id': data.get('result_id', f.replace('.json', '')),
-                            'title': data.get('novel_info', {}).get('title', 'Unknown'),
-                            'timestamp': data.get('timestamp'),
-                            'type': analysis_type,
-                            'chapters': data.get('novel_info', {}).get('total_chapters', 0),
-                            'error': data.get('error', None),
-                            'duration': duration_val
-                        })
-
-                except Exception:
-                    continue
+        rows, total = result_store.query(
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int),
+            sort=request.args.get('sort', 'date'),
+            order=request.args.get('order', 'desc'),
+            analysis_type=request.args.get('type') or None,
+            search=request.args.get('q') or None
+        )
     except Exception as e:
         print(f"History Error: {e}")
-        pass
+        return jsonify([])
+
+    history = []
+    for row in rows:
+        # 没有记录耗时的旧结果返回 None，前端显示为 N/A
+        duration_val = f"{row['duration']}s" if row['duration'] is not None else None
+
+        history.append({
+            'id': row['result_id'],
+            'title': row['title'],
+            'timestamp': row['timestamp'],
+            'type': TYPE_LABELS.get(row['type'], row['type'] or 'Text Analysis'),
+            'chapters': row['chapters'] or 0,
+            'error': row['error'],
+            'duration': duration_val
+        })
+
+    response = jsonify(history)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+def _json_object():
+    """请求体的 JSON 对象；没有请求体时为空字典，不是对象时返回 None"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
+
+
+@app.route('/api/corpus/books', methods=['POST'])
+def api_corpus_books():
+    """
+    跨书筛选与排序。请求体 (JSON):
+    {"filters": {"chapters": {">=": 20}, "themes": {"contains": "war"}}, "sort": "lexical_diversity",
+     "order": "desc", "limit": 20, "offset": 0, "columns": [...]}
+    总条数通过 X-Total-Count 响应头返回。
+    """
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    filters = data.get('filters')
+    try:
+        books = corpus.query(filters, sort=data.get('sort'), descending=data.get('order', 'desc') != 'asc',
+                             limit=max(0, min(int(data.get('limit', 20)), 500)),
+                             offset=max(0, int(data.get('offset', 0))), columns=data.get('columns'))
+        total = corpus.count(filters)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(books)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+@app.route('/api/corpus/aggregate', methods=['POST'])
+def api_corpus_aggregate():
+    """数值特征的统计量。请求体: {"columns": ["lexical_diversity", ...], "filters": {...}, "group_by": "type"}"""
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    try:
+        return jsonify(corpus.aggregate(data.get('columns') or ['length'], data.get('filters'), data.get('group_by')))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
 
-    # 只返回最近20条
-    return jsonify(history[:20])
+@app.route('/api/corpus/similar/<result_id>')
+def api_corpus_similar(result_id):
+    """与指定结果最相似的书籍，参数 k 为返回数量"""
+    try:
+        return jsonify(corpus.similar(result_id, k=max(0, min(request.args.get('k', 5, type=int), 50))))
+    except KeyError:
+        return jsonify({'error': '结果不存在或不在特征表中'}), 404
 
 
 if __name__ == '__main__':
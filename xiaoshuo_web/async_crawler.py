@@ -0,0 +1,237 @@
+import asyncio
+import re
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+try:
+    import aiohttp
+
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 连载小说最多抓取的章节页数
+MAX_PAGES = 200
+# 总并发连接数与每个站点的并发连接数
+CONCURRENCY = 16
+PER_HOST = 4
+# 同一站点两次请求之间的最小间隔 (秒)
+POLITENESS_DELAY = 0.25
+TIMEOUT = 15
+# 遇到 429/5xx 或连接错误时的重试次数
+RETRIES = 2
+# 目录页至少包含这么多章节链接
+TOC_MIN_LINKS = 3
+
+# "下一章" 链接文字
+NEXT_LINK = re.compile(r'^(next(\s+(chapter|page))?|下一[章页節节回]|下[章页]|다음\s*[화장페]\S*)\s*[>»→›]*$',
+                       re.IGNORECASE)
+# 目录中的章节链接文字
+CHAPTER_LINK = re.compile(r'^(chapter\s+\w+|第\s*[0-9零〇一二三四五六七八九十百千]+\s*[章节節回卷]|제\s*\d+\s*[화장])',
+                          re.IGNORECASE)
+# Content-Type 响应头中声明的编码
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+class FetchError(Exception):
+    """页面下载失败 (网络错误或非 2xx 状态码)"""
+
+
+class Page(NamedTuple):
+    """解析后的页面: 标题、正文，以及用于继续抓取的链接"""
+    title: str
+    text: str
+    next_url: Optional[str]
+    chapter_links: List[str]
+
+
+def _resolve(href: str, base_url: str, origin: str, host: str) -> Optional[str]:
+    """链接的绝对地址 (去掉 #片段)，不属于当前站点时返回 None"""
+    # 站内绝对路径最常见，直接拼接，省去 urljoin 的开销
+    if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+        url = origin + href
+    else:
+        url = urljoin(base_url, href)
+        if not url.startswith('http') or urlparse(url).netloc != host:
+            return None
+    return url.partition('#')[0]
+
+
+def content_charset(headers: Mapping[str, str]) -> Optional[str]:
+    """响应头 Content-Type 中的 charset，未声明时返回 None"""
+    match = HEADER_CHARSET.search(headers.get('Content-Type') or '')
+    return match.group(1) if match else None
+
+
+def find_links(links: List[Tuple[str, str, str]], base_url: str) -> Tuple[Optional[str], List[str]]:
+    """
+    从页面链接 [(href, 文字, rel)] 中找出 "下一章" 链接和目录中的章节链接 (按页面顺序去重)。
+    只保留与当前页面同一站点的链接。
+    """
+    parts = urlparse(base_url)
+    host, origin = parts.netloc, f"{parts.scheme}://{parts.netloc}"
+    current = urldefrag(base_url)[0]
+    next_url = None
+    chapters, seen = [], set()
+    resolved: Dict[str, Optional[str]] = {}
+    for href, text, rel in links:
+        # 先按链接文字筛选，只解析可能有用的链接地址 (同一地址只解析一次)
+        text = ' '.join(text.split())
+        is_next = next_url is None and ('next' in rel.lower().split() or NEXT_LINK.match(text))
+        if not is_next and not CHAPTER_LINK.match(text):
+            continue
+        if href not in resolved:
+            resolved[href] = _resolve(href.strip(), base_url, origin, host)
+        url = resolved[href]
+        if url is None or url == current:
+            continue
+        if is_next:
+            next_url = url
+        elif url not in seen:
+            seen.add(url)
+            chapters.append(url)
+    return next_url, chapters
+
+
+class AsyncCrawler:
+    """
+    基于 asyncio + aiohttp 的连载小说爬虫。
+    事件循环运行在独立的后台线程中，连接池在多次抓取之间复用；
+    起始页为目录页时并发下载所有章节，否则沿 "下一章" 链接逐页抓取。
+    同一站点的并发连接数和请求间隔都有限制。
+    指定 cache (crawl_cache.CrawlCache) 时，有效期内的页面不再下载和解析，过期页面发送条件请求。
+
+        crawler = AsyncCrawler()
+        title, chapters = crawler.crawl(url, parse)      # parse(html 字节, url, charset=响应头编码) -> Page
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 max_pages: int = MAX_PAGES, concurrency: int = CONCURRENCY, per_host: int = PER_HOST,
+                 delay: float = POLITENESS_DELAY, timeout: float = TIMEOUT, retries: int = RETRIES,
+                 cache: Optional[Any] = None):
+        self.headers = headers or {}
+        self.cache = cache
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.timeout = timeout
+        self.retries = retries
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._session: Optional['aiohttp.ClientSession'] = None
+        # 每个站点一把锁和上次请求时间，用于控制请求间隔
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._last_request: Dict[str, float] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='crawler-loop', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def crawl(self, url: str, parse: Callable[..., Page], follow: bool = True,
+              kind: str = 'novel') -> Tuple[str, List[str]]:
+        """
+        同步入口 (可在任意线程调用)。返回 (标题, 各章正文)；follow=False 时只抓取单页。
+        kind 为解析方式的名称，同一 URL 不同解析方式的结果分别缓存。
+        """
+        future = asyncio.run_coroutine_threadsafe(self.crawl_async(url, parse, follow, kind), self._ensure_loop())
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+                self._session = None
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = self._thread = None
+            self._host_locks.clear()
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _wait_turn(self, host: str):
+        # 同一站点的请求按间隔依次发出 (已发出的请求可以同时进行)
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._last_request.get(host, 0) + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request[host] = time.monotonic()
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes, Mapping[str, str]]:
+        """返回 (状态码, 内容, 响应头)。headers 为额外的请求头 (如条件请求)，304 时内容为空"""
+        host = urlparse(url).netloc
+        for attempt in range(self.retries + 1):
+            await self._wait_turn(host)
+            try:
+                async with self._get_session().get(url, headers=headers) as response:
+                    if response.status == 429 or response.status >= 500:
+                        if attempt < self.retries:
+                            await asyncio.sleep(self.delay * 2 ** attempt)
+                            continue
+                    if response.status >= 400:
+                        raise FetchError(f"{response.status} {response.reason}: {url}")
+                    return response.status, await response.read(), response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise FetchError(f"{type(e).__name__}: {url}") from e
+                await asyncio.sleep(self.delay * 2 ** attempt)
+        raise FetchError(url)
+
+    async def fetch_page(self, url: str, parse: Callable[..., Page], kind: str = 'novel') -> Page:
+        cached = self.cache.get(url, kind) if self.cache else None
+        if cached and cached.fresh:
+            return cached.page
+        status, content, headers = await self.fetch(url, cached.validators() if cached else None)
+        if status == 304 and cached:
+            self.cache.touch(url, kind)
+            return cached.page
+        # 解析是 CPU 密集操作，放到线程池中，不阻塞其他下载
+        page = await asyncio.get_running_loop().run_in_executor(
+            None, partial(parse, content, url, charset=content_charset(headers)))
+        if self.cache:
+            self.cache.put(url, page, headers.get('ETag'), headers.get('Last-Modified'), kind)
+        return page
+
+    async def crawl_async(self, url: str, parse: Callable[..., Page], follow: bool = True,
+                          kind: str = 'novel') -> Tuple[str, List[str]]:
+        first = await self.fetch_page(url, parse, kind)
+        if not follow:
+            return first.title, [first.text]
+
+        if first.next_url is None and len(first.chapter_links) >= TOC_MIN_LINKS:
+            # 目录页：并发下载所有章节，按目录顺序拼接，个别章节失败时跳过
+            links = first.chapter_links[:self.max_pages]
+            pages = await asyncio.gather(*(self.fetch_page(link, parse, kind) for link in links), return_exceptions=True)
+            failed = [link for link, page in zip(links, pages) if isinstance(page, BaseException)]
+            if len(failed) == len(links):
+                raise FetchError(f"目录中的 {len(links)} 个章节均下载失败")
+            if failed:
+                print(f"警告: {len(failed)} 个章节下载失败，已跳过 (如 {failed[0]})")
+            return first.title, [page.text for page in pages if not isinstance(page, BaseException)]
+
+        # 章节页：沿 "下一章" 链接依次抓取
+        chapters = [first.text]
+        visited = {urldefrag(url)[0]}
+        page = first
+        while page.next_url and page.next_url not in visited and len(chapters) < self.max_pages:
+            visited.add(page.next_url)
+            page = await self.fetch_page(page.next_url, parse, kind)
+            chapters.append(page.text)
+        return first.title, chapters
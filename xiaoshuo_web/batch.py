@@ -0,0 +1,262 @@
+"""
+批量分析：对整个目录或一组文本文件并行执行小说分析，结果写入结果目录和结果索引。
+
+    python batch.py                              # 分析 static/uploads 下的全部 .txt
+    python batch.py books/ extra.txt -p 4        # 指定目录/文件和进程数
+    python batch.py books/ --report report.json  # 把汇总报告写入文件
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from chapter_index import ChapterIndex
+from config import analyzer_options
+from corpus import CorpusIndex
+from model_registry import registry
+from result_cache import ResultCache, file_content_hash
+from result_format import RESULT_SUFFIX, write_result
+from result_store import ResultStore
+
+
+def collect_files(paths: Iterable[str], pattern: str = '*.txt', recursive: bool = False) -> List[str]:
+    """展开目录 (按 pattern 匹配文件)，按给出的顺序去重，目录内按文件名排序"""
+    files, seen = [], set()
+    for path in paths:
+        if os.path.isdir(path):
+            matched = glob.glob(os.path.join(path, '**', pattern) if recursive else os.path.join(path, pattern),
+                                recursive=recursive)
+            candidates = sorted(p for p in matched if os.path.isfile(p))
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            real = os.path.realpath(candidate)
+            if real not in seen:
+                seen.add(real)
+                files.append(candidate)
+    return files
+
+
+def analyze_file(analyzer, path: str, title: str, stream_threshold: int,
+                 report: Optional[Callable[[str, int], None]] = None, job_id: Optional[str] = None,
+                 partial_callback: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """按章节索引分析一个文本文件，超过 stream_threshold 字节的文件逐章流式分析"""
+    report = report or (lambda stage, progress: None)
+    # 章节索引持久化在文件旁，章节内容通过 mmap 按需读取
+    report('ingest', 1)
+    with ChapterIndex.load_or_build(path) as index:
+        if os.path.getsize(path) > stream_threshold:
+            # 大文件：逐章流式分析，不把全文读入内存
+            chapters = index.iter_chapters(progress=lambda fraction: report('ingest', int(5 * fraction)))
+            return analyzer.analyze_chapter_stream(chapters, title, progress_callback=report, job_id=job_id,
+                                                   partial_callback=partial_callback)
+        chapters = list(index)
+        return analyzer.analyze_novel_text(" ".join(chapters), title, progress_callback=report,
+                                           chapters=chapters, job_id=job_id, partial_callback=partial_callback)
+
+
+# 批量分析工作进程的状态：分析器和结果索引在进程启动时创建一次，之后的文件复用
+_worker: Dict[str, Any] = {}
+
+
+def _init_batch_worker(options: Dict[str, Any], results_folder: str, index_path: str, corpus_path: str,
+                       stream_threshold: int):
+    from novel_analyzer import SimpleNovelAnalyzer
+    _worker['analyzer'] = SimpleNovelAnalyzer(**options)
+    _worker['store'] = ResultStore(index_path, results_folder)
+    _worker['corpus'] = CorpusIndex(corpus_path, results_folder)
+    _worker['results_folder'] = results_folder
+    _worker['stream_threshold'] = stream_threshold
+    registry.preload()
+
+
+def _analyze_batch_file(path: str, result_id: str, source: str) -> Dict[str, Any]:
+    """在工作进程中分析一个文件并保存结果，只把摘要信息传回主进程"""
+    start = time.time()
+    item = {'path': path, 'result_id': None, 'status': 'failed', 'chars': 0}
+    try:
+        result = analyze_file(_worker['analyzer'], path, os.path.basename(path), _worker['stream_threshold'],
+                              job_id=result_id)
+    except UnicodeDecodeError:
+        return {**item, 'error': '文件编码错误，请使用UTF-8格式的TXT文件', 'duration': round(time.time() - start, 2)}
+    except Exception as e:
+        return {**item, 'error': str(e), 'duration': round(time.time() - start, 2)}
+    if "error" in result:
+        return {**item, 'error': result['error'], 'duration': round(time.time() - start, 2)}
+
+    duration = round(time.time() - start, 2)
+    result['result_id'] = result_id
+    result['timestamp'] = datetime.now().isoformat()
+    result['source'] = source
+    result['duration'] = f"{duration}s"
+    result['type'] = 'file'
+    result['upload_file'] = os.path.basename(path)
+
+    save_path = os.path.join(_worker['results_folder'], f"{result_id}{RESULT_SUFFIX}")
+    write_result(save_path, result)
+    _worker['store'].add(result, os.path.getsize(save_path))
+    _worker['corpus'].add(result)
+    return {**item, 'result_id': result_id, 'status': 'completed', 'duration': duration,
+            'chars': result['novel_info'].get('total_length', 0),
+            'chapters': result['novel_info'].get('total_chapters', 0)}
+
+
+class BatchAnalyzer:
+    """
+    批量分析器。文件按文件粒度分给进程池，每个工作进程只创建一次分析器并预加载模型，
+    之后处理的文件复用同一份模型。结果文件、结果索引和跨书特征表由工作进程直接写入；
+    主进程负责查结果缓存 (内容相同的文件直接复用已有结果) 并汇总吞吐量。
+    """
+
+    def __init__(self, config, analyzer=None, processes: Optional[int] = None,
+                 result_cache: Optional[ResultCache] = None, start_method: Optional[str] = None):
+        """
+        start_method 为工作进程的启动方式 (默认使用平台默认值)。在已有其他线程的进程中 (如 Web 服务)
+        应使用 'spawn'：fork 会继承其他线程持有的锁，子进程可能死锁。
+        """
+        from novel_analyzer import SimpleNovelAnalyzer
+
+        self.config = config
+        self.processes = processes or config['BATCH_PROCESSES'] or os.cpu_count() or 1
+        # 进程间并行已经占满 CPU，工作进程内部不再使用阶段进程池
+        self.options = {**analyzer_options(config), 'parallel': False, 'ner_n_process': 1}
+        self.analyzer = analyzer or SimpleNovelAnalyzer(**self.options)
+        self.result_cache = result_cache
+        self.context = multiprocessing.get_context(start_method)
+
+    def _cache_key(self, path: str) -> Optional[str]:
+        # 与网页上传使用相同的键，批量结果与上传结果互相复用
+        try:
+            return file_content_hash(path, self.analyzer.fingerprint() + ';file')
+        except (UnicodeDecodeError, OSError):
+            return None
+
+    def run(self, files: List[str], source: str = 'Batch',
+            report: Optional[Callable[[str, int], None]] = None) -> Dict[str, Any]:
+        """分析 files 中的全部文件，返回汇总报告 (逐文件状态、总字符数、吞吐量)"""
+        start = time.time()
+        items: Dict[str, Dict[str, Any]] = {}
+        keys = {}
+        pending = []
+        # 内容相同的文件只分析一次: {缓存键: 首个文件}
+        first_of: Dict[str, str] = {}
+        for path in files:
+            key = self._cache_key(path)
+            cached_id = self.result_cache.get(key) if key and self.result_cache else None
+            if cached_id:
+                items[path] = {'path': path, 'result_id': cached_id, 'status': 'cached', 'chars': 0}
+            elif key in first_of:
+                keys[path] = key
+            else:
+                keys[path] = key
+                if key:
+                    first_of[key] = path
+                pending.append(path)
+
+        if pending:
+            # fork 方式下先在主进程加载模型，工作进程写时复制共享
+            if self.context.get_start_method() == 'fork':
+                registry.preload()
+            initargs = (self.options, self.config['RESULTS_FOLDER'], self.config['RESULT_INDEX_PATH'],
+                        self.config['CORPUS_INDEX_PATH'], self.config['STREAM_INGEST_THRESHOLD'])
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(pending)), mp_context=self.context,
+                                     initializer=_init_batch_worker, initargs=initargs) as pool:
+                futures = {pool.submit(_analyze_batch_file, path, str(uuid.uuid4()), source): path
+                           for path in pending}
+                for done, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        item = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等
+                        item = {'path': path, 'result_id': None, 'status': 'failed', 'chars': 0, 'error': str(e)}
+                    items[path] = item
+                    if item['status'] == 'completed' and keys.get(path) and self.result_cache:
+                        self.result_cache.put(keys[path], item['result_id'])
+                    if report:
+                        report('batch', int(100 * done / len(pending)))
+
+        # 重复的文件直接使用同内容文件的结果
+        for path, key in keys.items():
+            if path not in items:
+                original = items[first_of[key]]
+                items[path] = {'path': path, 'result_id': original['result_id'], 'chars': 0,
+                               'status': 'cached' if original['status'] == 'completed' else original['status'],
+                               **({'error': original['error']} if 'error' in original else {})}
+
+        wall_time = time.time() - start
+        ordered = [items[path] for path in files]
+        analyzed = [i for i in ordered if i['status'] == 'completed']
+        total_chars = sum(i['chars'] for i in analyzed)
+        return {
+            'files': len(files),
+            'completed': len(analyzed),
+            'cached': sum(1 for i in ordered if i['status'] == 'cached'),
+            'failed': sum(1 for i in ordered if i['status'] == 'failed'),
+            'processes': min(self.processes, len(pending)) if pending else 0,
+            'total_chars': total_chars,
+            'wall_time': round(wall_time, 2),
+            'chars_per_second': int(total_chars / wall_time) if wall_time > 0 else 0,
+            'files_per_minute': round(len(analyzed) / wall_time * 60, 1) if wall_time > 0 else 0,
+            'items': ordered
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import config_dict
+
+    config = config_dict()
+    parser = argparse.ArgumentParser(description='批量分析小说文本文件')
+    parser.add_argument('paths', nargs='*', default=[config['UPLOAD_FOLDER']], help='目录或文件 (默认 static/uploads)')
+    parser.add_argument('-p', '--processes', type=int, help='进程数 (默认 BATCH_PROCESSES 或全部 CPU 核心)')
+    parser.add_argument('--pattern', default='*.txt', help='目录中匹配的文件名模式')
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归查找子目录')
+    parser.add_argument('--no-cache', action='store_true', help='不复用已有结果，全部重新分析')
+    parser.add_argument('--report', help='把汇总报告 (JSON) 写入该文件')
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths, args.pattern, args.recursive)
+    if not files:
+        print("没有找到需要分析的文件")
+        return 1
+
+    result_cache = None
+    if config['RESULT_CACHE_ENABLED'] and not args.no_cache:
+        result_cache = ResultCache(
+            db_path=config['RESULT_CACHE_PATH'],
+            results_folder=config['RESULTS_FOLDER'],
+            max_entries=config['RESULT_CACHE_MAX_ENTRIES'],
+            max_bytes=config['RESULT_CACHE_MAX_BYTES']
+        )
+    os.makedirs(config['RESULTS_FOLDER'], exist_ok=True)
+
+    print(f"共 {len(files)} 个文件，开始分析...")
+    batch = BatchAnalyzer(config, processes=args.processes, result_cache=result_cache)
+    summary = batch.run(files, report=lambda stage, progress: print(f"\r进度 {progress}%", end='', flush=True))
+    print()
+
+    for item in summary['items']:
+        if item['status'] == 'completed':
+            detail = f"{item['result_id']} ({item['chars']:,} 字符, {item['duration']}s)"
+        else:
+            detail = item.get('error') or item['result_id']
+        print(f"  [{item['status']}] {item['path']}: {detail}")
+    print(f"\n完成 {summary['completed']}，复用 {summary['cached']}，失败 {summary['failed']}；"
+          f"{summary['processes']} 个进程，用时 {summary['wall_time']}s，"
+          f"{summary['chars_per_second']:,} 字符/秒，{summary['files_per_minute']} 个文件/分钟")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
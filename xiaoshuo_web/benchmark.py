@@ -0,0 +1,290 @@
+"""
+小说分析器基准测试 (完全离线)。
+
+语料为 static/uploads 中的文本 (按内容去重)，以及由这些文本的章节循环拼接而成的
+指定大小的合成文本 (默认 100KB 到 50MB)。每个用例在独立的子进程中运行，
+记录整体分析与各分析阶段的延迟、吞吐量 (字符/秒) 和内存峰值，结果写入 JSON，
+并与保存的基线比较，延迟变慢超过阈值的项标记为回归 (退出码 1)。
+为避免运行间的抖动误报，绝对差值不足 --min-delta 秒、或基线延迟不足 MIN_BASELINE_LATENCY 秒的项不算回归。
+benchmarks/baseline.json 为随仓库提供的参考基线 (语料用例与 100KB/1MB/10MB 合成用例，生成环境见其中的 environment)，
+在其他机器上应先用 --save-baseline 生成本机基线。
+
+    python benchmark.py                        # 运行全部用例并与基线比较
+    python benchmark.py --sizes 100KB,1MB      # 只运行指定大小的合成用例
+    python benchmark.py --save-baseline        # 把本次结果保存为新的基线
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 禁止下载 NLTK 资源和 Hugging Face 模型，保证离线运行
+os.environ['ANALYZER_OFFLINE'] = '1'
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
+BENCHMARK_FOLDER = os.path.join(BASE_DIR, 'benchmarks')
+BASELINE_PATH = os.path.join(BENCHMARK_FOLDER, 'baseline.json')
+
+DEFAULT_SIZES = '100KB,1MB,10MB,50MB'
+DEFAULT_REPEAT = 3
+# 延迟超过基线的该比例视为回归
+DEFAULT_THRESHOLD = 0.15
+# 延迟增加的绝对值不足该秒数时不算回归 (运行间的抖动)
+DEFAULT_MIN_DELTA = 0.05
+# 基线延迟不足该秒数的项 (如很快的阶段) 只显示比值，不判定回归
+MIN_BASELINE_LATENCY = 0.1
+SIZE_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def corpus_files(folder: str = CORPUS_FOLDER) -> List[str]:
+    """语料目录中的 .txt 文件，内容相同的只保留一个 (按文件名排序，结果稳定)"""
+    seen = set()
+    files = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not name.endswith('.txt') or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            files.append(path)
+    return files
+
+
+def corpus_name(path: str) -> str:
+    # 上传文件名带有时间戳前缀，去掉后作为稳定的用例名
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.split('_')[-1]
+
+
+def synthetic_text(files: List[str], size: int) -> str:
+    """循环拼接语料的章节并重新编号，直到达到 size 个字符"""
+    from ingest import iter_chapters
+
+    chapters = [c for path in files for c in iter_chapters(path)]
+    if not chapters:
+        raise ValueError('语料目录中没有可用的文本')
+    parts = []
+    length = 0
+    number = 1
+    while length < size:
+        chapter = chapters[(number - 1) % len(chapters)]
+        part = f"Chapter {number}\n{chapter}\n\n"
+        parts.append(part)
+        length += len(part)
+        number += 1
+    return "".join(parts)[:size]
+
+
+def load_case_text(case: Dict[str, Any]) -> str:
+    if case['kind'] == 'corpus':
+        with open(case['path'], 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    return synthetic_text(case['files'], case['size'])
+
+
+def _summarize_runs(records: List[Dict[str, Any]], chars: int) -> Dict[str, Any]:
+    latencies = [r['wall_time'] for r in records]
+    latency = statistics.median(latencies)
+    return {
+        'latency': round(latency, 4),
+        'latency_min': round(min(latencies), 4),
+        'cpu_time': round(statistics.median(r['cpu_time'] for r in records), 4),
+        'child_cpu_time': round(statistics.median(r.get('child_cpu_time', 0) for r in records), 4),
+        'throughput': int(chars / latency) if latency > 0 else None,
+        'peak_rss_mb': max(r['peak_rss_mb'] for r in records),
+        'rss_delta_mb': max(r['rss_delta_mb'] for r in records)
+    }
+
+
+def run_case(case: Dict[str, Any], repeat: int, stages: bool, parallel: bool) -> Dict[str, Any]:
+    """在子进程中执行：加载模型后预热一次，再重复测量整体分析和各阶段"""
+    from model_registry import registry
+    from novel_analyzer import SimpleNovelAnalyzer
+    from document import NovelDocument
+    from profiler import StageProfiler
+
+    text = load_case_text(case)
+    # 不使用章节缓存和嵌入缓存，每次都完整计算
+    analyzer = SimpleNovelAnalyzer(parallel=parallel)
+    registry.preload()
+    analyzer.analyze_novel_text(text[:20000], 'warm-up')
+
+    runs = []
+    for _ in range(repeat):
+        with StageProfiler('analyze', input_chars=len(text)) as profiler:
+            result = analyzer.analyze_novel_text(text, case['name'])
+        if 'error' in result:
+            raise RuntimeError(f"{case['name']}: {result['error']}")
+        runs.append(profiler.record)
+    record = {'chars': len(text), 'chapters': result['novel_info']['total_chapters'],
+              'analyze': _summarize_runs(runs, len(text))}
+
+    if stages:
+        stage_runs: Dict[str, List[Dict[str, Any]]] = {}
+        for _ in range(repeat):
+            # 每轮重新构建文档，避免分词结果在轮次之间复用
+            chapters = analyzer._split_into_chapters(text)
+            cleaned = " ".join(chapters)
+            with StageProfiler('document') as profiler:
+                doc = NovelDocument(cleaned, chapters)
+            stage_runs.setdefault('document', []).append(profiler.record)
+            plot_samples = [analyzer._plot_sample(c) for c in chapters]
+            for _, stage, method, args in analyzer._stages(doc, plot_samples):
+                _, stage_record = analyzer._run_profiled(stage, method, args, None, {})
+                stage_runs.setdefault(stage, []).append(stage_record)
+        record['stages'] = {stage: _summarize_runs(r, len(text)) for stage, r in stage_runs.items()}
+
+    analyzer.close()
+    # 子进程整个生命周期的最大常驻内存 (Linux 上单位为 KB)
+    record['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return record
+
+
+def build_cases(sizes: List[int], include_corpus: bool) -> List[Dict[str, Any]]:
+    files = corpus_files()
+    cases = []
+    if include_corpus:
+        cases += [{'id': f"corpus:{corpus_name(p)}", 'name': corpus_name(p), 'kind': 'corpus', 'path': p}
+                  for p in files]
+    for size in sizes:
+        label = f"{size // 1024 ** 2}MB" if size >= 1024 ** 2 else f"{size // 1024}KB"
+        cases.append({'id': f"synthetic:{label}", 'name': label, 'kind': 'synthetic', 'size': size, 'files': files})
+    return cases
+
+
+def environment() -> Dict[str, Any]:
+    from novel_analyzer import analyzer_fingerprint
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'analyzer': analyzer_fingerprint()
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta: float = DEFAULT_MIN_DELTA) -> List[Dict[str, Any]]:
+    """
+    逐项比较延迟，返回所有对比项 (regression 为 True 的是回归)。
+    按最短延迟比较，比值超过 1 + threshold、增加量不少于 min_delta 秒且基线不短于 MIN_BASELINE_LATENCY 秒时才算回归
+    """
+    rows = []
+    for case_id, record in current['cases'].items():
+        base = baseline.get('cases', {}).get(case_id)
+        if not base:
+            continue
+        items = [('analyze', record['analyze'], base.get('analyze'))]
+        items += [(stage, r, base.get('stages', {}).get(stage)) for stage, r in record.get('stages', {}).items()]
+        for stage, now, before in items:
+            # 比较各次测量中的最短延迟，受运行间抖动的影响比中位数小
+            base_latency = (before.get('latency_min') or before.get('latency')) if before else None
+            if not base_latency:
+                continue
+            latency = now['latency_min']
+            ratio = latency / base_latency
+            regression = (ratio > 1 + threshold and latency - base_latency >= min_delta
+                          and base_latency >= MIN_BASELINE_LATENCY)
+            rows.append({'case': case_id, 'stage': stage, 'baseline': base_latency, 'latency': latency,
+                         'ratio': round(ratio, 3), 'regression': regression})
+    return rows
+
+
+def print_report(report: Dict[str, Any], comparison: List[Dict[str, Any]]):
+    print(f"\n{'用例':<36}{'阶段':<12}{'延迟(s)':>10}{'字符/秒':>12}{'RSS峰值(MB)':>14}")
+    for case_id, record in report['cases'].items():
+        items = [('analyze', record['analyze'])] + list(record.get('stages', {}).items())
+        for stage, r in items:
+            print(f"{case_id:<36}{stage:<12}{r['latency']:>10.3f}{r['throughput'] or 0:>12,}{r['peak_rss_mb']:>14.1f}")
+    if comparison:
+        print(f"\n与基线比较 (阈值 +{report['threshold']:.0%}，且至少慢 {report['min_delta']}s):")
+        for row in comparison:
+            flag = '回归' if row['regression'] else 'ok'
+            print(f"  [{flag}] {row['case']} / {row['stage']}: {row['baseline']:.3f}s -> {row['latency']:.3f}s "
+                  f"(x{row['ratio']})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='小说分析器基准测试 (离线)')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='合成用例大小，逗号分隔 (如 100KB,1MB)；为空则不运行')
+    parser.add_argument('--no-corpus', action='store_true', help='不运行语料原文用例')
+    parser.add_argument('--no-stages', action='store_true', help='只测整体分析，不单独测量各阶段')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个用例的测量次数 (取中位数)')
+    parser.add_argument('--parallel', action='store_true', help='使用多进程阶段并行模式')
+    parser.add_argument('--output', help='结果文件路径 (默认 benchmarks/results-<时间>.json)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='回归阈值 (默认 0.15 即 +15%%)')
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help='回归的最小绝对差值 (秒，默认 0.05)')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    cases = build_cases(sizes, not args.no_corpus)
+    report = {'timestamp': datetime.now().isoformat(), 'environment': environment(),
+              'repeat': args.repeat, 'threshold': args.threshold, 'min_delta': args.min_delta, 'cases': {}}
+
+    # 每个用例一个新的子进程，内存峰值互不影响；
+    # 固定字符串哈希种子，集合与字典的迭代顺序 (如同频人名的先后) 在各次运行之间一致
+    os.environ['PYTHONHASHSEED'] = '0'
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        print(f"运行 {case['id']} ...", flush=True)
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report['cases'][case['id']] = pool.submit(run_case, case, args.repeat, not args.no_stages,
+                                                      args.parallel).result()
+        print(f"  完成，用时 {time.time() - start:.1f}s", flush=True)
+
+    os.makedirs(BENCHMARK_FOLDER, exist_ok=True)
+    output = args.output or os.path.join(BENCHMARK_FOLDER, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    comparison = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('cpu_count') != report['environment']['cpu_count']:
+            print("警告: 基线与本次运行的机器环境不同，比较结果仅供参考")
+        if baseline.get('environment', {}).get('analyzer') != report['environment']['analyzer']:
+            print("警告: 基线的分析器版本或可选依赖与本次运行不同，比较结果仅供参考")
+        comparison = compare(report, baseline, args.threshold, args.min_delta)
+    print_report(report, comparison)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+
+    regressions = [row for row in comparison if row['regression']]
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回归")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
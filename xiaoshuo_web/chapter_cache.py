@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ChapterCache:
+    """
+    章节级分析结果缓存 (SQLite)。
+    以 (章节内容哈希, 分析部分) 为键保存单章的中间结果，如章节摘要、
+    人物提及计数和章节统计。修改过几章后重新上传的小说只需重新计算变化的章节，
+    整本书的汇总结果由缓存的各章结果重新组合。
+    version 为分析器指纹，算法或参数变化后旧条目自动失效。
+    查询只读数据库：命中时间先记在内存中，下次写入时一并保存。
+    """
+
+    def __init__(self, db_path: str, version: str, max_entries: int = 100000):
+        self.db_path = db_path
+        self.version = version
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 尚未写入数据库的命中时间 {(章节键, 部分): last_access}
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS chapter_parts ('
+                         'chapter TEXT, part TEXT, value TEXT, last_access REAL, PRIMARY KEY (chapter, part))')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_chapter_parts_access ON chapter_parts (last_access)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _key(self, chapter_hash: str) -> str:
+        return f"{self.version}:{chapter_hash}"
+
+    def get(self, chapter_hashes: List[str], part: str) -> List[Optional[Any]]:
+        """按顺序返回各章的缓存结果，未命中为 None"""
+        if not chapter_hashes:
+            return []
+        keys = [self._key(h) for h in chapter_hashes]
+        found = {}
+        with self._connect() as conn:
+            # 分批查询，避免超过 SQLite 的参数个数限制
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(f'SELECT chapter, value FROM chapter_parts WHERE part = ? '
+                                    f'AND chapter IN ({placeholders})', [part] + batch)
+                found.update((chapter, json.loads(value)) for chapter, value in rows)
+
+        with self._lock:
+            now = time.time()
+            self._touched.update(((chapter, part), now) for chapter in found)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(k) for k in keys]
+
+    def put(self, values: Dict[str, Any], part: str):
+        """写入若干章的结果 {章节哈希: 结果}"""
+        if not values:
+            return
+        now = time.time()
+        rows = [(self._key(h), part, json.dumps(v, ensure_ascii=False), now) for h, v in values.items()]
+        with self._lock, self._connect() as conn:
+            # 先写入之前的命中时间，淘汰按真实的使用顺序进行
+            conn.executemany('UPDATE chapter_parts SET last_access = ? WHERE chapter = ? AND part = ?',
+                             [(t, chapter, key_part) for (chapter, key_part), t in self._touched.items()])
+            self._touched.clear()
+            conn.executemany('INSERT OR REPLACE INTO chapter_parts VALUES (?, ?, ?, ?)', rows)
+            count = conn.execute('SELECT COUNT(*) FROM chapter_parts').fetchone()[0]
+            if count > self.max_entries:
+                # 淘汰最久未使用的条目
+                conn.execute('DELETE FROM chapter_parts WHERE rowid IN (SELECT rowid FROM chapter_parts '
+                             'ORDER BY last_access LIMIT ?)', (count - self.max_entries,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
@@ -0,0 +1,109 @@
+import json
+import mmap
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from ingest import decode_chapter, scan_chapter_spans
+
+
+class ChapterIndex:
+    """
+    上传文件的持久化章节索引。
+    章节边界的字节偏移保存在上传文件旁的 <文件名>.chapters.json 中，
+    章节内容通过 mmap 切片按需读取，无需把整个文件载入内存。
+    再次分析、单章查看和导出都可以只读取需要的章节。
+    """
+
+    SUFFIX = '.chapters.json'
+
+    def __init__(self, path: str, spans: List[Tuple[int, int]], encoding: str = 'utf-8'):
+        self.path = path
+        self.spans = spans
+        self.encoding = encoding
+        self._file = None
+        self._mmap = None
+
+    @classmethod
+    def index_path(cls, path: str) -> str:
+        return path + cls.SUFFIX
+
+    @classmethod
+    def build(cls, path: str, encoding: str = 'utf-8') -> 'ChapterIndex':
+        spans = []
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    spans = list(scan_chapter_spans(mm))
+        index = cls(path, spans, encoding)
+        index.save()
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ChapterIndex']:
+        """读取已保存的索引；源文件大小或修改时间变化时视为失效"""
+        index_path = cls.index_path(path)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stat = os.stat(path)
+            if data['source_size'] != stat.st_size or data['source_mtime'] != stat.st_mtime:
+                return None
+            return cls(path, [tuple(s) for s in data['chapters']], data.get('encoding', 'utf-8'))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, path: str, encoding: str = 'utf-8') -> 'ChapterIndex':
+        return cls.load(path) or cls.build(path, encoding)
+
+    def save(self):
+        stat = os.stat(self.path)
+        data = {
+            'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'encoding': self.encoding,
+            'chapters': self.spans
+        }
+        with open(self.index_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def open(self):
+        if self._mmap is None and self.spans:
+            self._file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def raw(self, i: int) -> bytes:
+        self.open()
+        start, end = self.spans[i]
+        return self._mmap[start:end]
+
+    def chapter(self, i: int) -> str:
+        """第 i 章 (从 0 开始) 空白已规范化的文本"""
+        return decode_chapter(self.raw(i), self.encoding)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_chapters()
+
+    def iter_chapters(self, progress: Optional[Callable[[float], None]] = None) -> Iterator[str]:
+        for i in range(len(self.spans)):
+            yield self.chapter(i)
+            if progress:
+                progress((i + 1) / len(self.spans))
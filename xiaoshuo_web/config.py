@@ -9,10 +9,111 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
     RESULTS_FOLDER = os.path.join(BASE_DIR, 'static', 'results')
+    CACHE_FOLDER = os.path.join(BASE_DIR, 'cache')
+    RESULT_INDEX_PATH = os.path.join(CACHE_FOLDER, 'results.db')  # 结果元数据索引 (SQLite)
+    CORPUS_INDEX_PATH = os.path.join(CACHE_FOLDER, 'corpus.db')  # 跨书分析特征表 (SQLite)
 
     # 文件配置
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # 512MB (大文件走流式分析)
+    STREAM_INGEST_THRESHOLD = 8 * 1024 * 1024  # 超过 8MB 的上传文件逐章流式读取
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx'}
 
     # 分析配置
-    MAX_ANALYSIS_TEXT_LENGTH = 1000000
\ No newline at end of file
+    MAX_ANALYSIS_TEXT_LENGTH = 1000000
+
+    # 任务队列配置
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))  # 同时执行的分析任务数
+    ANALYSIS_MAX_PENDING = 20  # 排队等待的最大任务数
+    TASK_RETENTION_SECONDS = 3600  # 已结束任务状态的保留时间
+    TASK_STREAM_KEEPALIVE = 15  # 分析进度流 (SSE) 无事件时发送心跳的间隔 (秒)
+
+    # 并行分析配置
+    # 开启后各分析阶段在进程池中并发执行，每个阶段整体在一个进程内完成 (每个进程预加载模型，内存占用随进程数增加)
+    ANALYSIS_PARALLEL = os.environ.get('ANALYSIS_PARALLEL', '0') == '1'
+    ANALYSIS_PROCESSES = int(os.environ.get('ANALYSIS_PROCESSES', 0)) or None  # 默认使用全部 CPU 核心
+
+    # spaCy 批量 NER 配置 (nlp.pipe 的 batch_size / n_process)
+    NER_BATCH_SIZE = 32
+    NER_N_PROCESS = int(os.environ.get('NER_N_PROCESS', 1))
+
+    # 模型加载配置
+    # MODEL_WARMUP: 启动后在后台线程中预热模型；MODEL_PRELOAD: 导入时同步加载 (用于 gunicorn --preload)
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '0') == '1'
+
+    # 人物关系：两次提及相距不超过该字符数即计为一次共现
+    COOCCURRENCE_WINDOW = int(os.environ.get('COOCCURRENCE_WINDOW', 500))
+    # 按候选人名出现次数保留的主要人物数 (提及统计与关系图只针对这些人物)
+    CHARACTER_TOP_N = int(os.environ.get('CHARACTER_TOP_N', 50))
+
+    # 结果缓存配置 (相同内容直接复用已有结果)
+    RESULT_CACHE_ENABLED = True
+    RESULT_CACHE_PATH = os.path.join(CACHE_FOLDER, 'result_cache.db')
+    RESULT_CACHE_MAX_ENTRIES = 500
+    RESULT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200MB
+
+    # 章节级结果缓存 (重新上传修改过的小说时只重新分析变化的章节)
+    CHAPTER_CACHE_ENABLED = True
+    CHAPTER_CACHE_PATH = os.path.join(CACHE_FOLDER, 'chapters.db')
+    CHAPTER_CACHE_MAX_ENTRIES = 100000
+
+    # 主题提取的短语嵌入缓存 (不同小说的候选短语大量重复)
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_PATH = os.path.join(CACHE_FOLDER, 'embeddings.db')
+    EMBEDDING_CACHE_MAX_ENTRIES = 500000
+
+    # 网页爬取 (连载小说沿 "下一章" 或目录页抓取多个章节)
+    CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 200))
+    CRAWL_CONCURRENCY = 16  # 总并发连接数
+    CRAWL_PER_HOST = 4  # 每个站点的并发连接数
+    CRAWL_DELAY = float(os.environ.get('CRAWL_DELAY', 0.25))  # 同一站点两次请求的最小间隔 (秒)
+    CRAWL_TIMEOUT = 15
+
+    # 爬取缓存 (按 URL 保存提取结果，过期后用 ETag/Last-Modified 条件请求重新验证)
+    CRAWL_CACHE_ENABLED = True
+    CRAWL_CACHE_PATH = os.path.join(CACHE_FOLDER, 'crawl.db')
+    CRAWL_CACHE_TTL = int(os.environ.get('CRAWL_CACHE_TTL', 3600))  # 秒
+    CRAWL_CACHE_MAX_BYTES = 100 * 1024 * 1024  # 100MB
+
+    # 导出缓存 (渲染好的 HTML/PDF 报告按结果保存，通过 ETag 支持条件请求)
+    EXPORT_CACHE_ENABLED = True
+    EXPORT_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'exports')
+    EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500MB
+
+    # 设置后每个分析任务各阶段的 cProfile 结果写入 <目录>/<result_id>/<阶段>.prof
+    ANALYSIS_PROFILE_DIR = os.environ.get('ANALYSIS_PROFILE_DIR') or None
+
+    # 批量分析 (整个目录或文件列表) 的进程数，每个进程加载一份模型
+    BATCH_PROCESSES = int(os.environ.get('BATCH_PROCESSES', 0)) or None  # 默认使用全部 CPU 核心
+
+
+def config_dict() -> dict:
+    """Config 的全部配置项 (不经过 Flask 时使用，如命令行工具)"""
+    return {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+
+
+def analyzer_options(config) -> dict:
+    """由配置 (app.config 或 config_dict()) 生成 SimpleNovelAnalyzer 的参数"""
+    return dict(
+        parallel=config['ANALYSIS_PARALLEL'],
+        processes=config['ANALYSIS_PROCESSES'],
+        ner_batch_size=config['NER_BATCH_SIZE'],
+        ner_n_process=config['NER_N_PROCESS'],
+        cooccurrence_window=config['COOCCURRENCE_WINDOW'],
+        character_top_n=config['CHARACTER_TOP_N'],
+        chapter_cache_path=config['CHAPTER_CACHE_PATH'] if config['CHAPTER_CACHE_ENABLED'] else None,
+        chapter_cache_max_entries=config['CHAPTER_CACHE_MAX_ENTRIES'],
+        embedding_cache_path=config['EMBEDDING_CACHE_PATH'] if config['EMBEDDING_CACHE_ENABLED'] else None,
+        embedding_cache_max_entries=config['EMBEDDING_CACHE_MAX_ENTRIES'],
+        profile_dir=config['ANALYSIS_PROFILE_DIR'],
+        crawler_options={
+            'max_pages': config['CRAWL_MAX_PAGES'],
+            'concurrency': config['CRAWL_CONCURRENCY'],
+            'per_host': config['CRAWL_PER_HOST'],
+            'delay': config['CRAWL_DELAY'],
+            'timeout': config['CRAWL_TIMEOUT']
+        },
+        crawl_cache_path=config['CRAWL_CACHE_PATH'] if config['CRAWL_CACHE_ENABLED'] else None,
+        crawl_cache_ttl=config['CRAWL_CACHE_TTL'],
+        crawl_cache_max_bytes=config['CRAWL_CACHE_MAX_BYTES']
+    )
@@ -0,0 +1,328 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from result_format import find_result, open_result, result_ids
+
+# 每本书的数值特征 (列名)，均可用于筛选、排序、聚合和相似度计算
+NUMERIC_FEATURES = (
+    'chapters', 'length', 'avg_chapter_length',
+    'words', 'sentences', 'avg_sentence_length', 'unique_words', 'lexical_diversity',
+    'flesch_reading_ease', 'flesch_kincaid_grade',
+    'characters', 'relationships', 'top_character_share',
+    'sentiment_mean', 'sentiment_std', 'sentiment_min', 'sentiment_max', 'sentiment_slope', 'sentiment_final',
+    'complexity_mean'
+)
+# 计数类特征以 INTEGER 保存并按整数返回
+INTEGER_FEATURES = ('chapters', 'length', 'avg_chapter_length', 'words', 'sentences', 'unique_words',
+                    'characters', 'relationships')
+TEXT_FEATURES = ('title', 'type', 'timestamp')
+# themes / top_characters 以 JSON 列表保存，支持 contains 筛选
+LIST_FEATURES = ('themes', 'top_characters')
+COLUMNS = ('result_id',) + TEXT_FEATURES + NUMERIC_FEATURES + LIST_FEATURES
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS book_features (
+    result_id TEXT PRIMARY KEY,
+    {', '.join(f'{c} TEXT' for c in TEXT_FEATURES)},
+    {', '.join(f"{c} {'INTEGER' if c in INTEGER_FEATURES else 'REAL'}" for c in NUMERIC_FEATURES)},
+    {', '.join(f'{c} TEXT' for c in LIST_FEATURES)}
+);
+-- 特征表的修订号，每次写入加一；其他进程 (如批量分析工作进程) 写入后相似度矩阵据此重建
+CREATE TABLE IF NOT EXISTS corpus_revision (id INTEGER PRIMARY KEY CHECK (id = 0), revision INTEGER NOT NULL);
+INSERT OR IGNORE INTO corpus_revision VALUES (0, 0);
+"""
+
+OPERATORS = {'=': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', 'like': 'LIKE'}
+# 筛选值只能是标量
+SCALAR_TYPES = (str, int, float, bool, type(None))
+# 相似度：主题词用哈希技巧映射到固定维度，与标准化后的数值特征拼接
+THEME_DIMENSIONS = 64
+THEME_WEIGHT = 1.0
+TOP_CHARACTERS = 10
+# 情感曲线末段 (用于 sentiment_final) 占全书的比例
+ARC_TAIL = 0.1
+
+
+def _arc_features(arc: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.array([point.get(key, 0) or 0 for point in arc], dtype=np.float64)
+
+
+def extract_features(result: Mapping) -> Dict[str, Any]:
+    """
+    从分析结果中提取一本书的特征行。只读取 novel_info、统计、情节、人物和主题几个分区，
+    .nres 结果不会解码章节摘要等大分区。
+    """
+    info = result.get('novel_info') or {}
+    stats = result.get('text_statistics') or {}
+    basic = stats.get('basic_stats') or {}
+    readability = stats.get('readability_scores') or {}
+    plot = result.get('plot_analysis') or {}
+    characters = result.get('character_analysis') or {}
+    main_characters = characters.get('main_characters') or []
+    themes = result.get('themes') or []
+
+    features: Dict[str, Any] = {
+        'result_id': result['result_id'],
+        'title': info.get('title'),
+        'type': result.get('type'),
+        'timestamp': result.get('timestamp'),
+        'chapters': info.get('total_chapters'),
+        'length': info.get('total_length'),
+        'avg_chapter_length': info.get('avg_chapter_length'),
+        'words': basic.get('total_words'),
+        'sentences': basic.get('total_sentences'),
+        'avg_sentence_length': basic.get('avg_sentence_length'),
+        'unique_words': basic.get('unique_words'),
+        'lexical_diversity': basic.get('lexical_diversity'),
+        'flesch_reading_ease': readability.get('flesch_reading_ease'),
+        'flesch_kincaid_grade': readability.get('flesch_kincaid_grade'),
+        'characters': len(main_characters),
+        'relationships': len(characters.get('character_relationships') or []),
+        # 主题可能是字符串或 (短语, 得分)
+        'themes': [t[0] if isinstance(t, (list, tuple)) else t for t in themes],
+        'top_characters': [c.get('name') for c in main_characters[:TOP_CHARACTERS]],
+    }
+
+    mentions = [c.get('total_mentions') or 0 for c in main_characters]
+    features['top_character_share'] = max(mentions) / sum(mentions) if sum(mentions) else None
+
+    # 情感曲线摘要：均值、波动、极值、整体趋势 (按全书位置的线性斜率) 和结尾的情感
+    arc = plot.get('sentiment_arc') or []
+    if arc:
+        scores = _arc_features(arc, 'sentiment_score')
+        smoothed = _arc_features(arc, 'smoothed_score') if 'smoothed_score' in arc[0] else scores
+        tail = max(1, int(round(len(scores) * ARC_TAIL)))
+        features.update({
+            'sentiment_mean': float(scores.mean()),
+            'sentiment_std': float(scores.std()),
+            'sentiment_min': float(smoothed.min()),
+            'sentiment_max': float(smoothed.max()),
+            'sentiment_slope': float(np.polyfit(np.linspace(0, 1, len(scores)), scores, 1)[0])
+            if len(scores) > 1 else 0.0,
+            'sentiment_final': float(scores[-tail:].mean())
+        })
+    complexity = plot.get('complexity_arc') or []
+    if complexity:
+        features['complexity_mean'] = float(_arc_features(complexity, 'complexity_score').mean())
+    return features
+
+
+class CorpusIndex:
+    """
+    跨书分析的特征表 (SQLite)。
+    每个分析结果对应一行紧凑的特征 (篇幅、可读性、词汇多样性、情感曲线摘要、人物与主题)，
+    筛选、排序、聚合都只查询这张表，不再读取结果文件。
+    新结果保存时调用 add() 增量写入，sync() 只补录尚未入表的结果文件。
+    相似书籍检索使用内存中的特征矩阵，表的修订号变化 (任一进程写入) 后重新构建。
+    """
+
+    def __init__(self, db_path: str, results_folder: str):
+        self.db_path = db_path
+        self.results_folder = results_folder
+        self._lock = threading.Lock()
+        # 相似度检索用的 (修订号, result_id 列表, 特征矩阵)
+        self._matrix: Optional[Tuple[int, List[str], np.ndarray]] = None
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row(features: Dict[str, Any]) -> Tuple:
+        return tuple(json.dumps(features.get(c) or [], ensure_ascii=False) if c in LIST_FEATURES else features.get(c)
+                     for c in COLUMNS)
+
+    def add(self, result: Mapping):
+        """写入 (或覆盖) 一个结果的特征"""
+        self.add_features([extract_features(result)])
+
+    def add_features(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        placeholders = ', '.join('?' * len(COLUMNS))
+        with self._lock, self._connect() as conn:
+            conn.executemany(f'INSERT OR REPLACE INTO book_features VALUES ({placeholders})',
+                             [self._row(r) for r in rows])
+            conn.execute('UPDATE corpus_revision SET revision = revision + 1')
+
+    def remove(self, result_id: str):
+        with self._lock, self._connect() as conn:
+            if conn.execute('DELETE FROM book_features WHERE result_id = ?', (result_id,)).rowcount:
+                conn.execute('UPDATE corpus_revision SET revision = revision + 1')
+
+    def sync(self) -> int:
+        """补录结果目录中尚未入表的结果，移除文件已不存在的条目。返回补录的条数"""
+        if not os.path.isdir(self.results_folder):
+            return 0
+        on_disk = set(result_ids(self.results_folder))
+        with self._connect() as conn:
+            indexed = {row[0] for row in conn.execute('SELECT result_id FROM book_features')}
+        rows = []
+        for result_id in sorted(on_disk - indexed):
+            try:
+                result = open_result(find_result(self.results_folder, result_id))
+                if 'novel_info' in result and not result.get('error'):
+                    rows.append(extract_features({'result_id': result_id, **{k: result.get(k) for k in (
+                        'novel_info', 'text_statistics', 'plot_analysis', 'character_analysis', 'themes',
+                        'type', 'timestamp')}}))
+            except (OSError, ValueError, KeyError, zlib.error) as e:
+                print(f"跳过无法读取的结果 {result_id}: {e}")
+        self.add_features(rows)
+        for result_id in indexed - on_disk:
+            self.remove(result_id)
+        return len(rows)
+
+    @staticmethod
+    def _where(filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """
+        筛选条件: {列: 值} 表示相等；{列: {运算符: 值}}，运算符为 = != < <= > >= like；
+        themes/top_characters 支持 {"contains": 词} (不区分大小写)
+        """
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("filters 必须是 JSON 对象")
+        clauses, params = [], []
+        for column, condition in (filters or {}).items():
+            if column not in COLUMNS:
+                raise ValueError(f"未知的特征: {column}")
+            conditions = condition.items() if isinstance(condition, dict) else [('=', condition)]
+            for op, value in conditions:
+                if not isinstance(value, SCALAR_TYPES):
+                    raise ValueError(f"筛选值必须是字符串或数字: {column} {op}")
+                if op == 'contains' and column in LIST_FEATURES:
+                    clauses.append(f'EXISTS (SELECT 1 FROM json_each({column}) WHERE lower(value) LIKE ?)')
+                    params.append(f'%{str(value).lower()}%')
+                elif op in OPERATORS and column not in LIST_FEATURES:
+                    clauses.append(f'{column} {OPERATORS[op]} ?')
+                    params.append(value)
+                else:
+                    raise ValueError(f"不支持的筛选: {column} {op}")
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, sort: Optional[str] = None, descending: bool = True,
+              limit: int = 20, offset: int = 0, columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """按条件筛选并排序，返回特征行 (缺失值排在最后)"""
+        columns = list(columns or COLUMNS)
+        unknown = [c for c in columns + ([sort] if sort else []) if c not in COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的特征: {', '.join(unknown)}")
+        where, params = self._where(filters)
+        order = f' ORDER BY {sort} IS NULL, {sort} {"DESC" if descending else "ASC"}' if sort else ''
+        with self._connect() as conn:
+            rows = conn.execute(f'SELECT {", ".join(columns)} FROM book_features{where}{order} LIMIT ? OFFSET ?',
+                                params + [limit, offset]).fetchall()
+        return [{k: self._value(k, row[k]) for k in row.keys()} for row in rows]
+
+    @staticmethod
+    def _value(column: str, value: Any) -> Any:
+        if column in LIST_FEATURES:
+            return json.loads(value)
+        # 旧版本的表中计数列为 REAL，输出时统一转换为整数
+        if column in INTEGER_FEATURES and value is not None:
+            return int(value)
+        return value
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        where, params = self._where(filters)
+        with self._connect() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM book_features{where}', params).fetchone()[0]
+
+    def aggregate(self, columns: Iterable[str], filters: Optional[Dict[str, Any]] = None,
+                  group_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        各数值特征的 count/mean/min/max/p50/p90。指定 group_by (文本特征，如 type) 时按组统计。
+        返回 {组: {特征: {统计量: 值}}}，不分组时组名为 "all"
+        """
+        columns = list(columns)
+        unknown = [c for c in columns if c not in NUMERIC_FEATURES]
+        if unknown or (group_by and group_by not in TEXT_FEATURES):
+            raise ValueError(f"无法聚合: {', '.join(unknown or [group_by])}")
+        where, params = self._where(filters)
+        group = group_by or "'all'"
+        with self._connect() as conn:
+            rows = conn.execute(f'SELECT {group}, {", ".join(columns)} FROM book_features{where}', params).fetchall()
+
+        groups: Dict[str, List[tuple]] = {}
+        for row in rows:
+            groups.setdefault(str(row[0]) if row[0] is not None else 'unknown', []).append(tuple(row)[1:])
+        stats = {}
+        for name, values in groups.items():
+            matrix = np.array(values, dtype=np.float64).reshape(len(values), len(columns))
+            stats[name] = {}
+            for j, column in enumerate(columns):
+                column_values = matrix[:, j][~np.isnan(matrix[:, j])]
+                if not len(column_values):
+                    stats[name][column] = {'count': 0}
+                    continue
+                p50, p90 = np.percentile(column_values, [50, 90])
+                stats[name][column] = {
+                    'count': int(len(column_values)),
+                    'mean': round(float(column_values.mean()), 4),
+                    'min': round(float(column_values.min()), 4),
+                    'max': round(float(column_values.max()), 4),
+                    'p50': round(float(p50), 4),
+                    'p90': round(float(p90), 4)
+                }
+        return stats
+
+    def _feature_matrix(self) -> Tuple[List[str], np.ndarray]:
+        with self._connect() as conn:
+            # 修订号与特征行在同一个读事务中读取
+            conn.execute('BEGIN')
+            revision = conn.execute('SELECT revision FROM corpus_revision').fetchone()[0]
+            with self._lock:
+                if self._matrix is not None and self._matrix[0] == revision:
+                    return self._matrix[1:]
+            rows = conn.execute(f'SELECT result_id, themes, {", ".join(NUMERIC_FEATURES)} '
+                                f'FROM book_features').fetchall()
+        ids = [row[0] for row in rows]
+        numeric = np.array([tuple(row)[2:] for row in rows], dtype=np.float64).reshape(len(rows), -1)
+        # 数值特征标准化 (z-score)，缺失值视为均值
+        mean = np.nanmean(numeric, axis=0) if len(rows) else np.zeros(numeric.shape[1])
+        std = np.nanstd(numeric, axis=0) if len(rows) else np.ones(numeric.shape[1])
+        mean = np.nan_to_num(mean)
+        std = np.where(np.nan_to_num(std) > 0, np.nan_to_num(std), 1)
+        numeric = np.nan_to_num((numeric - mean) / std)
+        # 主题词袋 (哈希到固定维度，L2 归一化)
+        themes = np.zeros((len(rows), THEME_DIMENSIONS))
+        for i, row in enumerate(rows):
+            for theme in json.loads(row[1] or '[]'):
+                for word in str(theme).lower().split():
+                    themes[i, zlib.crc32(word.encode('utf-8')) % THEME_DIMENSIONS] += 1
+        themes /= np.maximum(np.linalg.norm(themes, axis=1, keepdims=True), 1e-12)
+        numeric /= np.sqrt(numeric.shape[1])
+        vectors = np.hstack([numeric, THEME_WEIGHT * themes])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._matrix = (revision, ids, vectors)
+        return ids, vectors
+
+    def similar(self, result_id: str, k: int = 5) -> List[Dict[str, Any]]:
+        """与指定书籍最相似的 k 本书 (特征向量的余弦相似度)"""
+        ids, vectors = self._feature_matrix()
+        if result_id not in ids:
+            raise KeyError(result_id)
+        i = ids.index(result_id)
+        similarity = vectors @ vectors[i]
+        similarity[i] = -np.inf
+        top = [j for j in np.argsort(-similarity)[:k] if np.isfinite(similarity[j])]
+        with self._connect() as conn:
+            titles = dict(conn.execute(
+                f'SELECT result_id, title FROM book_features WHERE result_id IN ({", ".join("?" * len(top))})',
+                [ids[j] for j in top]).fetchall())
+        return [{'result_id': ids[j], 'title': titles.get(ids[j]), 'similarity': round(float(similarity[j]), 4)}
+                for j in top]
+
+    def stats(self) -> Dict[str, Any]:
+        return {'books': self.count()}
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from async_crawler import Page
+
+
+class CachedPage(NamedTuple):
+    page: Page
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # 仍在有效期内，可以不经网络直接使用
+    fresh: bool
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求头：页面未变化时服务器返回 304"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CrawlCache:
+    """
+    网页爬取缓存 (SQLite)。
+    以 URL 为键保存提取后的页面 (标题、正文、后续链接) 及其 ETag/Last-Modified。
+    有效期 (ttl 秒) 内直接返回，不发请求也不解析；过期后发送条件请求，
+    服务器返回 304 时继续使用缓存的提取结果。总大小超过 max_bytes 时淘汰最久未使用的条目。
+    version 为正文提取算法的版本，算法变化后旧条目自动失效。
+    """
+
+    def __init__(self, db_path: str, version: str, ttl: float = 3600, max_bytes: int = 100 * 1024 * 1024):
+        self.db_path = db_path
+        self.version = version
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        # 过期条目的查找次数，其中 revalidated 次得到 304
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS pages ('
+                         'key TEXT PRIMARY KEY, page TEXT, etag TEXT, last_modified TEXT, '
+                         'fetched_at REAL, last_access REAL, size INTEGER)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_access ON pages (last_access)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _key(self, url: str, kind: str) -> str:
+        return f"{self.version}:{kind}:{url}"
+
+    def get(self, url: str, kind: str = 'novel') -> Optional[CachedPage]:
+        """kind 区分同一 URL 的不同提取方式 (小说/新闻)"""
+        key = self._key(url, kind)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT page, etag, last_modified, fetched_at FROM pages WHERE key = ?',
+                               (key,)).fetchone()
+            if row:
+                conn.execute('UPDATE pages SET last_access = ? WHERE key = ?', (now, key))
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        page, etag, last_modified, fetched_at = row
+        fresh = now - fetched_at < self.ttl
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+        return CachedPage(Page(*json.loads(page)), etag, last_modified, fresh)
+
+    def put(self, url: str, page: Page, etag: Optional[str] = None, last_modified: Optional[str] = None,
+            kind: str = 'novel'):
+        value = json.dumps(page, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (self._key(url, kind), value, etag, last_modified, now, now, len(value.encode('utf-8'))))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+            if total > self.max_bytes:
+                # 按最近使用时间保留不超过 max_bytes 的条目，其余淘汰
+                conn.execute('DELETE FROM pages WHERE rowid IN (SELECT rowid FROM ('
+                             'SELECT rowid, SUM(size) OVER (ORDER BY last_access DESC, rowid DESC) AS kept '
+                             'FROM pages) WHERE kept > ?)', (self.max_bytes,))
+
+    def touch(self, url: str, kind: str = 'novel'):
+        """条件请求返回 304：页面未变化，重新开始计算有效期"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute('UPDATE pages SET fetched_at = ?, last_access = ? WHERE key = ?',
+                         (now, now, self._key(url, kind)))
+            self.revalidated += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+            lookups = self.hits + self.stale + self.misses
+            return {
+                'hits': self.hits,
+                'stale': self.stale,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.revalidated) / lookups, 3) if lookups else 0,
+                'entries': entries,
+                'size_mb': round(size / 1024 / 1024, 2)
+            }
@@ -0,0 +1,223 @@
+import hashlib
+import re
+import numpy as np
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from nltk import sent_tokenize, word_tokenize
+from nltk.data import load
+from nltk.tokenize import NLTKWordTokenizer
+
+# 与 nltk.word_tokenize 使用同一个分词器，保证结果一致
+_word_tokenizer = NLTKWordTokenizer()
+
+
+def _span_tokenize_words(sentence: str) -> List[Tuple[int, int]]:
+    try:
+        return list(_word_tokenizer.span_tokenize(sentence))
+    except ValueError:
+        # 个别引号变换无法对齐时，按顺序查找每个词的位置
+        spans = []
+        pos = 0
+        for token in _word_tokenizer.tokenize(sentence):
+            i = sentence.find(token, pos)
+            if i < 0:
+                continue
+            spans.append((i, i + len(token)))
+            pos = i + len(token)
+        return spans
+
+
+def chapter_hash(chapter: str) -> str:
+    return hashlib.sha256(chapter.encode('utf-8')).hexdigest()
+
+
+# 词哈希使用的多项式底数 (奇数，模 2^64 下可逆)
+_HASH_BASE = 1000003
+_APOSTROPHES = (0x2019, 0x2018)
+# 分窗口切词的窗口长度 (字符)，临时数组的大小与窗口而不是全文成正比
+WORD_SCAN_WINDOW = 1 << 18
+# 记录哈希的词尾长度 (用于识别 n't 等后缀)
+TAIL_LENGTH = 3
+# 窗口只在不属于任何词的字符处切分
+_WORD_BREAK = re.compile(r"[^A-Za-z'\u2018\u2019]")
+
+
+class WordScan(NamedTuple):
+    """整段文本的英文单词扫描结果：每个词的起止偏移、哈希和词尾哈希 (不足 TAIL_LENGTH 个字符为 0)"""
+    starts: np.ndarray
+    ends: np.ndarray
+    hashes: np.ndarray
+    tails: np.ndarray
+
+
+def hash_words(words: Iterable[str]) -> np.ndarray:
+    """与 scan_words 一致的词哈希 (输入须为小写)"""
+    hashes = []
+    for word in words:
+        h = 0
+        for j, c in enumerate(word):
+            h = (h + ord(c) * pow(_HASH_BASE, j, 2 ** 64)) % 2 ** 64
+        hashes.append(h)
+    return np.array(hashes, dtype=np.uint64)
+
+
+def _scan_window(text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # UTF-32 编码后每个字符对应一个码点，下标与字符串偏移一致
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).copy()
+    codes[(codes >= 65) & (codes <= 90)] += 32
+    codes[np.isin(codes, _APOSTROPHES)] = ord("'")
+    letter = (codes >= 97) & (codes <= 122)
+    inner = np.zeros_like(letter)
+    inner[1:-1] = (codes[1:-1] == ord("'")) & letter[:-2] & letter[2:]
+    edges = np.diff(np.concatenate(([False], letter | inner, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        empty = np.zeros(0, dtype=np.uint64)
+        return starts, ends, empty, empty
+
+    # h(s, e) = (S[e] - S[s]) * B^-s，S 为 c_j * B^j 的前缀和 (uint64 自然溢出即模 2^64)
+    n = len(codes)
+    one = np.ones(1, dtype=np.uint64)
+    base = np.full(n - 1, _HASH_BASE, dtype=np.uint64)
+    inverse_base = np.full(n - 1, pow(_HASH_BASE, -1, 2 ** 64), dtype=np.uint64)
+    powers = np.concatenate((one, np.cumprod(base)))
+    inverse = np.concatenate((one, np.cumprod(inverse_base)))
+    prefix = np.concatenate(([np.uint64(0)], np.cumsum(codes.astype(np.uint64) * powers)))
+    hashes = (prefix[ends] - prefix[starts]) * inverse[starts]
+    tail_starts = np.maximum(ends - TAIL_LENGTH, 0)
+    tails = np.where(ends - starts >= TAIL_LENGTH,
+                     (prefix[ends] - prefix[tail_starts]) * inverse[tail_starts], np.uint64(0))
+    return starts, ends, hashes, tails
+
+
+def scan_words(text: str, window: int = WORD_SCAN_WINDOW) -> WordScan:
+    """
+    向量化切词：不逐词构造字符串，用前缀和算出所有词的多项式哈希作为词 id。
+    词由 ASCII 字母组成 (忽略大小写)，词中的撇号 (don't) 算作词的一部分。
+    长文本按 window 个字符分窗口处理 (在词之间切分)，结果与整体处理相同。
+    """
+    parts = []
+    offset = 0
+    while offset < len(text):
+        end = offset + window
+        if end < len(text):
+            match = _WORD_BREAK.search(text, end)
+            end = match.start() + 1 if match else len(text)
+        starts, ends, hashes, tails = _scan_window(text[offset:end])
+        parts.append((starts + offset, ends + offset, hashes, tails))
+        offset = end
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return WordScan(empty, empty, np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64))
+    return WordScan(*(np.concatenate(columns) for columns in zip(*parts)))
+
+
+class NovelDocument:
+    """
+    共享分词结果的文档模型。
+    全文只分句一次，得到句子偏移数组；分词按句子惰性进行并缓存，
+    每个句子最多被分词一次。各分析阶段按字符区间读取句子和词，
+    不再各自重复调用 sent_tokenize/word_tokenize。
+    """
+
+    def __init__(self, text: str, chapters: List[str], chapter_lengths: List[int] = None,
+                 chapter_word_counts: List[int] = None, chapter_hashes: List[str] = None):
+        self.text = text
+        # 流式分析时 chapters 只保存每章开头部分，真实长度和词数单独传入
+        self.chapters = chapters
+        self.chapter_lengths = chapter_lengths or [len(c) for c in chapters]
+        self.chapter_word_counts = chapter_word_counts or [len(c.split()) for c in chapters]
+        self.chapter_spans = self._locate_chapters(text, chapters)
+        # 章节内容哈希 (增量分析的缓存键)；流式分析时由调用方根据完整章节计算
+        self._chapter_hashes = chapter_hashes
+
+        sentence_tokenizer = load("tokenizers/punkt/english.pickle")
+        self.sentence_spans = np.array(list(sentence_tokenizer.span_tokenize(text)),
+                                       dtype=np.int64).reshape(-1, 2)
+        # 每个句子的词偏移 (相对全文)，未分词的句子为 None
+        self._sentence_tokens: List[Optional[np.ndarray]] = [None] * len(self.sentence_spans)
+
+    @staticmethod
+    def _locate_chapters(text: str, chapters: List[str]) -> np.ndarray:
+        # 章节是预处理后文本的子串，顺序查找其起止偏移；不在 text 中的章节记为 (-1, -1)
+        spans = []
+        pos = 0
+        for chapter in chapters:
+            start = text.find(chapter, pos)
+            if start < 0:
+                spans.append((-1, -1))
+                continue
+            end = start + len(chapter)
+            spans.append((start, end))
+            pos = end
+        return np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+    def chapter_hashes(self) -> List[str]:
+        if self._chapter_hashes is None:
+            self._chapter_hashes = [chapter_hash(c) for c in self.chapters]
+        return self._chapter_hashes
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentence_spans)
+
+    def sentence_range(self, start: int = 0, end: int = None) -> Tuple[int, int]:
+        """起始位置落在 [start, end) 内的句子下标区间"""
+        starts = self.sentence_spans[:, 0]
+        end = len(self.text) if end is None else end
+        return int(np.searchsorted(starts, start, 'left')), int(np.searchsorted(starts, end, 'left'))
+
+    def sentences(self, start: int = 0, end: int = None) -> List[str]:
+        i, j = self.sentence_range(start, end)
+        return [self.text[s:e] for s, e in self.sentence_spans[i:j]]
+
+    def tokenize(self, start: int = 0, end: int = None):
+        """对区间内尚未分词的句子进行分词"""
+        i, j = self.sentence_range(start, end)
+        for k in range(i, j):
+            if self._sentence_tokens[k] is None:
+                s, e = self.sentence_spans[k]
+                spans = _span_tokenize_words(self.text[s:e])
+                self._sentence_tokens[k] = np.array(spans, dtype=np.int64).reshape(-1, 2) + s
+
+    def token_spans(self, start: int = 0, end: int = None) -> np.ndarray:
+        """区间内所有句子的词偏移数组，形状为 (n, 2)"""
+        self.tokenize(start, end)
+        i, j = self.sentence_range(start, end)
+        if i == j:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(self._sentence_tokens[i:j])
+
+    def words(self, start: int = 0, end: int = None) -> List[str]:
+        text = self.text
+        return [text[s:e] for s, e in self.token_spans(start, end).tolist()]
+
+    def word_count(self, start: int = 0, end: int = None) -> int:
+        self.tokenize(start, end)
+        i, j = self.sentence_range(start, end)
+        return sum(len(t) for t in self._sentence_tokens[i:j])
+
+    def chapter_start(self, index: int) -> int:
+        return int(self.chapter_spans[index, 0])
+
+    def chapter_sentences(self, index: int, limit: Optional[int] = None) -> List[str]:
+        """章节前 limit 个字符内的句子 (默认整章)"""
+        start = self.chapter_start(index)
+        limit = len(self.chapters[index]) if limit is None else limit
+        if start < 0:
+            return sent_tokenize(self.chapters[index][:limit])
+        return self.sentences(start, start + limit)
+
+    def chapter_words(self, index: int, limit: int) -> List[str]:
+        """章节前 limit 个字符内的词"""
+        start = self.chapter_start(index)
+        if start < 0:
+            return word_tokenize(self.chapters[index][:limit])
+        return self.words(start, start + limit)
+
+    def chapter_token_count(self, index: int, limit: int) -> int:
+        """章节前 limit 个字符内的词数"""
+        start = self.chapter_start(index)
+        if start < 0:
+            return len(word_tokenize(self.chapters[index][:limit]))
+        return self.word_count(start, start + limit)
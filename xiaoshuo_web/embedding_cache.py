@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    短语嵌入向量的磁盘缓存 (SQLite)。
+    以 (模型名, 短语) 为键保存 float32 向量。不同小说的候选短语大量重复，
+    命中缓存的短语不再经过嵌入模型。
+    查询只读数据库：命中时间先记在内存中，下次写入时一并保存。
+    """
+
+    def __init__(self, db_path: str, model_name: str, max_entries: int = 500000):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 尚未写入数据库的命中时间 {短语: last_access}
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS embeddings ('
+                         'model TEXT, phrase TEXT, vector BLOB, last_access REAL, PRIMARY KEY (model, phrase))')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings (last_access)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, phrases: List[str]) -> Dict[str, np.ndarray]:
+        """返回命中缓存的 {短语: 向量}"""
+        found = {}
+        with self._connect() as conn:
+            # 分批查询，避免超过 SQLite 的参数个数限制
+            for i in range(0, len(phrases), 500):
+                batch = phrases[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(f'SELECT phrase, vector FROM embeddings WHERE model = ? '
+                                    f'AND phrase IN ({placeholders})', [self.model_name] + batch)
+                found.update((phrase, np.frombuffer(vector, dtype=np.float32)) for phrase, vector in rows)
+
+        with self._lock:
+            now = time.time()
+            self._touched.update((phrase, now) for phrase in found)
+            self.hits += len(found)
+            self.misses += len(set(phrases)) - len(found)
+        return found
+
+    def put(self, vectors: Dict[str, np.ndarray]):
+        if not vectors:
+            return
+        now = time.time()
+        rows = [(self.model_name, phrase, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for phrase, vector in vectors.items()]
+        with self._lock, self._connect() as conn:
+            # 先写入之前的命中时间，淘汰按真实的使用顺序进行
+            conn.executemany('UPDATE embeddings SET last_access = ? WHERE model = ? AND phrase = ?',
+                             [(t, self.model_name, phrase) for phrase, t in self._touched.items()])
+            self._touched.clear()
+            conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)', rows)
+            count = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+            if count > self.max_entries:
+                # 淘汰最久未使用的条目
+                conn.execute('DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings '
+                             'ORDER BY last_access LIMIT ?)', (count - self.max_entries,))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
@@ -0,0 +1,155 @@
+import codecs
+import re
+from typing import Dict, Optional
+
+from lxml import etree
+
+from async_crawler import Page, find_links
+
+# 提取算法的版本，变化后爬取缓存中的旧结果失效
+EXTRACTOR_VERSION = "2"
+
+# 正文提取前移除的干扰元素
+NOISE_TAGS = ('script', 'style', 'noscript', 'nav', 'footer', 'iframe', 'header', 'aside', 'form', 'button',
+              'select', 'svg')
+# 作为一个 "段落" 整体计分的元素
+PARAGRAPH_TAGS = {'p', 'pre', 'td', 'blockquote', 'li', 'dd'}
+# 其余元素的直接文本 (如以 <br> 分行的小说正文) 也按段落计分
+MIN_PARAGRAPH_LENGTH = 25
+# class/id 中出现这些词的元素加分或减分
+POSITIVE_HINT = re.compile(r'content|article|chapter|text|body|entry|main|post|read|novel|story', re.IGNORECASE)
+NEGATIVE_HINT = re.compile(r'comment|footer|sidebar|nav|menu|share|related|header|banner|ad-|ads|recommend|copyright',
+                           re.IGNORECASE)
+CLASS_WEIGHT = 25
+# 参与链接密度修正的高分候选数
+TOP_CANDIDATES = 5
+# 新闻 <article> 与最佳候选的最小正文长度，不足时退回全文
+MIN_CONTENT_LENGTH = 200
+
+CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+PUNCTUATION = re.compile(r'[,，、。.!?！？;；]')
+
+
+def _encoding(content: bytes, charset: Optional[str] = None) -> str:
+    """
+    页面编码：优先响应头 Content-Type 的 charset，其次 <meta> 声明，
+    Python 不认识的编码名跳过；都没有时尝试 UTF-8，最后按 GB18030 (中文站点常见)
+    """
+    match = CHARSET.search(content[:4096])
+    for candidate in (charset, match.group(1).decode('ascii') if match else None):
+        if not candidate:
+            continue
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+
+def _paragraph_score(text: str) -> float:
+    # 文字越长、标点越多越像正文 (与 Readability 相同的思路)
+    return 1 + min(len(PUNCTUATION.findall(text)), 20) + min(len(text) / 100, 3)
+
+
+def _class_weight(element) -> int:
+    hint = f"{element.get('class', '')} {element.get('id', '')}"
+    weight = 0
+    if POSITIVE_HINT.search(hint):
+        weight += CLASS_WEIGHT
+    if NEGATIVE_HINT.search(hint):
+        weight -= CLASS_WEIGHT
+    return weight
+
+
+# 元素的全部文本 (XPath string()，在 C 中拼接)
+_string = etree.XPath('string()')
+
+
+def _text(element) -> str:
+    return ' '.join(' '.join(element.itertext()).split())
+
+
+def _link_density(element, text_length: int) -> float:
+    link_length = sum(len(_text(a)) for a in element.iter('a'))
+    return link_length / text_length if text_length else 1
+
+
+def best_candidate(root) -> Optional[etree._Element]:
+    """
+    一次遍历为所有元素计分：每个段落的得分全部计入父元素、一半计入祖父元素；
+    没有段落包裹的直接文本计入元素自身、一半计入父元素。
+    得分最高的几个候选再按 class/id 提示和链接密度修正，返回最可能的正文容器。
+    """
+    scores: Dict[etree._Element, float] = {}
+
+    def add(element, score: float):
+        if element is not None:
+            scores[element] = scores.get(element, 0) + score
+
+    for element in root.iter(etree.Element):
+        tag = element.tag
+        if tag in PARAGRAPH_TAGS:
+            text = _string(element).strip()
+            if len(text) >= MIN_PARAGRAPH_LENGTH:
+                score = _paragraph_score(text)
+                parent = element.getparent()
+                add(parent, score)
+                add(parent.getparent() if parent is not None else None, score / 2)
+        elif tag != 'a':
+            # 直接文本: 元素自身的 text 加上各子元素之后的 tail
+            own = (element.text or '') + ''.join(child.tail or '' for child in element)
+            own = own.strip()
+            if len(own) >= MIN_PARAGRAPH_LENGTH:
+                score = _paragraph_score(own)
+                add(element, score)
+                add(element.getparent(), score / 2)
+
+    if not scores:
+        return None
+    top = sorted(scores, key=scores.get, reverse=True)[:TOP_CANDIDATES]
+    best, best_score = None, float('-inf')
+    for element in top:
+        text_length = len(_text(element))
+        score = (scores[element] + _class_weight(element)) * (1 - _link_density(element, text_length))
+        if score > best_score:
+            best, best_score = element, score
+    return best
+
+
+def extract_page(content: bytes, url: str, is_news: bool = False, charset: Optional[str] = None) -> Page:
+    """
+    用 lxml 解析页面，返回标题、正文 (按文本密度选出的正文容器) 和继续抓取用的链接。
+    charset 为响应头声明的编码。
+    """
+    # 在 Python 中解码后按 UTF-8 交给 lxml：libxml2 不一定支持 Python 的所有编码名，个别错误字节替换掉
+    text = content.decode(_encoding(content, charset), errors='replace')
+    root = etree.fromstring(text.encode('utf-8'), etree.HTMLParser(encoding='utf-8'))
+    if root is None:
+        return Page("未命名文档", '', None, [])
+
+    title = ' '.join((root.findtext('.//title') or '').split()) or "未命名文档"
+
+    # 导航链接在移除干扰元素之前收集 ("下一章" 通常位于 nav/footer 中)
+    links = [(a.get('href'), _string(a), a.get('rel') or '') for a in root.iter('a') if a.get('href')]
+    next_url, chapter_links = find_links(links, url)
+
+    etree.strip_elements(root, *NOISE_TAGS, etree.Comment, with_tail=False)
+    body = root.find('body')
+    if body is None:
+        body = root
+
+    node = None
+    if is_news:
+        node = next((a for a in body.iter('article') if len(_text(a)) >= MIN_CONTENT_LENGTH), None)
+    if node is None:
+        node = best_candidate(body)
+    text = _text(node) if node is not None else ''
+    if len(text) < MIN_CONTENT_LENGTH:
+        # 没有明显的正文容器 (如目录页或很短的页面)，取整个 body 的文本
+        text = _text(body)
+
+    return Page(title, text, next_url, chapter_links)
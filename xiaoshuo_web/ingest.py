@@ -0,0 +1,108 @@
+import mmap
+import os
+import re
+from typing import Callable, Iterator, Optional, Tuple
+
+# 行首章节标题。上传文件的流式分章与内存分析 (SimpleNovelAnalyzer._split_into_chapters) 都使用这套规则
+CHAPTER_HEADING = re.compile(rb'[ \t\r\f\v]*(?:(?:CHAPTER|Chapter)\s+(?:[0-9]+|[IVXLCDM]+|[A-Za-z]+)|[0-9]+\.\s+)')
+
+# 单次读取一行的最大字符数，防止没有换行的超长文本一次读入内存
+LINE_READ_LIMIT = 64 * 1024
+_TRAILING_WORD = re.compile(r'\S+$')
+# 尚未发现章节标题时按固定长度 (字节) 切分
+FALLBACK_CHUNK_SIZE = 10000
+# 发现章节标题后单章的最大长度 (字节)，超长章节会被切开以限制内存
+MAX_CHAPTER_LENGTH = 200000
+# 短于该长度的片段视为目录或标题，直接丢弃
+MIN_CHAPTER_LENGTH = 200
+
+
+def iter_lines(f) -> Iterator[Tuple[str, bool]]:
+    """逐行读取，返回 (文本, 是否位于行首)；超长行会在空白处被拆成多段"""
+    at_line_start = True
+    pending = ""
+    while True:
+        chunk = f.readline(LINE_READ_LIMIT)
+        if not chunk:
+            if pending:
+                yield pending, at_line_start
+            break
+        line = pending + chunk
+        pending = ""
+        if not line.endswith('\n'):
+            # 行被截断：末尾不完整的词留到下一段，避免把一个词拆开
+            tail = _TRAILING_WORD.search(line)
+            if tail and tail.start() > 0:
+                line, pending = line[:tail.start()], line[tail.start():]
+        yield line, at_line_start
+        at_line_start = line.endswith('\n')
+
+
+def scan_chapter_spans(buf) -> Iterator[Tuple[int, int]]:
+    """
+    扫描字节缓冲区 (bytes 或 mmap)，返回每章正文的字节区间 [start, end)。
+    章节标题行本身不计入正文；超长章节在行边界或空白处切开，
+    切分点总是落在 UTF-8 字符边界上。
+    """
+    n = len(buf)
+    pos = 0
+    start = 0
+    seen_heading = False
+
+    def keep(s: int, e: int) -> bool:
+        return e - s > MIN_CHAPTER_LENGTH and len(buf[s:e].strip()) > MIN_CHAPTER_LENGTH
+
+    while pos < n:
+        newline = buf.find(b'\n', pos)
+        line_end = n if newline < 0 else newline + 1
+
+        if CHAPTER_HEADING.match(buf, pos, line_end):
+            if keep(start, pos):
+                yield start, pos
+            seen_heading = True
+            start = pos = line_end
+            continue
+
+        limit = MAX_CHAPTER_LENGTH if seen_heading else FALLBACK_CHUNK_SIZE
+        if line_end - start > limit and pos > start:
+            # 在行边界处切分
+            yield start, pos
+            start = pos
+        while line_end - start > limit:
+            # 单行超长，在空白处切分
+            cut = buf.rfind(b' ', start + limit // 2, start + limit)
+            if cut < 0:
+                cut = start + limit
+                while cut < line_end and buf[cut] & 0xC0 == 0x80:
+                    cut += 1
+            else:
+                cut += 1
+            yield start, cut
+            start = cut
+        pos = line_end
+
+    if keep(start, n) or (not seen_heading and buf[start:n].strip()):
+        yield start, n
+
+
+def decode_chapter(raw: bytes, encoding: str = 'utf-8') -> str:
+    """解码章节字节并把连续空白规范化为单个空格"""
+    return " ".join(raw.decode(encoding).split())
+
+
+def iter_chapters(path: str, encoding: str = 'utf-8',
+                  progress: Optional[Callable[[float], None]] = None) -> Iterator[str]:
+    """
+    流式读取文本文件，边扫描边识别章节边界，逐章产出空白已规范化的章节文本。
+    文件通过 mmap 访问，任意时刻只解码当前章节，峰值内存与文件大小无关。
+    progress(fraction) 在每产出一章后被调用，fraction 为已扫描字节的比例。
+    需要重复访问章节时请使用 chapter_index.ChapterIndex。
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start, end in scan_chapter_spans(mm):
+            yield decode_chapter(mm[start:end], encoding)
+            if progress:
+                progress(end / size)
@@ -0,0 +1,100 @@
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 可选：C 实现的 Aho-Corasick 自动机
+try:
+    import ahocorasick
+
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+def build_aliases(names: List[str], stop_words: Iterable[str]) -> Dict[str, str]:
+    """
+    为多词人名生成别名 (如 "Phineas Finn" -> "Phineas", "Finn")。
+    只保留唯一对应一个人名、且本身不是候选人名的别名，避免 "Lord X"/"Lady X" 混淆。
+    """
+    stop_words = set(stop_words)
+    lowered_names = {n.lower() for n in names}
+    owners: Dict[str, set] = {}
+    for name in names:
+        tokens = re.findall(r"[A-Za-z][\w'-]*", name)
+        if len(tokens) < 2:
+            continue
+        for token in tokens:
+            key = token.lower()
+            if len(token) > 2 and token[0].isupper() and key not in stop_words and key not in lowered_names:
+                owners.setdefault(token, set()).add(name)
+    return {alias: next(iter(owner)) for alias, owner in owners.items() if len(owner) == 1}
+
+
+def _lower(text: str) -> str:
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # 个别字符小写后长度变化 (如 'İ')，逐字符处理以保持偏移一致
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+class MentionIndex:
+    """
+    人物提及索引。
+    所有候选人名及其别名编译成一个多模式自动机，每段文本 (如一章) 只扫描一次，
+    得到其中每个人物的提及位置 (不区分大小写，按词边界匹配)。
+    未安装 pyahocorasick 时退化为一个最长优先的正则交替式，同样只扫描一遍。
+    """
+
+    def __init__(self, names: List[str], aliases: Optional[Dict[str, str]] = None):
+        self.names = list(names)
+        self._patterns: Dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self._patterns[name.lower()] = i
+        for alias, name in (aliases or {}).items():
+            # 别名不覆盖正式人名
+            self._patterns.setdefault(alias.lower(), self.names.index(name))
+
+        self._automaton = None
+        self._regex = None
+        if self._patterns and AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for pattern, name_id in self._patterns.items():
+                self._automaton.add_word(pattern, (len(pattern), name_id))
+            self._automaton.make_automaton()
+        elif self._patterns:
+            alternation = "|".join(re.escape(p) for p in sorted(self._patterns, key=len, reverse=True))
+            self._regex = re.compile(r'(?<!\w)(?:' + alternation + r')(?!\w)')
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """返回 (起始, 结束, 人物下标)，按位置排序，互不重叠 (同一位置取最长匹配)"""
+        lowered = _lower(text)
+        if self._regex is not None:
+            return [(m.start(), m.end(), self._patterns[m.group()]) for m in self._regex.finditer(lowered)]
+        if self._automaton is None:
+            return []
+
+        n = len(lowered)
+        candidates = []
+        for end_index, (length, name_id) in self._automaton.iter(lowered):
+            start, end = end_index - length + 1, end_index + 1
+            # 词边界检查
+            if (start > 0 and lowered[start - 1].isalnum()) or (end < n and lowered[end].isalnum()):
+                continue
+            candidates.append((start, -length, name_id))
+        candidates.sort()
+
+        matches = []
+        last_end = 0
+        for start, neg_length, name_id in candidates:
+            if start >= last_end:
+                matches.append((start, start - neg_length, name_id))
+                last_end = start - neg_length
+        return matches
+
+    def text_positions(self, text: str) -> List[np.ndarray]:
+        """单段文本 (如一章) 中每个人物的提及起始偏移"""
+        matches = self.find(text)
+        starts = np.array([m[0] for m in matches], dtype=np.int64)
+        ids = np.array([m[2] for m in matches], dtype=np.int64)
+        return [starts[ids == i] for i in range(len(self.names))]
@@ -0,0 +1,88 @@
+import gc
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ModelRegistry:
+    """
+    重量级模型的延迟加载注册表。
+    每个模型在第一次 get() 时才加载，并发请求只会加载一次；
+    加载失败 (或加载函数返回 None) 时记为不可用，get() 返回 None。
+    warm_up() 在后台线程中提前加载，preload() 在 fork 工作进程前同步加载，
+    使子进程以写时复制 (copy-on-write) 的方式共享模型内存。
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.time()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    print(f"模型 {name} 加载失败: {e}")
+                    self._errors[name] = str(e)
+                    self._models[name] = None
+                self._load_times[name] = round(time.time() - start, 3)
+            return self._models[name]
+
+    def _load_all(self, names: Optional[Iterable[str]] = None):
+        # 加载过程中可能注册新的模型 (如分析器模块被导入时)，循环直到没有新的条目
+        done = set()
+        while True:
+            pending = [n for n in (names or list(self._loaders)) if n not in done]
+            if not pending:
+                break
+            for name in pending:
+                self.get(name)
+                done.add(name)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """在后台守护线程中依次加载模型，不阻塞启动"""
+        with self._lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(target=self._load_all, args=(names,),
+                                                       name='model-warmup', daemon=True)
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        """同步加载全部模型并冻结 GC，之后 fork 的子进程不会因引用计数之外的 GC 扫描复制这些页"""
+        self._load_all(names)
+        gc.freeze()
+
+    def state(self, name: str) -> str:
+        if name in self._models:
+            return 'ready' if self._models[name] is not None else 'unavailable'
+        return 'loading' if self._locks[name].locked() else 'pending'
+
+    def is_ready(self) -> bool:
+        return all(name in self._models for name in list(self._loaders))
+
+    def status(self) -> Dict[str, Any]:
+        models = {}
+        for name in list(self._loaders):
+            models[name] = {'state': self.state(name), 'load_time': self._load_times.get(name)}
+            if name in self._errors:
+                models[name]['error'] = self._errors[name]
+        return {'ready': self.is_ready(), 'models': models}
+
+
+# 进程内共享的全局注册表
+registry = ModelRegistry()
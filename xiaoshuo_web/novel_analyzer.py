@@ -1,14 +1,35 @@
 import os
-import re
+import time
+import json
+import hashlib
+import threading
+import multiprocessing
+from functools import partial
+from importlib.util import find_spec
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from collections import Counter
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Callable, Iterable, Optional
 import nltk
-from nltk import sent_tokenize, word_tokenize
+from nltk import sent_tokenize
 from nltk.corpus import stopwords
 import requests
-from bs4 import BeautifulSoup
-from textblob import TextBlob
+from document import NovelDocument, chapter_hash
+from ingest import decode_chapter, scan_chapter_spans
+from ner_engine import NEREngine
+from mention_index import MentionIndex, build_aliases
+from cooccurrence import CooccurrenceGraph, DEFAULT_WINDOW
+from model_registry import registry
+from chapter_cache import ChapterCache
+from sentiment_engine import SentimentEngine, SentimentScores, smooth
+from summary_engine import SummaryEngine
+from theme_engine import ThemeEngine
+from embedding_cache import EmbeddingCache
+from profiler import METRIC_SCOPES, StageProfiler
+from async_crawler import (AIOHTTP_AVAILABLE, AsyncCrawler, FetchError, Page, MAX_PAGES, CONCURRENCY, PER_HOST,
+                           POLITENESS_DELAY, TIMEOUT, content_charset)
+from extractor import extract_page, EXTRACTOR_VERSION
+from crawl_cache import CrawlCache
 
 # 依赖降级处理
 try:
@@ -18,38 +39,22 @@ try:
 except ImportError:
     TEXTSTAT_AVAILABLE = False
 
-# 初始化 spaCy (用于更好的人名识别)
-nlp = None
+# spaCy (用于更好的人名识别) 与 KeyBERT 导入和加载都很慢，
+# 这里只检查是否已安装，模型在第一次使用时通过 registry 加载
 SPACY_AVAILABLE = False
-try:
-    import spacy
-
-    try:
-        # 尝试加载英文小模型
-        nlp = spacy.load("en_core_web_sm")
-        SPACY_AVAILABLE = True
-    except OSError:
-        print("提示: 未找到 spaCy 模型 'en_core_web_sm'。将使用基础正则进行人物分析。")
-        print("建议运行: python -m spacy download en_core_web_sm")
-except ImportError:
+if find_spec("spacy") is None:
     print("提示: 未安装 spaCy 库。将使用基础正则进行人物分析。")
+elif find_spec("en_core_web_sm") is None:
+    print("提示: 未找到 spaCy 模型 'en_core_web_sm'。将使用基础正则进行人物分析。")
+    print("建议运行: python -m spacy download en_core_web_sm")
+else:
+    SPACY_AVAILABLE = True
 
-# 其他可选库
-try:
-    from keybert import KeyBERT
+KEYBERT_AVAILABLE = find_spec("keybert") is not None
 
-    KEYBERT_AVAILABLE = True
-except ImportError:
-    KEYBERT_AVAILABLE = False
 
-try:
-    from sumy.parsers.plaintext import PlaintextParser
-    from sumy.nlp.tokenizers import Tokenizer
-    from sumy.summarizers.text_rank import TextRankSummarizer
-
-    SUMY_AVAILABLE = True
-except ImportError:
-    SUMY_AVAILABLE = False
+# 离线模式 (如基准测试)：不下载缺失的 NLTK 资源
+OFFLINE = os.environ.get('ANALYZER_OFFLINE') == '1'
 
 
 # NLTK 初始化
@@ -59,327 +64,629 @@ def download_nltk_data():
         try:
             nltk.data.find(f'tokenizers/{res}' if res == 'punkt' else f'corpora/{res}')
         except LookupError:
+            if OFFLINE:
+                print(f"离线模式，跳过 NLTK 资源: {res}")
+                continue
             print(f"正在下载 NLTK 资源: {res}...")
             nltk.download(res, quiet=True)
+    return True
+
+
+def load_spacy_model():
+    if not SPACY_AVAILABLE:
+        return None
+    import spacy
+    return spacy.load("en_core_web_sm")
 
 
-download_nltk_data()
+def load_keybert_model():
+    if not KEYBERT_AVAILABLE:
+        return None
+    from keybert import KeyBERT
+    return KeyBERT(model=KEYBERT_MODEL)
+
+
+# 按需加载的模型 (NLTK 资源检查可能访问网络，同样延迟到第一次使用)
+registry.register('nltk_data', download_nltk_data)
+registry.register('spacy', load_spacy_model)
+registry.register('keybert', load_keybert_model)
+registry.register('sentiment', SentimentEngine)
+
+# 分析器版本：分析算法或结果格式变化时递增，已缓存的结果随之失效
+ANALYZER_VERSION = "1.9"
+
+# 每章摘要与整体摘要的句数
+CHAPTER_SUMMARY_SENTENCES = 2
+OVERALL_SUMMARY_SENTENCES = 4
+# 限制用于耗时分析的文本长度
+ANALYSIS_TEXT_LIMIT = 300000
+# 章节级分析 (摘要、人物统计、章节统计) 读取的每章开头长度
+CHAPTER_HEAD_LENGTH = 5000
+# 降级人名识别与主题词统计读取的文本总长度
+NAME_TAGGING_LIMIT = 100000
+THEME_SAMPLE_LENGTH = 50000
+# 每章保留的高频词个数 (主题词按章缓存后合并)
+THEME_TERMS_PER_CHAPTER = 100
+# KeyBERT 主题提取：嵌入模型、全书切块长度与最多使用的块数
+KEYBERT_MODEL = "all-MiniLM-L6-v2"
+THEME_CHUNK_LENGTH = 2000
+THEME_MAX_CHUNKS = 200
+# 按句情感曲线的最大点数，以及平滑窗口 (高斯核标准差占曲线点数的比例)
+SENTENCE_ARC_POINTS = 200
+ARC_SMOOTHING = 0.03
+
+
+def analyzer_fingerprint() -> str:
+    # 可选依赖是否可用也会影响分析结果，一并计入
+    return (f"{ANALYZER_VERSION};spacy={SPACY_AVAILABLE};keybert={KEYBERT_AVAILABLE};"
+            f"textstat={TEXTSTAT_AVAILABLE};"
+            f"summary_sentences={CHAPTER_SUMMARY_SENTENCES},{OVERALL_SUMMARY_SENTENCES};"
+            f"text_limit={ANALYSIS_TEXT_LIMIT};"
+            f"arc_points={SENTENCE_ARC_POINTS};arc_smoothing={ARC_SMOOTHING};"
+            f"keybert_model={KEYBERT_MODEL};theme_chunks={THEME_CHUNK_LENGTH}x{THEME_MAX_CHUNKS}")
 
 
 class WebCrawler:
-    def __init__(self):
+    """
+    网页内容爬取。安装了 aiohttp 时使用异步爬虫 (连接池复用、按站点限流)，
+    连载小说会沿 "下一章" 链接或目录页抓取多个章节；否则只抓取单页。
+    指定 cache 时按 URL 缓存提取结果，并用 ETag/Last-Modified 重新验证过期页面。
+    """
+
+    def __init__(self, max_pages: int = MAX_PAGES, concurrency: int = CONCURRENCY, per_host: int = PER_HOST,
+                 delay: float = POLITENESS_DELAY, timeout: float = TIMEOUT, cache: Optional[CrawlCache] = None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-
-    def crawl(self, url, is_news=False):
+        self.timeout = timeout
+        self.cache = cache
+        self._session = None
+        self._async_crawler = AsyncCrawler(self.headers, max_pages, concurrency, per_host, delay, timeout,
+                                           cache=cache) if AIOHTTP_AVAILABLE else None
+
+    def crawl_chapters(self, url: str, is_news: bool = False) -> Tuple[str, List[str]]:
+        """返回 (标题, 各章正文)。新闻只抓取单页"""
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # 移除干扰元素
-            for script in soup(["script", "style", "nav", "footer", "iframe", "header", "aside", "form"]):
-                script.decompose()
-
-            title = soup.title.get_text().strip() if soup.title else "未命名文档"
-
-            # 文本提取逻辑
-            if is_news:
-                article = soup.find('article')
-                if article:
-                    text = article.get_text()
-                else:
-                    # 寻找最长的文本块
-                    paragraphs = [p.get_text() for p in soup.find_all('p')]
-                    text = "\n".join(paragraphs)
+            kind = 'news' if is_news else 'novel'
+            if self._async_crawler is not None:
+                parse = partial(extract_page, is_news=is_news)
+                title, chapters = self._async_crawler.crawl(url, parse, follow=not is_news, kind=kind)
             else:
-                # 尝试常见的小说内容容器
-                content_selectors = ['#content', '.content', '.chapter-content', '.read-content', '.novel-text',
-                                     'div[itemprop="articleBody"]']
-                text = ""
-                for selector in content_selectors:
-                    elem = soup.select_one(selector)
-                    if elem:
-                        text = elem.get_text()
-                        break
-                if not text or len(text) < 500:
-                    # 如果没找到或内容太少，尝试获取所有主体文本
-                    text = soup.get_body_text()
-
-            # 清理文本
-            text = re.sub(r'\n+', '\n', text)  # 保留段落结构用于分析
-            text = re.sub(r'\s+', ' ', text).strip()  # 最终清理
-
-            if len(text) < 100:
+                page = self._fetch_page(url, is_news, kind)
+                title, chapters = page.title, [page.text]
+
+            chapters = [c for c in chapters if c]
+            if sum(len(c) for c in chapters) < 100:
                 raise Exception("未能提取到有效内容，该网站可能无法爬取。")
 
-            return title, text
+            return title, chapters
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, FetchError) as e:
             raise Exception(f"网络请求失败: {str(e)}")
         except Exception as e:
             raise Exception(f"爬取失败: {str(e)}")
 
+    def _fetch_page(self, url: str, is_news: bool, kind: str) -> Page:
+        # 未安装 aiohttp 时的单页抓取，同样使用缓存和条件请求
+        cached = self.cache.get(url, kind) if self.cache else None
+        if cached and cached.fresh:
+            return cached.page
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        response = self._session.get(url, timeout=self.timeout, headers=cached.validators() if cached else None)
+        if response.status_code == 304 and cached:
+            self.cache.touch(url, kind)
+            return cached.page
+        response.raise_for_status()
+        page = extract_page(response.content, url, is_news, charset=content_charset(response.headers))
+        if self.cache:
+            self.cache.put(url, page, response.headers.get('ETag'), response.headers.get('Last-Modified'), kind)
+        return page
+
+    def close(self):
+        if self._async_crawler is not None:
+            self._async_crawler.close()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
 
 class SimpleNovelAnalyzer:
-    def __init__(self):
-        self.crawler = WebCrawler()
-        self.kw_model = KeyBERT() if KEYBERT_AVAILABLE else None
-        self.summarizer = TextRankSummarizer() if SUMY_AVAILABLE else None
+    def __init__(self, parallel: bool = False, processes: Optional[int] = None,
+                 ner_batch_size: int = 32, ner_n_process: int = 1, cooccurrence_window: int = DEFAULT_WINDOW,
+                 character_top_n: int = 50, start_method: Optional[str] = None,
+                 chapter_cache_path: Optional[str] = None, chapter_cache_max_entries: int = 100000,
+                 embedding_cache_path: Optional[str] = None, embedding_cache_max_entries: int = 500000,
+                 profile_dir: Optional[str] = None, crawler_options: Optional[Dict[str, Any]] = None,
+                 crawl_cache_path: Optional[str] = None, crawl_cache_ttl: float = 3600,
+                 crawl_cache_max_bytes: int = 100 * 1024 * 1024):
+        # 爬取缓存：短时间内重复分析同一 URL 时不再下载和解析页面
+        self.crawl_cache = CrawlCache(crawl_cache_path, EXTRACTOR_VERSION, crawl_cache_ttl,
+                                      crawl_cache_max_bytes) if crawl_cache_path else None
+        # crawler_options: WebCrawler 的参数 (抓取页数上限、并发数、请求间隔等)
+        self.crawler = WebCrawler(**(crawler_options or {}), cache=self.crawl_cache)
+        # 并行模式：各分析阶段在进程池中执行，绕开 GIL
+        self.parallel = parallel
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # 阶段进程池的启动方式 (默认使用平台默认值)；在已有其他线程的进程中 (如 Web 服务)
+        # 应使用 'spawn' 或 'forkserver'：fork 会继承其他线程持有的锁，子进程可能死锁
+        self.context = multiprocessing.get_context(start_method)
+        # 工作进程本身不能再派生子进程，NER 在其中只能单进程运行
+        self._worker_options = {'ner_batch_size': ner_batch_size, 'ner_n_process': 1,
+                                'cooccurrence_window': cooccurrence_window,
+                                'character_top_n': character_top_n,
+                                'chapter_cache_path': chapter_cache_path,
+                                'chapter_cache_max_entries': chapter_cache_max_entries,
+                                'embedding_cache_path': embedding_cache_path,
+                                'embedding_cache_max_entries': embedding_cache_max_entries,
+                                'profile_dir': profile_dir}
+        self.cooccurrence_window = cooccurrence_window
+        self.character_top_n = character_top_n
+        # 指定目录时每个阶段的 cProfile 结果写入 <profile_dir>/<job_id>/<阶段>.prof
+        self.profile_dir = profile_dir
+        # 章节级结果缓存：重新上传修改过的小说时只重新计算变化的章节
+        self.chapter_cache = ChapterCache(chapter_cache_path, self.fingerprint(),
+                                          chapter_cache_max_entries) if chapter_cache_path else None
+        # 短语嵌入缓存：不同小说的候选短语大量重复
+        self.embedding_cache = EmbeddingCache(embedding_cache_path, KEYBERT_MODEL,
+                                              embedding_cache_max_entries) if embedding_cache_path else None
+        self._theme_engine = None
+        self.ner_batch_size = ner_batch_size
+        self.ner_n_process = ner_n_process
+        self._ner_engine = None
+        registry.get('nltk_data')
         self.stop_words = set(stopwords.words('english'))
         # 添加一些小说中常见的非人物噪音词
         self.stop_words.update(
             ['said', 'asked', 'replied', 'thought', 'looked', 'mr', 'mrs', 'miss', 'lord', 'lady', 'chapter', 'one',
              'two'])
+        self.summarizer = SummaryEngine(self.stop_words)
+
+    @property
+    def ner_engine(self) -> Optional[NEREngine]:
+        if self._ner_engine is None:
+            nlp = registry.get('spacy')
+            if nlp is not None:
+                self._ner_engine = NEREngine(nlp, batch_size=self.ner_batch_size, n_process=self.ner_n_process)
+        return self._ner_engine
+
+    @property
+    def kw_model(self):
+        return registry.get('keybert')
+
+    @property
+    def theme_engine(self) -> Optional[ThemeEngine]:
+        if self._theme_engine is None and self.kw_model is not None:
+            self._theme_engine = ThemeEngine(self.kw_model.model.embed, self.stop_words, self.embedding_cache)
+        return self._theme_engine
+
+    def fetch_chapters_from_url(self, url: str, analysis_type: str) -> Tuple[str, List[str]]:
+        """返回 (标题, 各章正文)，连载小说会跟随 "下一章" 或目录抓取多个章节"""
+        return self.crawler.crawl_chapters(url, is_news=(analysis_type == 'url_news'))
+
+    def analyze_novel_text(self, content: str, title: str = "Analysis Result",
+                           progress_callback: Optional[Callable[[str, int], None]] = None,
+                           chapters: Optional[List[str]] = None, job_id: Optional[str] = None,
+                           partial_callback: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        # progress_callback(stage, progress) 在每个阶段完成后被调用，progress 为 0-100；
+        # partial_callback(字段, 值) 在 novel_info 和每个阶段的结果就绪后立即被调用
+        def report(stage: str, progress: int):
+            if progress_callback:
+                progress_callback(stage, progress)
 
-    def fetch_content_from_url(self, url: str, analysis_type: str) -> Tuple[str, str]:
-        is_news = (analysis_type == 'url_news')
-        return self.crawler.crawl(url, is_news=is_news)
-
-    def analyze_novel_text(self, content: str, title: str = "Analysis Result") -> Dict[str, Any]:
         try:
             if not content or len(content) < 100:
                 return {"error": "文本内容过短，无法进行有效分析（至少需要100个字符）。"}
 
-            # 预处理与章节分割
-            cleaned_content = self._preprocess_novel(content)
-            chapters = self._split_into_chapters(cleaned_content)
+            # 章节分割 (在原文的行结构上识别标题)，各章空白规范化后以空格连接
+            if chapters is None:
+                chapters = self._split_into_chapters(content)
+                cleaned_content = " ".join(chapters)
+            else:
+                # 调用方已完成分章 (如上传文件的章节索引)，content 为各章以空格连接的文本
+                cleaned_content = content
+            report("preprocess", 5)
 
             if not chapters:
                 return {"error": "无法识别章节结构，请确保文本有清晰的章节标记。"}
 
-            # 执行各项分析
-            # 限制用于耗时分析的文本长度
-            analysis_text_limit = 300000
-            text_for_analysis = cleaned_content[:analysis_text_limit]
-
-            hierarchical_summary = self._generate_hierarchical_summary(chapters)
-            # 这里传入了完整的 chapters 列表用于发展分析
-            character_analysis = self._analyze_characters(text_for_analysis, chapters)
-            plot_analysis = self._analyze_plot_structure(chapters)
-            themes = self._extract_themes(text_for_analysis)
-            text_stats = self._calculate_text_statistics(text_for_analysis, chapters)
-
-            return {
-                "novel_info": {
-                    "title": title,
-                    "total_chapters": len(chapters),
-                    "total_length": len(cleaned_content),
-                    "avg_chapter_length": int(np.mean([len(c) for c in chapters])) if chapters else 0
-                },
-                "hierarchical_summary": hierarchical_summary,
-                "character_analysis": character_analysis,
-                "plot_analysis": plot_analysis,
-                "themes": themes,
-                "text_statistics": text_stats
-            }
+            # 一次性分句分词，后续所有阶段共享
+            with StageProfiler("document", self._profile_path(job_id, "document"),
+                               input_chars=len(cleaned_content), chapters=len(chapters)) as profiler:
+                doc = NovelDocument(cleaned_content, chapters)
+            plot_samples = [self._plot_sample(c) for c in chapters]
+            return self._analyze_document(doc, plot_samples, title, len(cleaned_content), report,
+                                          job_id, {"document": profiler.record}, partial_callback)
         except Exception as e:
             import traceback
             traceback.print_exc()
             return {"error": f"分析过程中发生错误: {str(e)}"}
 
-    def _preprocess_novel(self, content: str) -> str:
-        # 标准化空白字符，但保留句子结构
-        return re.sub(r'\s+', ' ', content).strip()
-
-    def _split_into_chapters(self, content: str) -> List[str]:
-        # 更健壮的章节分割正则
-        # 匹配:
-        # 行首的 "Chapter X" 或 "CHAPTER X" (X可以是数字或罗马数字或英文单词)
-        # 行首的纯数字加点 "1. "
-        pattern = r'(?:^|\n)\s*(?:CHAPTER|Chapter)\s+(?:[0-9]+|[IVXLCDM]+|[A-Za-z]+).*?(?=\n)|(?:^|\n)\s*[0-9]+\.\s+.*?(?=\n)'
-
-        parts = re.split(pattern, content)
-        # 过滤掉过短的片段（可能是目录或标题）
-        chapters = [p.strip() for p in parts if len(p.strip()) > 200]
-
-        # 降级策略：如果没找到章节，按固定长度切分
-        if not chapters or len(chapters) < 2:
-            chunk_size = 10000
-            chapters = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
-
-        return chapters
-
-    def _generate_hierarchical_summary(self, chapters: List[str]) -> Dict[str, Any]:
-        chapter_summaries = []
-        full_text_for_summary = ""
-
-        # 限制处理前15章以提高速度，且每章只取开头部分进行摘要
-        process_chapters = chapters[:15]
-        for i, chapter in enumerate(process_chapters):
-            # 每章只取前3000字进行摘要计算
-            summary_input = chapter[:3000]
-            summary = self._summarize_text(summary_input, sentence_count=2)
-
-            word_count = len(chapter.split())
-            chapter_summaries.append({
-                "chapter_number": i + 1,
-                "summary": summary,
-                "word_count": word_count,
-                "length": len(chapter),
-                # 提取关键句（简单地取最长的句子作为备选）
-                "key_sentences": sorted(sent_tokenize(summary_input), key=len, reverse=True)[:2]
-            })
-            full_text_for_summary += summary + " "
+    def analyze_chapter_stream(self, chapters: Iterable[str], title: str = "Analysis Result",
+                               progress_callback: Optional[Callable[[str, int], None]] = None,
+                               job_id: Optional[str] = None,
+                               partial_callback: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        流式分析：逐章消费章节生成器 (见 ingest.iter_chapters)，内存占用与全文大小无关。
+        只保留前 ANALYSIS_TEXT_LIMIT 个字符的连续文本，以及每章的开头、中段采样和长度信息，
+        这正是各分析阶段实际读取的内容。
+        """
+        def report(stage: str, progress: int):
+            if progress_callback:
+                progress_callback(stage, progress)
 
-        # 生成整体摘要
-        overall = self._summarize_text(full_text_for_summary, sentence_count=4)
-        return {"overall_summary": overall, "chapter_summaries": chapter_summaries}
+        try:
+            prefix_parts = []
+            prefix_length = 0
+            heads, lengths, word_counts, plot_samples, hashes = [], [], [], [], []
+            total_length = 0
+            for chapter in chapters:
+                if prefix_length < ANALYSIS_TEXT_LIMIT:
+                    part = chapter[:ANALYSIS_TEXT_LIMIT - prefix_length]
+                    prefix_parts.append(part)
+                    prefix_length += len(part) + 1
+                heads.append(chapter[:CHAPTER_HEAD_LENGTH])
+                lengths.append(len(chapter))
+                word_counts.append(len(chapter.split()))
+                plot_samples.append(self._plot_sample(chapter))
+                # 按完整章节计算哈希；章节级结果只基于开头部分，与内存分析的键区分开
+                hashes.append(chapter_hash(chapter) + ':stream')
+                total_length += len(chapter) + 1
+
+            if not heads or total_length < 100:
+                return {"error": "文本内容过短，无法进行有效分析（至少需要100个字符）。"}
+            report("preprocess", 5)
+
+            text = " ".join(prefix_parts)
+            with StageProfiler("document", self._profile_path(job_id, "document"),
+                               input_chars=len(text), chapters=len(heads)) as profiler:
+                doc = NovelDocument(text, heads, chapter_lengths=lengths,
+                                    chapter_word_counts=word_counts, chapter_hashes=hashes)
+            return self._analyze_document(doc, plot_samples, title, total_length - 1, report,
+                                          job_id, {"document": profiler.record}, partial_callback)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return {"error": f"分析过程中发生错误: {str(e)}"}
 
-    def _summarize_text(self, text: str, sentence_count: int = 3) -> str:
-        if not text or len(text) < 100: return text
+    def _analyze_document(self, doc: NovelDocument, plot_samples: List[str], title: str, total_length: int,
+                          report: Callable[[str, int], None], job_id: Optional[str] = None,
+                          profile: Optional[Dict[str, Any]] = None,
+                          partial_callback: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        report("tokenize", 10)
+        start = time.perf_counter()
+        profile = dict(profile or {})
+
+        def publish(key: str, value: Any):
+            if partial_callback:
+                # 主题阶段的完整输出包含嵌入画像，只推送主题列表
+                partial_callback(key, value["themes"] if key == "themes" else value)
+
+        # 基本信息在分词后即可确定，先于各分析阶段发布
+        novel_info = {
+            "title": title,
+            "total_chapters": len(doc.chapters),
+            "total_length": total_length,
+            "avg_chapter_length": int(np.mean(doc.chapter_lengths)) if doc.chapters else 0
+        }
+        publish("novel_info", novel_info)
+
+        # 执行各项分析
+        stages = self._stages(doc, plot_samples)
+        # 每个阶段的计量参数: (阶段名, 方法名, 参数, cProfile 输出路径, 输入规模)
+        input_size = {"input_chars": len(doc.text), "chapters": len(doc.chapters), "sentences": doc.sentence_count}
+        calls = {key: (stage, method, args, self._profile_path(job_id, stage), input_size)
+                 for key, stage, method, args in stages}
+        if self.parallel:
+            outputs = self._run_stages_parallel(calls, report, publish)
+        else:
+            outputs = {}
+            for i, (key, call) in enumerate(calls.items()):
+                outputs[key] = self._run_profiled(*call)
+                publish(key, outputs[key][0])
+                report(call[0], 10 + 85 * (i + 1) // len(stages))
+        results = {key: value for key, (value, _) in outputs.items()}
+        profile.update((calls[key][0], record) for key, (_, record) in outputs.items())
 
-        if SUMY_AVAILABLE:
-            try:
-                parser = PlaintextParser.from_string(text, Tokenizer("english"))
-                # 如果文本太短，TextRank可能会失败，降级到LSA
-                if len(parser.document.sentences) < sentence_count * 2:
-                    from sumy.summarizers.lsa import LsaSummarizer
-                    summarizer = LsaSummarizer()
-                else:
-                    summarizer = self.summarizer
-
-                sentences = summarizer(parser.document, sentence_count)
-                return " ".join([str(s) for s in sentences])
-            except Exception:
-                pass
+        return {
+            "novel_info": novel_info,
+            "hierarchical_summary": results["hierarchical_summary"],
+            "character_analysis": results["character_analysis"],
+            "plot_analysis": results["plot_analysis"],
+            "themes": results["themes"]["themes"],
+            "text_statistics": results["text_statistics"],
+            "theme_profile": results["themes"]["profile"],
+            "profile": {"stages": profile, "analysis_time": round(time.perf_counter() - start, 4),
+                        "metrics": METRIC_SCOPES}
+        }
 
-        # 降级方法：取开头和结尾的句子
-        sentences = sent_tokenize(text)
-        if len(sentences) <= sentence_count:
-            return text
-        return " ".join(sentences[:sentence_count])
+    @staticmethod
+    def _stages(doc: NovelDocument, plot_samples: List[str]) -> List[Tuple[str, str, str, tuple]]:
+        """各分析阶段: (结果字段, 进度阶段名, 方法名, 参数)。较快的阶段在前，串行执行时其结果更早发布"""
+        return [
+            ("text_statistics", "statistics", "_calculate_text_statistics", (doc,)),
+            ("plot_analysis", "plot", "_analyze_plot_structure", (doc, plot_samples)),
+            ("character_analysis", "characters", "_analyze_characters", (doc,)),
+            ("hierarchical_summary", "summary", "_generate_hierarchical_summary", (doc,)),
+            ("themes", "themes", "_extract_themes", (doc,)),
+        ]
+
+    def _profile_path(self, job_id: Optional[str], stage: str) -> Optional[str]:
+        if not self.profile_dir:
+            return None
+        return os.path.join(self.profile_dir, job_id or "adhoc", f"{stage}.prof")
+
+    def _run_profiled(self, stage: str, method: str, args: tuple, profile_path: Optional[str],
+                      input_size: Dict[str, int]) -> Tuple[Any, Dict[str, Any]]:
+        """执行一个分析阶段并计量，返回 (阶段结果, 计量记录)"""
+        with StageProfiler(stage, profile_path, **input_size) as profiler:
+            value = getattr(self, method)(*args)
+        return value, profiler.record
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # 进程池惰性创建。fork 方式下先在父进程加载全部模型，子进程写时复制共享；
+        # 其他启动方式下每个工作进程在初始化时各自加载一次
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.context.get_start_method() == 'fork':
+                        registry.preload()
+                    self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=self.context,
+                                                     initializer=_init_stage_worker,
+                                                     initargs=(self._worker_options,))
+        return self._pool
+
+    def _run_stages_parallel(self, calls: Dict[str, tuple], report: Callable[[str, int], None],
+                             publish: Callable[[str, Any], None]) -> Dict[str, Tuple[Any, Dict[str, Any]]]:
+        pool = self._get_pool()
+        futures = {}
+        for key, call in calls.items():
+            futures[pool.submit(_run_stage, *call)] = (key, call[0])
+
+        results = {}
+        done = 0
+        for future in as_completed(futures):
+            key, stage = futures[future]
+            results[key] = future.result()
+            publish(key, results[key][0])
+            done += 1
+            report(stage, 10 + 85 * done // len(futures))
+        return results
+
+    def _lookup_chapter_parts(self, doc: NovelDocument, part: str, indices: Iterable[int]) -> List[Optional[Any]]:
+        indices = list(indices)
+        if self.chapter_cache is None:
+            return [None] * len(indices)
+        hashes = doc.chapter_hashes()
+        return self.chapter_cache.get([hashes[i] for i in indices], part)
+
+    def _store_chapter_parts(self, doc: NovelDocument, part: str, values: Dict[int, Any]):
+        if self.chapter_cache is not None and values:
+            hashes = doc.chapter_hashes()
+            self.chapter_cache.put({hashes[i]: value for i, value in values.items()}, part)
+
+    def _chapter_parts(self, doc: NovelDocument, part: str, indices: Iterable[int],
+                       compute: Callable[[List[int]], List[Any]],
+                       cacheable: Optional[Callable[[int], bool]] = None) -> List[Any]:
+        """
+        各章某一部分的结果：命中章节缓存的直接复用，其余章节由 compute(缺失的章节下标) 批量计算后写回。
+        cacheable(i) 为 False 的章节结果依赖章节以外的内容 (如全局采样上限)，不写入缓存。
+        """
+        indices = list(indices)
+        values = self._lookup_chapter_parts(doc, part, indices)
+        missing = [i for i, value in zip(indices, values) if value is None]
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self._store_chapter_parts(doc, part, {i: value for i, value in computed.items()
+                                                  if cacheable is None or cacheable(i)})
+            values = [computed[i] if value is None else value for i, value in zip(indices, values)]
+        return values
+
+    def fingerprint(self) -> str:
+        """模块版本指纹加上本实例影响结果的参数，用作结果缓存的版本号"""
+        return f"{analyzer_fingerprint()};window={self.cooccurrence_window};top={self.character_top_n}"
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self.crawler.close()
+
+    @staticmethod
+    def _split_into_chapters(content: str) -> List[str]:
+        """
+        按行首章节标题分章，返回空白已规范化的各章正文。
+        与上传文件的流式分章 (ingest.scan_chapter_spans) 使用同一套规则，
+        同一本书无论粘贴还是上传都得到相同的章节；没有标题时按固定长度切分。
+        """
+        buf = content.encode('utf-8')
+        chapters = [decode_chapter(buf[start:end]) for start, end in scan_chapter_spans(buf)]
+        return [c for c in chapters if c]
+
+    def _generate_hierarchical_summary(self, doc: NovelDocument) -> Dict[str, Any]:
+        chapter_summaries = self._chapter_parts(doc, 'summary', range(len(doc.chapters)),
+                                                lambda missing: self._summarize_chapters(doc, missing))
+        return self._combine_chapter_summaries(chapter_summaries)
+
+    def _summarize_chapters(self, doc: NovelDocument, indices: List[int]) -> List[Dict[str, Any]]:
+        # 所有待计算章节的句子一起向量化，一次 TextRank 迭代得到各章摘要
+        # 结果不含章节序号，按内容缓存后可以出现在任意位置
+        chapter_sentences = [doc.chapter_sentences(i) for i in indices]
+        summaries = self.summarizer.summarize_groups(chapter_sentences, CHAPTER_SUMMARY_SENTENCES)
+        return [{
+            "summary": " ".join(summary),
+            "word_count": doc.chapter_word_counts[i],
+            "length": doc.chapter_lengths[i],
+            # 提取关键句（简单地取最长的句子作为备选）
+            "key_sentences": sorted(sentences, key=len, reverse=True)[:2]
+        } for i, sentences, summary in zip(indices, chapter_sentences, summaries)]
+
+    def _combine_chapter_summaries(self, chapter_summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        chapter_summaries = [{"chapter_number": i + 1, **summary} for i, summary in enumerate(chapter_summaries)]
+
+        # 生成整体摘要：在各章摘要句中再做一次 TextRank
+        sentences = [s for c in chapter_summaries for s in sent_tokenize(c["summary"])]
+        overall = " ".join(self.summarizer.summarize(sentences, OVERALL_SUMMARY_SENTENCES))
+        return {"overall_summary": overall, "chapter_summaries": chapter_summaries}
 
-    def _analyze_characters(self, full_text: str, chapters: List[str]) -> Dict[str, Any]:
+    def _analyze_characters(self, doc: NovelDocument) -> Dict[str, Any]:
         main_characters = []
-        relationships = []
         character_development = {}
 
-        names = []
-        if SPACY_AVAILABLE and nlp:
-            # 使用 spaCy 进行更准确的 NER
-            # 处理前 150k 字符以平衡速度和准确性
-            doc = nlp(full_text[:150000])
-            for ent in doc.ents:
-                if ent.label_ == "PERSON":
-                    name = ent.text.strip()
-                    # 过滤规则：长度大于2，首字母大写，不是停用词，不包含数字
-                    if len(name) > 2 and name[0].isupper() and name.lower() not in self.stop_words and not any(
-                            char.isdigit() for char in name):
-                        names.append(name)
+        # 逐章提取候选人名，命中章节缓存的章节不再重复识别
+        located = [i for i in range(len(doc.chapters)) if doc.chapter_start(i) >= 0]
+        if self.ner_engine:
+            # 使用 spaCy 进行更准确的 NER，各章按句子分块批量处理
+            chapter_names = self._chapter_parts(doc, 'names', located, lambda missing: self._ner_names(doc, missing))
         else:
-            # 降级：使用正则和NLTK提取连续的大写单词
-            tokens = word_tokenize(full_text[:100000])
-            tagged = nltk.pos_tag(tokens)
-
-            current_name = []
-            for word, tag in tagged:
-                if tag == 'NNP' and len(word) > 2 and word.lower() not in self.stop_words:
-                    current_name.append(word)
-                else:
-                    if current_name:
-                        names.append(" ".join(current_name))
-                    current_name = []
-            # 处理最后一个可能的名字
-            if current_name: names.append(" ".join(current_name))
+            # 降级：只处理前 NAME_TAGGING_LIMIT 个字符，跨越该边界的章节不缓存
+            tagged_chapters = [i for i in located if doc.chapter_start(i) < NAME_TAGGING_LIMIT]
+            chapter_names = self._chapter_parts(
+                doc, 'names', tagged_chapters, lambda missing: [self._tagged_names(doc, i) for i in missing],
+                cacheable=lambda i: doc.chapter_spans[i, 1] <= NAME_TAGGING_LIMIT)
+        names = [name for chapter in chapter_names for name in chapter]
 
         # 统计Top N人物
-        name_counts = Counter(names).most_common(10)
+        name_counts = Counter(names).most_common(self.character_top_n)
         top_names = [name for name, count in name_counts]
 
-        # 初始化数据结构
-        for name in top_names:
-            character_development[name] = []
-
-        # 遍历每一章进行统计
-        for i, chapter_content in enumerate(chapters):
-            # 只在每章前5000字内搜索
-            chapter_sample = chapter_content[:5000].lower()
-            for name in top_names:
-                # 简单统计名字（转小写）在章节样本中出现的次数
-                count = chapter_sample.count(name.lower())
-                character_development[name].append(count)
+        # 人名及别名编译成一个多模式匹配器，逐章统计提及次数和章内共现
+        # 缓存键包含人物列表，主要人物不变时只需扫描变化的章节
+        aliases = build_aliases(top_names, self.stop_words)
+        index = MentionIndex(top_names, aliases)
+        names_key = hashlib.sha1(json.dumps([top_names, sorted(aliases.items()), self.cooccurrence_window])
+                                 .encode('utf-8')).hexdigest()[:16]
+        chapter_mentions = self._chapter_parts(
+            doc, f'mentions:{names_key}', range(len(doc.chapters)),
+            lambda missing: [self._chapter_mentions(index, doc.chapters[i]) for i in missing])
+        counts = np.array([m["counts"] for m in chapter_mentions], dtype=np.int64).reshape(-1, len(top_names)).T
+        for k, name in enumerate(top_names):
+            character_development[name] = counts[k].tolist()
 
         # 构建主要人物详细信息
-        for name, count in name_counts:
-            # 查找首次出现的章节
-            first_appearance = 1
-            for i, chap in enumerate(chapters):
-                if name.lower() in chap[:5000].lower():
-                    first_appearance = i + 1
-                    break
-
+        for k, (name, count) in enumerate(name_counts):
+            appearances = np.flatnonzero(counts[k])
             main_characters.append({
                 "name": name,
                 "total_mentions": count,
-                "first_appearance": first_appearance
+                "mention_count": int(counts[k].sum()),
+                "first_appearance": int(appearances[0]) + 1 if len(appearances) else 1,
+                "aliases": sorted(alias for alias, owner in aliases.items() if owner == name)
             })
 
-        # 生成简单的人物关系
-        if len(top_names) >= 2:
-            # 简单假设前两个人物有关系
-            c1 = top_names[0]
-            c2 = top_names[1]
-            # 计算简单的共现强度
-            strength = 0
-            co_occurrence = 0
-            window_size = 500
-            text_lower = full_text[:100000].lower()
-            for i in range(0, len(text_lower) - window_size, window_size):
-                window = text_lower[i:i + window_size]
-                if c1.lower() in window and c2.lower() in window:
-                    co_occurrence += 1
-
-            if co_occurrence > 0:
-                strength = min(0.95, co_occurrence / 20)
-
-                relationships.append({
-                    "character1": c1,
-                    "character2": c2,
-                    "strength": strength,
-                    "co_occurrence_count": co_occurrence
-                })
+        # 各章滑动窗口共现计数之和：所有人物两两之间的带权关系图
+        graph = CooccurrenceGraph.from_pairs(top_names, (pair for m in chapter_mentions for pair in m["pairs"]),
+                                             self.cooccurrence_window)
 
         return {
             "main_characters": main_characters,
-            "character_relationships": relationships,
+            "character_relationships": graph.edges(),
             "character_development": character_development
         }
 
-    def _analyze_plot_structure(self, chapters: List[str]) -> Dict[str, Any]:
-        sentiments = []
-        complexity = []
-
-        # 限制处理章节数
-        num_chapters = len(chapters)
-        # 最多取约30个点绘制曲线
-        step = max(1, num_chapters // 30)
+    def _is_candidate_name(self, name: str) -> bool:
+        # 过滤规则：长度大于2，首字母大写，不是停用词，不包含数字
+        return len(name) > 2 and name[0].isupper() and name.lower() not in self.stop_words and not any(
+            char.isdigit() for char in name)
 
-        sampled_chapters = []
-        for i in range(0, num_chapters, step):
-            sampled_chapters.append((i + 1, chapters[i]))
+    def _ner_names(self, doc: NovelDocument, indices: List[int]) -> List[List[str]]:
+        ranges = [tuple(doc.chapter_spans[i].tolist()) for i in indices]
+        return [[text.strip() for text, _, _ in entities if self._is_candidate_name(text.strip())]
+                for entities in self.ner_engine.extract_ranges(doc, ranges)]
 
-        for chapter_num, chap_content in sampled_chapters:
-            # 取每章中间部分进行情感分析，更能代表主要情节
-            mid = len(chap_content) // 2
-            sample = chap_content[max(0, mid - 1500):min(len(chap_content), mid + 1500)]
+    def _tagged_names(self, doc: NovelDocument, i: int) -> List[str]:
+        # 使用NLTK词性标注提取连续的专有名词
+        start, end = doc.chapter_spans[i].tolist()
+        tagged = nltk.pos_tag(doc.words(start, min(end, NAME_TAGGING_LIMIT)))
 
-            blob = TextBlob(sample)
-            sentiments.append({
-                "chapter": chapter_num,
-                "sentiment_score": round(blob.sentiment.polarity, 3)
-            })
-            # 使用主观性作为复杂度的简单代理
-            complexity.append({
-                "chapter": chapter_num,
-                "complexity_score": round(blob.sentiment.subjectivity, 3)
-            })
+        names = []
+        current_name = []
+        for word, tag in tagged:
+            if tag == 'NNP' and len(word) > 2 and word.lower() not in self.stop_words:
+                current_name.append(word)
+            else:
+                if current_name:
+                    names.append(" ".join(current_name))
+                current_name = []
+        # 处理最后一个可能的名字
+        if current_name: names.append(" ".join(current_name))
+        return names
+
+    def _chapter_mentions(self, index: MentionIndex, chapter: str) -> Dict[str, Any]:
+        positions = index.text_positions(chapter)
+        graph = CooccurrenceGraph(index.names, positions, self.cooccurrence_window)
+        return {"counts": [len(p) for p in positions], "pairs": graph.pairs()}
+
+    @staticmethod
+    def _plot_sample(chapter: str) -> str:
+        # 取每章中间部分进行情感分析，更能代表主要情节
+        mid = len(chapter) // 2
+        return chapter[max(0, mid - 1500):min(len(chapter), mid + 1500)]
+
+    @property
+    def sentiment_engine(self) -> SentimentEngine:
+        return registry.get('sentiment')
+
+    def _chapter_sentiment(self, doc: NovelDocument, plot_samples: List[str],
+                           sentence_scores: SentimentScores) -> SentimentScores:
+        """各章的情感累加值：完整在 doc 中的章节直接汇总句子得分，其余章节 (流式分析) 只对中段采样打分"""
+        n = len(plot_samples)
+        cumulative = [np.concatenate(([0.0], np.cumsum(a))) for a in sentence_scores]
+        totals = np.zeros((3, n))
+        for i in range(n):
+            start, end = doc.chapter_spans[i]
+            if start >= 0 and end - start == doc.chapter_lengths[i]:
+                j, k = doc.sentence_range(start, end)
+                totals[:, i] = [c[k] - c[j] for c in cumulative]
+            else:
+                totals[:, i] = [a[0] for a in self.sentiment_engine.score_text(plot_samples[i])]
+        return SentimentScores(*totals)
+
+    def _analyze_plot_structure(self, doc: NovelDocument, plot_samples: List[str]) -> Dict[str, Any]:
+        # 全文逐句打分一次，章节曲线与按句曲线都由句子得分聚合
+        sentence_scores = self.sentiment_engine.score_spans(doc.text, doc.sentence_spans)
+
+        chapter_scores = self._chapter_sentiment(doc, plot_samples, sentence_scores)
+        polarity, subjectivity = chapter_scores.mean()
+        sigma = max(1.0, len(plot_samples) * ARC_SMOOTHING)
+        smoothed_polarity = smooth(polarity, chapter_scores.count, sigma)
+        smoothed_subjectivity = smooth(subjectivity, chapter_scores.count, sigma)
+        sentiments = [{
+            "chapter": i + 1,
+            "sentiment_score": round(float(polarity[i]), 3),
+            "smoothed_score": round(float(smoothed_polarity[i]), 3)
+        } for i in range(len(plot_samples))]
+        # 使用主观性作为复杂度的简单代理
+        complexity = [{
+            "chapter": i + 1,
+            "complexity_score": round(float(subjectivity[i]), 3),
+            "smoothed_score": round(float(smoothed_subjectivity[i]), 3)
+        } for i in range(len(plot_samples))]
+
+        # 每 N 句一个点的细粒度曲线
+        per_point = max(1, -(-doc.sentence_count // SENTENCE_ARC_POINTS))
+        boundaries = np.arange(0, doc.sentence_count, per_point)
+        point_scores = sentence_scores.group(boundaries)
+        point_polarity = point_scores.mean()[0]
+        smoothed_points = smooth(point_polarity, point_scores.count,
+                                 max(1.0, len(boundaries) * ARC_SMOOTHING))
+        sentence_arc = {
+            "sentences_per_point": per_point,
+            "points": [{
+                "sentence": int(b) + 1,
+                "sentiment_score": round(float(p), 3),
+                "smoothed_score": round(float(sp), 3)
+            } for b, p, sp in zip(boundaries, point_polarity, smoothed_points)]
+        }
 
-        n = num_chapters
+        n = len(plot_samples)
         return {
             "sentiment_arc": sentiments,
             "complexity_arc": complexity,
+            "sentence_arc": sentence_arc,
             # 基于章节位置的简单结构估算
             "plot_structure": {
                 "exposition": 1,
@@ -390,17 +697,30 @@ class SimpleNovelAnalyzer:
             "key_events": []
         }
 
-    def _extract_themes(self, text: str) -> List[str]:
-        # 使用 KeyBERT 提取主题词
-        if self.kw_model:
+    @staticmethod
+    def _theme_chunks(doc: NovelDocument) -> List[str]:
+        # 按句子边界把全文切成约 THEME_CHUNK_LENGTH 字的块；不在 doc 中的章节 (流式分析) 取章节开头作为一块
+        starts = doc.sentence_spans[:, 0]
+        first = np.flatnonzero(np.diff(starts // THEME_CHUNK_LENGTH, prepend=-1))
+        bounds = np.append(starts[first], len(doc.text)).tolist()
+        chunks = [doc.text[s:e] for s, e in zip(bounds[:-1], bounds[1:])]
+        chunks += [doc.chapters[i][:THEME_CHUNK_LENGTH] for i in range(len(doc.chapters)) if doc.chapter_start(i) < 0]
+        if len(chunks) > THEME_MAX_CHUNKS:
+            # 在全书范围内均匀抽取
+            picks = np.unique(np.linspace(0, len(chunks) - 1, THEME_MAX_CHUNKS).round().astype(int))
+            chunks = [chunks[i] for i in picks]
+        return chunks
+
+    def _extract_themes(self, doc: NovelDocument) -> Dict[str, Any]:
+        """返回 {"themes": 主题词, "profile": 提取方式与各阶段耗时}"""
+        # 使用 KeyBERT 嵌入模型提取主题词：全书切块，候选短语批量嵌入并缓存
+        if self.theme_engine:
             try:
-                # 增加多样性参数
-                keywords = self.kw_model.extract_keywords(
-                    text[:100000],
-                    keyphrase_ngram_range=(1, 2),
-                    stop_words='english',
-                    use_maxsum=True, nr_candidates=20, top_n=8  # 使用 MaxSum 算法提高多样性
-                )
+                start = time.time()
+                chunks = self._theme_chunks(doc)
+                chunking = round(time.time() - start, 3)
+                keywords, profile = self.theme_engine.extract(chunks)
+                profile["timings"] = {"chunking": chunking, **profile["timings"]}
                 # 过滤掉包含人名或其他噪音的关键词（简单过滤）
                 filtered_keywords = []
                 for k, score in keywords:
@@ -409,26 +729,40 @@ class SimpleNovelAnalyzer:
                         # 将首字母大写用于展示
                         filtered_keywords.append(word.title())
 
-                return list(set(filtered_keywords))[:6]  # 去重并取前6个
+                # 去重并取前6个 (保持得分顺序)
+                themes = list(dict.fromkeys(filtered_keywords))[:6]
+                return {"themes": themes, "profile": {"method": "keybert", **profile}}
             except Exception as e:
                 print(f"KeyBERT error: {e}")
                 pass
 
-        # 降级：使用 NLTK 提取高频名词短语
+        # 降级：使用 NLTK 提取高频词，各章开头的词频按章缓存后合并
+        start = time.time()
         try:
-            tokens = word_tokenize(text[:50000].lower())
-            filtered_tokens = [w for w in tokens if w.isalpha() and w not in self.stop_words and len(w) > 3]
-            fdist = Counter(filtered_tokens)
+            sample_length = max(200, THEME_SAMPLE_LENGTH // len(doc.chapters))
+            chapter_terms = self._chapter_parts(doc, f'terms:{sample_length}', range(len(doc.chapters)),
+                                                lambda missing: [self._chapter_terms(doc, i, sample_length)
+                                                                 for i in missing])
+            fdist = Counter()
+            for terms in chapter_terms:
+                fdist.update(terms)
             common = [w.title() for w, c in fdist.most_common(15)]
             # 简单过滤掉可能的人名（基于之前识别的）- 这里暂不实现复杂过滤
-            return common[:6]
+            themes = common[:6]
         except:
-            return ["Adventure", "Conflict", "Mystery", "Journey"]  # 最后的静态后备
+            themes = ["Adventure", "Conflict", "Mystery", "Journey"]  # 最后的静态后备
+        return {"themes": themes, "profile": {"method": "frequency",
+                                              "timings": {"total": round(time.time() - start, 3)}}}
+
+    def _chapter_terms(self, doc: NovelDocument, i: int, limit: int) -> Dict[str, int]:
+        tokens = [w.lower() for w in doc.chapter_words(i, limit)]
+        filtered_tokens = [w for w in tokens if w.isalpha() and w not in self.stop_words and len(w) > 3]
+        return dict(Counter(filtered_tokens).most_common(THEME_TERMS_PER_CHAPTER))
 
-    def _calculate_text_statistics(self, text: str, chapters: List[str]) -> Dict[str, Any]:
-        sample_text = text[:100000]
-        words = word_tokenize(sample_text)
-        sentences = sent_tokenize(sample_text)
+    def _calculate_text_statistics(self, doc: NovelDocument) -> Dict[str, Any]:
+        sample_text = doc.text[:100000]
+        words = doc.words(0, 100000)
+        sentence_start, sentence_end = doc.sentence_range(0, 100000)
 
         readability = {
             "flesch_reading_ease": 0, "flesch_kincaid_grade": 0, "smog_index": 0
@@ -443,24 +777,40 @@ class SimpleNovelAnalyzer:
 
         # 计算章节统计，限制前20章以提高速度
         chapter_stats = []
-        for i, c in enumerate(chapters[:20]):
-            c_words = word_tokenize(c[:5000])
-            c_sents = sent_tokenize(c[:5000])
+        chapter_counts = self._chapter_parts(
+            doc, 'stats', range(min(20, len(doc.chapters))),
+            lambda missing: [[len(doc.chapter_sentences(i, 5000)), doc.chapter_token_count(i, 5000)] for i in missing])
+        for i, (c_sents, c_tokens) in enumerate(chapter_counts):
             chapter_stats.append({
                 "chapter": i + 1,
-                "word_count": len(c.split()),
-                "sentence_count": len(c_sents),
-                "avg_sentence_length": len(c_words) / max(1, len(c_sents))
+                "word_count": doc.chapter_word_counts[i],
+                "sentence_count": c_sents,
+                "avg_sentence_length": c_tokens / max(1, c_sents)
             })
 
+        sentence_count = sentence_end - sentence_start
+        total_start, total_end = doc.sentence_range(0, ANALYSIS_TEXT_LIMIT)
         return {
             "basic_stats": {
-                "total_words": len(word_tokenize(text)),
-                "total_sentences": len(sent_tokenize(text)),
-                "avg_sentence_length": len(words) / max(1, len(sentences)),
+                "total_words": doc.word_count(0, ANALYSIS_TEXT_LIMIT),
+                "total_sentences": total_end - total_start,
+                "avg_sentence_length": len(words) / max(1, sentence_count),
                 "unique_words": len(set(words)),
                 "lexical_diversity": len(set(words)) / max(1, len(words))
             },
             "readability_scores": readability,
             "chapter_stats": chapter_stats
-        }
\ No newline at end of file
+        }
+
+# 进程池工作进程的分析器实例 (每个进程一个，复用已加载的模型)
+_worker_analyzer = None
+
+
+def _init_stage_worker(options: Dict[str, Any]):
+    global _worker_analyzer
+    _worker_analyzer = SimpleNovelAnalyzer(**options)
+    registry.preload()
+
+
+def _run_stage(*call):
+    return _worker_analyzer._run_profiled(*call)
@@ -0,0 +1,126 @@
+import cProfile
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import psutil
+
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    # Windows 没有 resource 模块，子进程 CPU 时间记为 0
+    RESOURCE_AVAILABLE = False
+
+# 内存采样间隔 (秒)
+SAMPLE_INTERVAL = 0.01
+
+# 各计量字段的统计范围，随阶段计量写入结果 (profile.metrics) 和 /api/stats (stage_metrics)。
+# 子进程 CPU 与内存按进程统计：同一进程中同时运行的任务 (ANALYSIS_WORKERS > 1) 会计入彼此的数值
+METRIC_SCOPES = {
+    "cpu_time": "calling thread CPU",
+    "child_cpu_time": "CPU of child processes that exited while the stage ran (process-wide)",
+    "peak_rss_mb": "process RSS while the stage ran (process-wide)",
+    "rss_delta_mb": "process RSS growth while the stage ran (process-wide)",
+}
+
+
+def _children_cpu_time() -> float:
+    """已退出并回收的子进程 (如 spaCy n_process 的工作进程) 累计的 CPU 时间"""
+    if not RESOURCE_AVAILABLE:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class _PeakRSS:
+    """后台线程定期采样进程常驻内存，记录阶段执行期间的峰值"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._process = psutil.Process() if PSUTIL_AVAILABLE else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.start_rss = self.peak_rss = 0
+
+    def _rss(self) -> int:
+        return self._process.memory_info().rss
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def start(self):
+        if self._process is None:
+            return
+        self.start_rss = self.peak_rss = self._rss()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self._rss())
+
+
+class StageProfiler:
+    """
+    分析阶段的计量上下文：墙钟时间、CPU 时间 (当前线程 + 期间退出的子进程)、执行期间的进程内存峰值和输入规模。
+    字段的统计范围见 METRIC_SCOPES；常驻的进程池工作进程不计入 child_cpu_time，
+    在工作进程中执行的阶段由工作进程自己计量。
+    指定 profile_path 时同时用 cProfile 记录该阶段，结束后写入 .prof 文件 (可用 snakeviz/pstats 查看)。
+
+        with StageProfiler('summary', input_chars=len(text)) as profiler:
+            ...
+        record = profiler.record
+    """
+
+    def __init__(self, stage: str, profile_path: Optional[str] = None, **input_size: int):
+        self.stage = stage
+        self.profile_path = profile_path
+        self.input_size = input_size
+        self.record: Dict[str, Any] = {}
+        self._memory = _PeakRSS()
+        self._profile: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> 'StageProfiler':
+        if self.profile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._memory.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._children_cpu = _children_cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        children_cpu = _children_cpu_time() - self._children_cpu
+        self._memory.stop()
+        if self._profile is not None:
+            self._profile.disable()
+            os.makedirs(os.path.dirname(self.profile_path), exist_ok=True)
+            self._profile.dump_stats(self.profile_path)
+
+        mb = 1024 * 1024
+        self.record = {
+            "wall_time": round(wall, 4),
+            "cpu_time": round(cpu, 4),
+            "child_cpu_time": round(children_cpu, 4),
+            "peak_rss_mb": round(self._memory.peak_rss / mb, 1),
+            "rss_delta_mb": round((self._memory.peak_rss - self._memory.start_rss) / mb, 1),
+            **self.input_size
+        }
+        if self._profile is not None:
+            self.record["profile"] = self.profile_path
+        return False
@@ -0,0 +1,287 @@
+import glob
+import hashlib
+import os
+import re
+import uuid
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+# 报告模板或 PDF 版式变化时递增，旧的导出缓存随之失效
+EXPORT_VERSION = "1"
+# 流式 HTML 每次发送的最小字节数 (Jinja 逐个模板片段产出，合并后再发送)
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# PDF 字体：拉丁文本用内置 Helvetica，含中日韩文字的段落用 reportlab 自带的 CID 字体 (无需字体文件)
+LATIN_FONT = 'Helvetica'
+LATIN_BOLD = 'Helvetica-Bold'
+CJK_FONT = 'STSong-Light'
+HANGUL_FONT = 'HYSMyeongJo-Medium'
+HANGUL = re.compile(r'[\uac00-\ud7af\u1100-\u11ff\u3130-\u318f]')
+NON_LATIN = re.compile(r'[^\x00-\u024f\u2000-\u206f]')
+
+
+def buffered(chunks: Iterable[str], size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """把模板流的小片段合并为不小于 size 的块"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_file(path: str, chunk_size: int = 64 * 1024, remove: bool = False) -> Iterator[bytes]:
+    """分块读取文件；remove=True 时发送完 (或客户端断开) 后删除文件"""
+    try:
+        with open(path, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+    finally:
+        if remove:
+            os.remove(path)
+
+
+class ExportCache:
+    """
+    导出文件缓存 (目录)。每个结果的每种格式保存一份渲染好的文件，
+    ETag 由导出版本、格式和结果文件的修改时间/大小决定，无需渲染即可计算；
+    结果文件变化后 ETag 随之改变，旧文件在写入新文件时删除。
+    总大小超过 max_bytes 时删除最早写入的文件。
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 500 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def etag(result_path: str, format_type: str) -> str:
+        stat = os.stat(result_path)
+        key = f"{EXPORT_VERSION}:{format_type}:{os.path.basename(result_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+    def path(self, result_id: str, etag: str, format_type: str) -> str:
+        return os.path.join(self.folder, f"{result_id}.{etag}.{format_type}")
+
+    def get(self, result_id: str, etag: str, format_type: str) -> Optional[str]:
+        path = self.path(result_id, etag, format_type)
+        return path if os.path.exists(path) else None
+
+    def temp_path(self, result_id: str, format_type: str) -> str:
+        return os.path.join(self.folder, f".{result_id}.{uuid.uuid4().hex[:8]}.{format_type}.tmp")
+
+    def commit(self, temp_path: str, result_id: str, etag: str, format_type: str) -> str:
+        """渲染完成的临时文件原子地替换为缓存文件，并删除同一结果的旧版本"""
+        path = self.path(result_id, etag, format_type)
+        os.replace(temp_path, path)
+        for old in glob.glob(os.path.join(self.folder, f"{glob.escape(result_id)}.*.{format_type}")):
+            if old != path:
+                self._remove(old)
+        self._evict()
+        return path
+
+    def tee(self, chunks: Iterable[str], result_id: str, etag: str, format_type: str) -> Iterator[str]:
+        """边发送边写入缓存；客户端中途断开时丢弃不完整的文件"""
+        temp_path = self.temp_path(result_id, format_type)
+        completed = False
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            completed = True
+            self.commit(temp_path, result_id, etag, format_type)
+        finally:
+            if not completed:
+                self._remove(temp_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.folder, name))
+            total -= size
+
+    def stats(self) -> dict:
+        names = [n for n in os.listdir(self.folder) if not n.startswith('.')]
+        size = sum(os.path.getsize(os.path.join(self.folder, n)) for n in names
+                   if os.path.exists(os.path.join(self.folder, n)))
+        return {'entries': len(names), 'size_mb': round(size / 1024 / 1024, 2)}
+
+
+_fonts_registered = False
+
+
+def _register_fonts():
+    global _fonts_registered
+    if not _fonts_registered:
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+        pdfmetrics.registerFont(UnicodeCIDFont(HANGUL_FONT))
+        _fonts_registered = True
+
+
+def _font(text: str, bold: bool = False) -> str:
+    if HANGUL.search(text):
+        return HANGUL_FONT
+    if NON_LATIN.search(text):
+        return CJK_FONT
+    return LATIN_BOLD if bold else LATIN_FONT
+
+
+def _number(value: Any, digits: int = 1) -> str:
+    return f"{value:.{digits}f}" if isinstance(value, (int, float)) else '-'
+
+
+def _section(result: Mapping, key: str) -> Mapping:
+    value = result.get(key)
+    return value if isinstance(value, Mapping) else {}
+
+
+class _PdfReport:
+    """按 export_report.html 的结构生成 PDF 段落"""
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.styles = {
+            'title': ParagraphStyle('ReportTitle', parent=styles['Title'], fontSize=20, leading=26),
+            'subtitle': ParagraphStyle('ReportSubtitle', parent=styles['Title'], fontSize=14, leading=20),
+            'heading': ParagraphStyle('ReportHeading', parent=styles['Heading2'],
+                                      textColor=colors.HexColor('#2c3e50'), spaceBefore=12),
+            'heading3': ParagraphStyle('ReportHeading3', parent=styles['Heading4'], spaceBefore=6),
+            'body': ParagraphStyle('ReportBody', parent=styles['BodyText'], fontSize=10, leading=15),
+            'small': ParagraphStyle('ReportSmall', parent=styles['BodyText'], fontSize=8, leading=11,
+                                    textColor=colors.HexColor('#666666')),
+        }
+        self._variants = {}
+
+    def paragraph(self, text: Any, style: str = 'body') -> Paragraph:
+        text = '' if text is None else str(text)
+        base = self.styles[style]
+        font = _font(text, bold=base.fontName.endswith('Bold'))
+        # 同一样式按字体派生一次
+        key = f'{style}-{font}'
+        if key not in self._variants:
+            self._variants[key] = ParagraphStyle(key, parent=base, fontName=font)
+        return Paragraph(escape(text).replace('\n', '<br/>'), self._variants[key])
+
+    def table(self, rows: List[List[Any]], widths: Optional[List[float]] = None) -> Table:
+        cells = [[self.paragraph(cell) for cell in row] for row in rows]
+        table = Table(cells, colWidths=widths, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        return table
+
+    def flowables(self, result: Mapping) -> Iterator[Any]:
+        """逐节产出 PDF 元素；章节摘要逐章生成，不先构建整份报告"""
+        info = _section(result, 'novel_info')
+        timestamp = (result.get('timestamp') or '')[:19] or '未知'
+        yield self.paragraph('小说分析报告', 'title')
+        yield self.paragraph(info.get('title'), 'subtitle')
+        yield self.paragraph(f"生成时间: {timestamp}", 'small')
+        yield Spacer(1, 6 * mm)
+
+        if result.get('error'):
+            yield self.paragraph('分析错误', 'heading')
+            yield self.paragraph(result.get('error'))
+            return
+
+        yield self.paragraph('基本信息', 'heading')
+        yield self.table([['总章节数', '总字符数', '平均章节长度'],
+                          [info.get('total_chapters'), info.get('total_length'),
+                           _number(info.get('avg_chapter_length'), 0)]])
+
+        summary = _section(result, 'hierarchical_summary')
+        yield self.paragraph('整体摘要', 'heading')
+        yield self.paragraph(summary.get('overall_summary'))
+
+        yield self.paragraph('主题分析', 'heading')
+        yield self.paragraph('、'.join(str(t) for t in result.get('themes') or []) or '-')
+
+        characters = _section(result, 'character_analysis').get('main_characters') or []
+        yield self.paragraph('人物分析', 'heading')
+        if characters:
+            yield self.table([['人物', '提及次数', '首次出现']] +
+                             [[c.get('name'), c.get('total_mentions'), f"第 {c.get('first_appearance')} 章"]
+                              for c in characters])
+        else:
+            yield self.paragraph('未识别到主要人物。')
+
+        structure = _section(result, 'plot_analysis').get('plot_structure') or {}
+        yield self.paragraph('情节结构', 'heading')
+        yield self.table([['开端', '发展', '高潮', '结尾'],
+                          [f"第 {structure.get(k)} 章" for k in
+                           ('exposition', 'rising_action_start', 'climax', 'resolution')]])
+
+        stats = _section(result, 'text_statistics')
+        basic = stats.get('basic_stats') or {}
+        readability = stats.get('readability_scores') or {}
+        yield self.paragraph('文本统计', 'heading')
+        yield self.table([['总词数', '总句数', '平均句长', '独特词汇'],
+                          [basic.get('total_words'), basic.get('total_sentences'),
+                           _number(basic.get('avg_sentence_length')), basic.get('unique_words')]])
+        yield self.paragraph('可读性分析', 'heading3')
+        yield self.table([['指标', '分数'],
+                          ['Flesch阅读难度', _number(readability.get('flesch_reading_ease'))],
+                          ['Flesch-Kincaid等级', _number(readability.get('flesch_kincaid_grade'))],
+                          ['SMOG指数', _number(readability.get('smog_index'))]])
+
+        yield self.paragraph('章节摘要', 'heading')
+        for chapter in summary.get('chapter_summaries') or []:
+            yield self.paragraph(f"第 {chapter.get('chapter_number')} 章", 'heading3')
+            yield self.paragraph(chapter.get('summary'))
+            yield self.paragraph(f"词数: {chapter.get('word_count')} | 字符: {chapter.get('length')}", 'small')
+
+        yield Spacer(1, 6 * mm)
+        yield self.paragraph(f"本报告由小说分析系统生成 · 生成时间: {timestamp}", 'small')
+
+
+def render_pdf(result: Mapping, path: str):
+    """
+    用 reportlab 在服务器端生成 PDF 并写入 path (不经过浏览器)。
+    reportlab 在排版结束后才一次性写出文件，生成期间整份文档保存在内存中。
+    """
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError('reportlab 未安装，无法生成 PDF')
+    _register_fonts()
+    title = str(_section(result, 'novel_info').get('title') or '')
+    # invariant: 同一结果每次生成的文件逐字节相同，与 ETag 一致
+    doc = SimpleDocTemplate(path, pagesize=A4, title=f"小说分析报告 - {title}", invariant=True,
+                            leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm)
+    # 元素列表先整体生成再交给 build (build 需要完整的列表)，报告的全部元素同时存在于内存中
+    doc.build(list(_PdfReport().flowables(result)))
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ingest import iter_lines
+from result_format import find_result
+
+
+def content_hash(content: str, version: str) -> str:
+    """规范化文本 (与分析器预处理一致) 后连同分析器版本计算 SHA-256"""
+    normalized = re.sub(r'\s+', ' ', content).strip()
+    h = hashlib.sha256()
+    h.update(version.encode('utf-8'))
+    h.update(b'\0')
+    h.update(normalized.encode('utf-8'))
+    return h.hexdigest()
+
+
+def file_content_hash(path: str, version: str, encoding: str = 'utf-8') -> str:
+    """流式计算文件内容哈希，结果与 content_hash(文件全文, version) 相同"""
+    h = hashlib.sha256()
+    h.update(version.encode('utf-8'))
+    h.update(b'\0')
+    first = True
+    with open(path, 'r', encoding=encoding) as f:
+        for line, _ in iter_lines(f):
+            words = line.split()
+            if not words:
+                continue
+            if not first:
+                h.update(b' ')
+            h.update(" ".join(words).encode('utf-8'))
+            first = False
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    基于内容哈希的分析结果缓存。
+    索引 hash -> result_id 保存在 SQLite 中，按最近使用顺序 (LRU)
+    维护，超过条目数或结果文件总大小上限时淘汰最久未使用的条目。
+    淘汰只移除索引，不删除结果文件 (结果仍保留在历史记录中)。
+    查询只读数据库：命中时间先记在内存中，下次写入时一并保存；命中计数只在本进程内统计。
+    """
+
+    def __init__(self, db_path: str, results_folder: str, max_entries: int = 500,
+                 max_bytes: int = 200 * 1024 * 1024):
+        self.db_path = db_path
+        self.results_folder = results_folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 尚未写入数据库的命中时间 {hash: last_access}
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS result_cache ('
+                         'key TEXT PRIMARY KEY, result_id TEXT, size INTEGER, last_access REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_access ON result_cache (last_access)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回 result_id，并记录命中时间 (用于 LRU 顺序)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT result_id FROM result_cache WHERE key = ?', (key,)).fetchone()
+        result_id = row[0] if row else None
+        if result_id and not find_result(self.results_folder, result_id):
+            # 结果文件已被删除，索引失效
+            with self._lock, self._connect() as conn:
+                conn.execute('DELETE FROM result_cache WHERE key = ?', (key,))
+                self._touched.pop(key, None)
+            result_id = None
+
+        with self._lock:
+            if result_id:
+                self._touched[key] = time.time()
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result_id
+
+    def put(self, key: str, result_id: str):
+        path = find_result(self.results_folder, result_id)
+        size = os.path.getsize(path) if path else 0
+        with self._lock, self._connect() as conn:
+            # 先写入之前的命中时间，淘汰按真实的使用顺序进行
+            conn.executemany('UPDATE result_cache SET last_access = ? WHERE key = ?',
+                             [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+            conn.execute('INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?, ?)',
+                         (key, result_id, size, time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute('SELECT key, size FROM result_cache ORDER BY last_access'):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size or 0
+        conn.executemany('DELETE FROM result_cache WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache').fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
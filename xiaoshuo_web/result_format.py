@@ -0,0 +1,211 @@
+import json
+import os
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# 紧凑结果格式 (.nres)
+# 文件结构: MAGIC | 头部长度 (uint32) | 头部 JSON | 各分区数据块
+# 头部记录元数据 (result_id、时间、耗时等标量字段) 和每个分区的 [偏移, 长度]；
+# 每个顶层字段是一个独立 zlib 压缩的分区，可以只解码需要的部分。
+# 分区内部: JSON 骨架长度 (uint32) | JSON 骨架 | 类型化数组数据，
+# 数值列表以原始二进制存储，字段相同的字典列表按列存储。
+MAGIC = b'NRES\x01'
+RESULT_SUFFIX = '.nres'
+LEGACY_SUFFIX = '.json'
+
+# 保存在头部、无需解压即可读取的字段
+META_FIELDS = ('result_id', 'timestamp', 'source', 'duration', 'type', 'upload_file', 'error', 'chapters_count')
+# 短于该长度的数值列表直接保存为 JSON
+MIN_ARRAY_LENGTH = 4
+
+_ARRAY = '$a'
+_TABLE = '$t'
+_ESCAPED = '$d'
+
+
+def _numeric_dtype(values: List[Any]) -> Optional[str]:
+    if all(type(v) is int for v in values):
+        lo, hi = min(values), max(values)
+        if -2 ** 31 <= lo and hi < 2 ** 31:
+            return '<i4'
+        if -2 ** 63 <= lo and hi < 2 ** 63:
+            return '<i8'
+        return None
+    if all(isinstance(v, float) for v in values):
+        return '<f8'
+    return None
+
+
+class _Encoder:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def array(self, values: List[Any], dtype: str) -> Dict[str, Any]:
+        data = np.asarray(values, dtype=dtype).tobytes()
+        ref = {_ARRAY: [dtype, len(self.buffer), len(values)]}
+        self.buffer += data
+        return ref
+
+    def encode(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            encoded = {k: self.encode(v) for k, v in obj.items()}
+            if len(obj) == 1 and next(iter(obj)) in (_ARRAY, _TABLE, _ESCAPED):
+                return {_ESCAPED: encoded}
+            return encoded
+        if isinstance(obj, (list, tuple)):
+            values = list(obj)
+            if len(values) >= MIN_ARRAY_LENGTH:
+                dtype = _numeric_dtype(values)
+                if dtype:
+                    return self.array(values, dtype)
+            if len(values) >= 2 and all(isinstance(v, dict) for v in values):
+                keys = list(values[0])
+                if keys and all(list(v) == keys for v in values):
+                    # 按列存储：同一列的数值可以合并成一个类型化数组
+                    return {_TABLE: {'keys': keys,
+                                     'columns': [self.encode([v[k] for v in values]) for k in keys]}}
+            return [self.encode(v) for v in values]
+        return obj
+
+
+def _decode(obj: Any, arrays: bytes) -> Any:
+    if isinstance(obj, list):
+        return [_decode(v, arrays) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if len(obj) == 1:
+        marker, value = next(iter(obj.items()))
+        if marker == _ARRAY:
+            dtype, offset, count = value
+            return np.frombuffer(arrays, dtype=dtype, count=count, offset=offset).tolist()
+        if marker == _TABLE:
+            columns = [_decode(c, arrays) for c in value['columns']]
+            return [dict(zip(value['keys'], row)) for row in zip(*columns)]
+        if marker == _ESCAPED:
+            return {k: _decode(v, arrays) for k, v in value.items()}
+    return {k: _decode(v, arrays) for k, v in obj.items()}
+
+
+def encode_section(value: Any) -> bytes:
+    encoder = _Encoder()
+    skeleton = json.dumps(encoder.encode(value), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(struct.pack('<I', len(skeleton)) + skeleton + bytes(encoder.buffer))
+
+
+def decode_section(blob: bytes) -> Any:
+    raw = zlib.decompress(blob)
+    length = struct.unpack_from('<I', raw)[0]
+    skeleton = json.loads(raw[4:4 + length].decode('utf-8'))
+    return _decode(skeleton, raw[4 + length:])
+
+
+def write_result(path: str, result: Dict[str, Any]):
+    """以紧凑格式写入分析结果 (先写临时文件再替换，避免读到半个文件)"""
+    meta = {k: result[k] for k in META_FIELDS if k in result}
+    sections = [(k, encode_section(v)) for k, v in result.items() if k not in meta]
+
+    offset = 0
+    index = {}
+    for key, blob in sections:
+        index[key] = [offset, len(blob)]
+        offset += len(blob)
+    # 保留原始字段顺序，导出 JSON 时与旧格式一致
+    header = json.dumps({'meta': meta, 'sections': index, 'order': list(result)},
+                        ensure_ascii=False).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for _, blob in sections:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class LazyResult(Mapping):
+    """
+    按需解码的分析结果。
+    元数据字段直接来自头部，其余顶层字段在第一次访问时才读取并解压对应分区。
+    可以像普通字典一样传给模板 (result.plot_analysis 等)。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是有效的结果文件: {path}")
+            length = struct.unpack('<I', f.read(4))[0]
+            header = json.loads(f.read(length).decode('utf-8'))
+        self.meta: Dict[str, Any] = header['meta']
+        self._sections: Dict[str, Tuple[int, int]] = header['sections']
+        self._order: List[str] = header.get('order') or list(self.meta) + list(self._sections)
+        self._data_start = len(MAGIC) + 4 + length
+        self._decoded: Dict[str, Any] = {}
+
+    def section(self, key: str) -> Any:
+        if key in self.meta:
+            return self.meta[key]
+        if key not in self._decoded:
+            offset, length = self._sections[key]
+            with open(self.path, 'rb') as f:
+                f.seek(self._data_start + offset)
+                self._decoded[key] = decode_section(f.read(length))
+        return self._decoded[key]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.meta and key not in self._sections:
+            raise KeyError(key)
+        return self.section(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self.section(key) for key in self._order}
+
+
+def find_result(folder: str, result_id: str) -> Optional[str]:
+    """结果文件路径：优先紧凑格式，兼容旧的 JSON 结果"""
+    for suffix in (RESULT_SUFFIX, LEGACY_SUFFIX):
+        path = os.path.join(folder, f"{result_id}{suffix}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def result_ids(folder: str) -> List[str]:
+    """目录中所有结果的 result_id (两种格式)"""
+    ids = set()
+    for name in os.listdir(folder):
+        stem, suffix = os.path.splitext(name)
+        if suffix in (RESULT_SUFFIX, LEGACY_SUFFIX):
+            ids.add(stem)
+    return sorted(ids)
+
+
+def open_result(path: str) -> Mapping:
+    """紧凑格式返回 LazyResult，旧 JSON 结果整体读入"""
+    if path.endswith(RESULT_SUFFIX):
+        return LazyResult(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_result(path: str) -> Dict[str, Any]:
+    """完整读取结果为普通字典 (用于导出)"""
+    result = open_result(path)
+    return result.to_dict() if isinstance(result, LazyResult) else result
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    """只读取元数据字段"""
+    result = open_result(path)
+    return dict(result.meta) if isinstance(result, LazyResult) else {k: result[k] for k in META_FIELDS if k in result}
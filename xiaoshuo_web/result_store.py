@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from result_format import find_result, open_result, result_ids
+
+# 允许排序的列 (接口参数名 -> 数据库列)
+SORT_COLUMNS = {
+    'date': 'timestamp',
+    'title': 'title COLLATE NOCASE',
+    'type': 'type',
+    'duration': 'duration'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT PRIMARY KEY,
+    title TEXT,
+    type TEXT,
+    source TEXT,
+    timestamp TEXT,
+    duration REAL,
+    chapters INTEGER,
+    total_length INTEGER,
+    error TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_title ON results (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_results_type ON results (type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_duration ON results (duration);
+CREATE TABLE IF NOT EXISTS stage_timings (
+    result_id TEXT,
+    stage TEXT,
+    wall_time REAL,
+    cpu_time REAL,
+    peak_rss_mb REAL,
+    rss_delta_mb REAL,
+    input_chars INTEGER,
+    PRIMARY KEY (result_id, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_stage_timings_stage ON stage_timings (stage);
+"""
+
+# 阶段耗时统计只取最近的若干条
+STAGE_STATS_LIMIT = 1000
+PERCENTILES = (50, 90, 99)
+
+
+def parse_duration(value) -> Optional[float]:
+    """结果中的 duration 形如 "1.23s"，转换为秒数"""
+    if value is None:
+        return None
+    try:
+        return float(str(value).rstrip('s'))
+    except ValueError:
+        return None
+
+
+class ResultStore:
+    """
+    分析结果的元数据索引 (SQLite)。
+    保存结果文件时同步写入一行元数据，历史记录与仪表盘统计只查询该表，
+    不再遍历结果目录、也不读取完整的结果 JSON。
+    """
+
+    def __init__(self, db_path: str, results_folder: str):
+        self.db_path = db_path
+        self.results_folder = results_folder
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row(result: Dict[str, Any], result_id: str, size: int) -> Tuple:
+        info = result.get('novel_info', {})
+        return (result_id, info.get('title', 'Unknown'), result.get('type'), result.get('source'),
+                result.get('timestamp'), parse_duration(result.get('duration')),
+                info.get('total_chapters', 0), info.get('total_length'), result.get('error'), size)
+
+    @staticmethod
+    def _stage_rows(result: Dict[str, Any], result_id: str) -> List[Tuple]:
+        stages = (result.get('profile') or {}).get('stages', {})
+        return [(result_id, stage, r.get('wall_time'), r.get('cpu_time'), r.get('peak_rss_mb'),
+                 r.get('rss_delta_mb'), r.get('input_chars')) for stage, r in stages.items()]
+
+    def add(self, result: Dict[str, Any], size: int = 0):
+        """写入 (或覆盖) 一条结果的元数据及各阶段计量"""
+        with self._lock, self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         self._row(result, result['result_id'], size))
+            conn.executemany('INSERT OR REPLACE INTO stage_timings VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             self._stage_rows(result, result['result_id']))
+
+    def sync(self) -> int:
+        """
+        与结果目录对齐：补录索引中没有的结果文件 (如升级前的历史结果)，移除文件已不存在的条目。
+        只列目录，已索引的文件不会被打开。返回补录的条数。
+        """
+        if not os.path.isdir(self.results_folder):
+            return 0
+        on_disk = set(result_ids(self.results_folder))
+        with self._connect() as conn:
+            indexed = {row[0] for row in conn.execute('SELECT result_id FROM results')}
+
+        rows, stage_rows = [], []
+        for result_id in on_disk - indexed:
+            path = find_result(self.results_folder, result_id)
+            try:
+                # 紧凑格式只解码元数据和 novel_info 分区
+                stored = open_result(path)
+                result = {k: stored[k] for k in ('novel_info', 'type', 'source', 'timestamp', 'duration', 'error',
+                                                 'profile') if k in stored}
+            except (OSError, ValueError, KeyError, zlib.error, struct.error) as e:
+                # 损坏或截断的结果文件不补录，下次同步时仍会跳过
+                print(f"警告: 无法读取结果文件，已跳过索引 ({path}): {e}")
+                continue
+            if not result.get('timestamp'):
+                result['timestamp'] = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            rows.append(self._row(result, result_id, os.path.getsize(path)))
+            stage_rows.extend(self._stage_rows(result, result_id))
+
+        with self._lock, self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.executemany('INSERT OR REPLACE INTO stage_timings VALUES (?, ?, ?, ?, ?, ?, ?)', stage_rows)
+            removed = [(i,) for i in indexed - on_disk]
+            conn.executemany('DELETE FROM results WHERE result_id = ?', removed)
+            conn.executemany('DELETE FROM stage_timings WHERE result_id = ?', removed)
+        return len(rows)
+
+    def query(self, page: int = 1, per_page: int = 20, sort: str = 'date', order: str = 'desc',
+              analysis_type: Optional[str] = None, search: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """分页查询历史记录，返回 (当前页的行, 总条数)"""
+        column = SORT_COLUMNS.get(sort, SORT_COLUMNS['date'])
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        where, params = [], []
+        if analysis_type:
+            where.append('type = ?')
+            params.append(analysis_type)
+        if search:
+            where.append('title LIKE ?')
+            params.append(f"%{search}%")
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+
+        page = max(1, page)
+        per_page = max(1, min(per_page, 100))
+        with self._connect() as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM results {clause}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT * FROM results {clause} ORDER BY {column} {direction}, result_id LIMIT ? OFFSET ?',
+                params + [per_page, (page - 1) * per_page]).fetchall()
+        return [dict(row) for row in rows], total
+
+    def summary(self) -> Dict[str, Any]:
+        """仪表盘统计：总数、成功数、今日数量、平均耗时"""
+        today = datetime.now().date().isoformat()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT COUNT(*), COUNT(*) - COUNT(error), SUM(timestamp >= ?), AVG(duration) FROM results',
+                (today,)).fetchone()
+        total, success, today_count, avg_duration = row
+        return {
+            'total': total,
+            'success': success,
+            'today': today_count or 0,
+            'avg_duration': round(avg_duration, 2) if avg_duration is not None else 0
+        }
+
+    def stage_stats(self, limit: int = STAGE_STATS_LIMIT) -> Dict[str, Any]:
+        """各分析阶段最近 limit 次执行的耗时/内存分位数与平均吞吐量"""
+        with self._connect() as conn:
+            stages = [row[0] for row in conn.execute('SELECT DISTINCT stage FROM stage_timings')]
+            stats = {}
+            for stage in stages:
+                rows = conn.execute('SELECT wall_time, cpu_time, rss_delta_mb, input_chars FROM stage_timings '
+                                    'WHERE stage = ? ORDER BY rowid DESC LIMIT ?', (stage, limit)).fetchall()
+                values = np.array([[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64)
+                wall, cpu, memory, chars = values.T
+                stats[stage] = {
+                    'count': len(rows),
+                    'wall_time': {f'p{q}': round(float(np.nanpercentile(wall, q)), 4) for q in PERCENTILES},
+                    'cpu_time': {f'p{q}': round(float(np.nanpercentile(cpu, q)), 4) for q in PERCENTILES},
+                    'rss_delta_mb': {f'p{q}': round(float(np.nanpercentile(memory, q)), 1) for q in PERCENTILES},
+                    'chars_per_second': int(np.nansum(chars) / max(np.nansum(wall), 1e-9))
+                }
+        return stats
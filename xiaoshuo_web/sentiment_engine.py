@@ -0,0 +1,137 @@
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from document import hash_words, scan_words
+
+_NEGATIONS = ('no', 'not', 'never')
+# "not good" 的极性为 good 的 -0.5 倍 (与 TextBlob/Pattern 一致)
+_NEGATION_FACTOR = -0.5
+
+
+class SentimentScores(NamedTuple):
+    """若干文本区间的情感累加值：极性之和、主观性之和、情感词个数"""
+    polarity: np.ndarray
+    subjectivity: np.ndarray
+    count: np.ndarray
+
+    def group(self, boundaries: Sequence[int]) -> 'SentimentScores':
+        """按起始下标把相邻区间合并 (如按章节或每 N 句)，boundaries 须递增"""
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        if not len(self.count) or not len(boundaries):
+            return SentimentScores(*(np.zeros(len(boundaries)) for _ in range(3)))
+        # 空分组 (起止相同) 的 reduceat 结果是下一个元素，需要清零
+        empty = np.append(boundaries[1:] <= boundaries[:-1], boundaries[-1] >= len(self.count))
+        clipped = np.minimum(boundaries, len(self.count) - 1)
+        grouped = [np.where(empty, 0, np.add.reduceat(a, clipped)) for a in self]
+        return SentimentScores(*grouped)
+
+    def mean(self) -> Tuple[np.ndarray, np.ndarray]:
+        """每个区间的平均极性和主观性 (没有情感词的区间为 0)"""
+        n = np.maximum(self.count, 1)
+        return self.polarity / n, self.subjectivity / n
+
+
+def smooth(values: np.ndarray, weights: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    高斯加权平滑。values 按 weights (情感词个数) 加权，
+    没有情感词的点不会把曲线拉向 0。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if sigma <= 0 or len(values) < 2:
+        return values
+    radius = int(3 * sigma)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    num = np.convolve(values * weights, kernel, mode='same')
+    den = np.convolve(weights, kernel, mode='same')
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+class SentimentEngine:
+    """
+    向量化的词典情感打分。
+    使用 TextBlob (Pattern) 的情感词典，对整段文本一次性完成：
+    按码点数组切词、以多项式哈希作为词 id 批量查词典、处理修饰词 ("very good")
+    与否定词 ("not good")，再按句子区间用 bincount 累加，不再逐段构造 TextBlob。
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, Tuple[float, float, float, bool]]] = None):
+        # lexicon: 词 -> (极性, 主观性, 强度, 是否为修饰词)
+        lexicon = lexicon if lexicon is not None else self.load_lexicon()
+        words = [w for w in lexicon if w.isalpha() and w.isascii()]
+        hashes = hash_words(words)
+        order = np.argsort(hashes)
+        self._hashes = hashes[order]
+        values = np.array([lexicon[w][:3] for w in words], dtype=np.float64).reshape(-1, 3)[order]
+        self._polarity, self._subjectivity, self._intensity = values.T
+        self._modifier = np.array([lexicon[w][3] for w in words], dtype=bool)[order]
+        self._negations = hash_words(list(_NEGATIONS))
+        self._negation_tail = hash_words(["n't"])[0]
+
+    @staticmethod
+    def load_lexicon() -> Dict[str, Tuple[float, float, float, bool]]:
+        from textblob.en import sentiment as pattern_sentiment
+        pattern_sentiment.load()
+        lexicon = {}
+        for word, senses in pattern_sentiment.items():
+            # None 键为各词性的平均值
+            polarity, subjectivity, intensity = senses[None]
+            modifier = any(pos in senses for pos in pattern_sentiment.modifiers)
+            lexicon[word] = (polarity, subjectivity, intensity, modifier)
+        return lexicon
+
+    def assess(self, text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回文本中每个情感评估的 (起始偏移, 极性, 主观性)"""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+        if not text:
+            return empty
+        starts, ends, hashes, tails = scan_words(text)
+        if not len(starts):
+            return empty
+
+        slot = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+        known = self._hashes[slot] == hashes
+        negation = np.isin(hashes, self._negations)
+        # 以 n't 结尾的缩写也是否定词
+        negation |= tails == self._negation_tail
+
+        polarity = np.where(known, self._polarity[slot], 0.0)
+        subjectivity = np.where(known, self._subjectivity[slot], 0.0)
+        intensity = np.where(known, self._intensity[slot], 1.0)
+        modifier = known & self._modifier[slot]
+
+        # 修饰词 + 情感词合并为一个评估 ("very good" = good * very 的强度)
+        merged = np.zeros(len(hashes), dtype=bool)
+        merged[1:] = known[1:] & modifier[:-1]
+        boost = np.ones(len(hashes))
+        boost[1:] = np.where(merged[1:], intensity[:-1], 1.0)
+        polarity = np.clip(polarity * boost, -1.0, 1.0)
+        subjectivity = np.clip(subjectivity * boost, -1.0, 1.0)
+
+        # 否定词作用于紧随其后的评估，可跨越一个单字母词 ("not a good")
+        negated = np.zeros(len(hashes), dtype=bool)
+        negated[1:] = negation[:-1]
+        short = (ends - starts) <= 1
+        negated[2:] |= negation[:-2] & short[1:-1]
+        negated[1:] |= merged[1:] & negated[:-1]
+        polarity = np.where(negated, polarity * _NEGATION_FACTOR, polarity)
+
+        keep = known.copy()
+        keep[:-1] &= ~merged[1:]
+        return starts[keep], polarity[keep], subjectivity[keep]
+
+    def score_spans(self, text: str, spans: np.ndarray) -> SentimentScores:
+        """对文本按区间 (如句子) 累加情感；区间须按起点递增且互不重叠"""
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        positions, polarity, subjectivity = self.assess(text)
+        span = np.searchsorted(spans[:, 0], positions, 'right') - 1
+        valid = (span >= 0) & (positions < spans[np.maximum(span, 0), 1]) if len(spans) else span >= len(span)
+        span, polarity, subjectivity = span[valid], polarity[valid], subjectivity[valid]
+        size = len(spans)
+        return SentimentScores(np.bincount(span, polarity, size), np.bincount(span, subjectivity, size),
+                               np.bincount(span, minlength=size).astype(np.float64))
+
+    def score_text(self, text: str) -> SentimentScores:
+        return self.score_spans(text, np.array([[0, len(text)]]))
@@ -30,7 +30,7 @@ class Dashboard {
             this.currentStats = stats;
 
             this.displayRecentAnalyses(history);
-            this.updateStatistics(history);
+            this.updateStatistics(history, stats);
             this.updateSystemStatus(stats);
         } catch (error) {
             console.error('Error loading data:', error);
@@ -39,7 +39,10 @@ class Dashboard {
 
     async loadAnalysisHistory() {
         try {
-            const response = await fetch('/api/history');
+            // 服务端分页排序，只返回当前页
+            const params = new URLSearchParams({page: this.currentPage, per_page: this.itemsPerPage, sort: 'date'});
+            if (this.filterType !== 'all') params.set('type', this.filterType);
+            const response = await fetch(`/api/history?${params}`);
             if (response.ok) return await response.json();
             return [];
         } catch { return []; }
@@ -61,11 +64,7 @@ class Dashboard {
             return;
         }
 
-        const sorted = history.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-        const startIndex = (this.currentPage - 1) * this.itemsPerPage;
-        const pageItems = sorted.slice(startIndex, startIndex + this.itemsPerPage);
-
-        container.innerHTML = pageItems.map(item => this.getAnalysisItemHTML(item)).join('');
+        container.innerHTML = history.map(item => this.getAnalysisItemHTML(item)).join('');
     }
 
     getEmptyStateHTML() {
@@ -145,16 +144,20 @@ class Dashboard {
         return date.toLocaleDateString();
     }
 
-    updateStatistics(history) {
+    updateStatistics(history, stats) {
         if (!history) return;
 
-        const total = history.length;
-        const successCount = history.filter(item => !item.error).length;
-        const todayCount = history.filter(item => new Date(item.timestamp).toDateString() === new Date().toDateString()).length;
+        let total = history.length;
+        let successCount = history.filter(item => !item.error).length;
+        let todayCount = history.filter(item => new Date(item.timestamp).toDateString() === new Date().toDateString()).length;
 
         // Avg Time 计算
         let avgTimeStr = "0.0s";
-        if (total > 0) {
+        if (stats && stats.history) {
+            // 优先使用服务端基于全部历史记录的统计
+            ({total, success: successCount, today: todayCount} = stats.history);
+            avgTimeStr = stats.history.avg_duration.toFixed(1) + "s";
+        } else if (total > 0) {
             const totalTime = history.reduce((sum, item) => {
                 // 移除 's' 后缀并转浮点
                 const val = parseFloat((item.duration || "0").toString().replace('s', ''));
@@ -184,7 +187,7 @@ class Dashboard {
     // 仅在语言切换时调用，避免闪烁
     updateStatisticsUIOnly() {
         if (this.currentHistory) {
-            this.updateStatistics(this.currentHistory);
+            this.updateStatistics(this.currentHistory, this.currentStats);
             this.displayRecentAnalyses(this.currentHistory);
         }
     }
@@ -201,6 +204,14 @@ class Dashboard {
 
         this.updateProgress('storageProgress', disk.percent);
         this.updateText('storageUsage', `${disk.used.toFixed(1)} GB / ${disk.total.toFixed(1)} GB`);
+
+        // 结果缓存命中情况: 命中 / 未命中 (命中率)
+        if (stats.cache) {
+            const { hits, misses, hit_rate } = stats.cache;
+            const rate = Math.round(hit_rate * 100);
+            this.updateProgress('cacheProgress', rate);
+            this.updateText('cacheUsage', `${hits} / ${misses} (${rate}%)`);
+        }
     }
 
     updateElement(id, value) {
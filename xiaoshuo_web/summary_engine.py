@@ -0,0 +1,121 @@
+from typing import Iterable, List, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from document import hash_words, scan_words
+
+# TextRank (PageRank) 的阻尼系数与迭代收敛条件
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+
+class SummaryEngine:
+    """
+    基于稀疏矩阵的 TextRank 抽取式摘要。
+    所有句子拼接后一次切词，得到 (句子 × 词) 的 TF-IDF 稀疏矩阵；
+    各组 (章节) 的句子相似度矩阵拼成分块对角矩阵，一次幂迭代同时完成所有章节的排序。
+    IDF 按组计算，章节摘要只依赖本章内容，可以按章缓存。
+    """
+
+    def __init__(self, stop_words: Iterable[str], damping: float = DAMPING,
+                 tolerance: float = TOLERANCE, max_iterations: int = MAX_ITERATIONS):
+        self._stop_hashes = np.sort(hash_words(w for w in stop_words if w.isascii()))
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+    def term_matrix(self, sentences: List[str]) -> sparse.csr_matrix:
+        """句子 × 词的词频矩阵 (去除停用词和单字母词)"""
+        # 以换行连接后整体切词，句子边界由长度累加得到
+        lengths = np.fromiter((len(s) + 1 for s in sentences), dtype=np.int64, count=len(sentences))
+        sentence_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        starts, ends, hashes, _ = scan_words("\n".join(sentences))
+        keep = (ends - starts > 1) & ~np.isin(hashes, self._stop_hashes)
+        starts, hashes = starts[keep], hashes[keep]
+        rows = np.searchsorted(sentence_starts, starts, 'right') - 1
+        _, terms = np.unique(hashes, return_inverse=True)
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, terms.ravel())),
+                                   shape=(len(sentences), int(terms.max()) + 1 if len(terms) else 0))
+        matrix.sum_duplicates()
+        return matrix
+
+    @staticmethod
+    def _tfidf(tf: sparse.csr_matrix, group: np.ndarray, sizes: np.ndarray) -> sparse.csr_matrix:
+        # 每组使用独立的词列：同一个词在不同组中是不同的列，
+        # 这样 X @ X.T 直接得到分块对角的相似度矩阵，每列的非零个数即组内文档频率
+        coo = tf.tocoo()
+        row_group = group[coo.row]
+        _, columns = np.unique(row_group.astype(np.int64) * tf.shape[1] + coo.col, return_inverse=True)
+        columns = columns.ravel()
+        df = np.bincount(columns)
+        idf = np.log((1 + sizes[row_group]) / (1 + df[columns])) + 1
+        weights = sparse.csr_matrix((coo.data * idf, (coo.row, columns)),
+                                    shape=(tf.shape[0], len(df)))
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        return sparse.diags(np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)) @ weights
+
+    def rank(self, tf: sparse.csr_matrix, boundaries: Sequence[int]) -> np.ndarray:
+        """
+        各句子的 TextRank 得分。boundaries 为每组第一个句子的下标 (递增)，
+        只有同组的句子之间有边，每组的得分之和为 1。
+        """
+        n = tf.shape[0]
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        if n == 0:
+            return np.zeros(0)
+        group = np.searchsorted(boundaries, np.arange(n), 'right') - 1
+        sizes = np.diff(np.append(boundaries, n))
+        vectors = self._tfidf(tf, group, sizes)
+
+        # 分块对角的余弦相似度矩阵 (去掉自环)
+        similarity = (vectors @ vectors.T).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+
+        # 行归一化为转移矩阵；没有出边的句子把得分均匀分给本组
+        out_weight = np.asarray(similarity.sum(axis=1)).ravel()
+        dangling = out_weight == 0
+        transition = (sparse.diags(np.divide(1, out_weight, out=np.zeros_like(out_weight),
+                                             where=~dangling)) @ similarity).T.tocsr()
+        size_of = sizes[group].astype(np.float64)
+        teleport = (1 - self.damping) / size_of
+        scores = 1 / size_of
+        for _ in range(self.max_iterations):
+            leaked = np.bincount(group, scores * dangling, len(sizes))[group] / size_of
+            updated = teleport + self.damping * (transition @ scores + leaked)
+            converged = np.abs(updated - scores).sum() < self.tolerance * len(sizes)
+            scores = updated
+            if converged:
+                break
+        return scores
+
+    @staticmethod
+    def select(scores: np.ndarray, boundaries: Sequence[int], count: int) -> List[List[int]]:
+        """每组得分最高的 count 个句子 (组内下标，按原文顺序)"""
+        n = len(scores)
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        group = np.searchsorted(boundaries, np.arange(n), 'right') - 1
+        # 按 (组, 得分降序) 排序后取每组的前 count 个
+        order = np.lexsort((-scores, group))
+        rank = np.arange(n) - boundaries[group[order]]
+        chosen = np.sort(order[rank < count])
+        selected = [[] for _ in boundaries]
+        for i in chosen.tolist():
+            g = group[i]
+            selected[g].append(i - int(boundaries[g]))
+        return selected
+
+    def summarize_groups(self, groups: List[List[str]], count: int) -> List[List[str]]:
+        """对每组句子 (如每章) 分别抽取 count 句摘要，所有组共用一次切词和一次迭代"""
+        sizes = [len(g) for g in groups]
+        sentences = [s for g in groups for s in g]
+        if not sentences:
+            return [[] for _ in groups]
+        boundaries = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+        scores = self.rank(self.term_matrix(sentences), boundaries)
+        return [[g[i] for i in chosen] for g, chosen in zip(groups, self.select(scores, boundaries, count))]
+
+    def summarize(self, sentences: List[str], count: int) -> List[str]:
+        return self.summarize_groups([sentences], count)[0]
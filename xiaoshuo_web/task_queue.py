@@ -0,0 +1,151 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """等待队列已满，拒绝新任务"""
+
+
+class AnalysisTaskQueue:
+    """
+    有界的后台分析任务队列。
+    任务提交后立即返回 task_id，由固定大小的线程池依次执行；
+    执行函数通过 report(stage, progress) 回调上报真实进度，
+    通过 publish(task_id, name, data) 发布阶段性结果，events() 供订阅方 (SSE) 等待新事件。
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20, retention: int = 3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # 已结束任务在内存中保留的秒数
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        # 运行中任务已发布的事件 [(序号, 名称, 数据)]，任务结束后清除 (完整结果已写入结果文件)
+        self._events: Dict[str, List[Tuple[int, str, Any]]] = {}
+        self._lock = threading.Lock()
+        # 任务状态、进度或事件变化时唤醒等待的订阅方
+        self._changed = threading.Condition(self._lock)
+
+    def submit(self, func: Callable[..., Any], *args, task_id: Optional[str] = None, **kwargs) -> str:
+        """
+        提交任务。func 会收到 task_id 和 report 两个关键字参数，
+        返回值会写入任务记录的 result 字段。
+        """
+        task_id = task_id or str(uuid.uuid4())
+        with self._lock:
+            self._prune()
+            if self._count('queued') >= self.max_pending:
+                raise QueueFullError("分析队列已满，请稍后再试")
+            self._tasks[task_id] = {
+                'task_id': task_id,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0,
+                'error': None,
+                'result': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+            }
+
+        self._executor.submit(self._run, task_id, func, args, kwargs)
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task else None
+
+    def update(self, task_id: str, **fields):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task:
+                task.update(fields)
+                if task['status'] in ('completed', 'failed'):
+                    self._events.pop(task_id, None)
+                self._changed.notify_all()
+
+    def publish(self, task_id: str, name: str, data: Any):
+        """发布运行中任务的一个事件 (如某个分析阶段的结果)"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task and task['status'] == 'processing':
+                events = self._events.setdefault(task_id, [])
+                events.append((len(events) + 1, name, data))
+                self._changed.notify_all()
+
+    def events(self, task_id: str, after: int = 0, progress: Optional[Tuple[str, int]] = None,
+               timeout: float = 15) -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, str, Any]]]:
+        """
+        等待序号 after 之后的新事件，返回 (任务记录副本, 新事件)。
+        progress 为订阅方已知的 (阶段, 进度)；进度变化、任务结束或超时也会返回。任务不存在时返回 (None, [])
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                task = self._tasks.get(task_id)
+                if task is None:
+                    return None, []
+                events = [e for e in self._events.get(task_id, ()) if e[0] > after]
+                remaining = deadline - time.monotonic()
+                if (events or task['status'] in ('completed', 'failed') or remaining <= 0
+                        or (task['stage'], task['progress']) != progress):
+                    return dict(task), events
+                self._changed.wait(remaining)
+
+    @property
+    def queue_size(self) -> int:
+        with self._lock:
+            return self._count('queued')
+
+    @property
+    def running(self) -> int:
+        with self._lock:
+            return self._count('processing')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'queue_size': self._count('queued'),
+                'running': self._count('processing'),
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, task_id: str, func: Callable[..., Any], args: tuple, kwargs: dict):
+        self.update(task_id, status='processing', stage='starting', started_at=time.time())
+
+        def report(stage: str, progress: int):
+            # 进度只增不减，完成状态由队列自己写入
+            with self._lock:
+                task = self._tasks.get(task_id)
+                if task and task['status'] == 'processing':
+                    task['stage'] = stage
+                    task['progress'] = max(task['progress'], min(99, int(progress)))
+                    self._changed.notify_all()
+
+        try:
+            result = func(*args, task_id=task_id, report=report, **kwargs)
+            self.update(task_id, status='completed', stage='done', progress=100,
+                        result=result, finished_at=time.time())
+        except Exception as e:
+            self.update(task_id, status='failed', error=str(e), finished_at=time.time())
+
+    def _count(self, status: str) -> int:
+        return sum(1 for t in self._tasks.values() if t['status'] == status)
+
+    def _prune(self):
+        # 清理过期的已结束任务，避免内存无限增长
+        now = time.time()
+        expired = [tid for tid, t in self._tasks.items()
+                   if t['finished_at'] and now - t['finished_at'] > self.retention]
+        for tid in expired:
+            del self._tasks[tid]
+            self._events.pop(tid, None)
@@ -0,0 +1,98 @@
+"""
+异步爬虫测试：在本地临时端口启动 http.server 提供 fixtures/crawler 下的页面，
+检查目录页并发抓取、"下一章" 链接跟随以及过期缓存的条件请求 (304)。
+
+    python -m pytest -q tests
+"""
+import functools
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_crawler import AIOHTTP_AVAILABLE, AsyncCrawler  # noqa: E402
+from crawl_cache import CrawlCache  # noqa: E402
+from extractor import EXTRACTOR_VERSION, extract_page  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'crawler')
+MARKERS = ['MARKER-ONE', 'MARKER-TWO', 'MARKER-THREE']
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """提供 fixture 页面，记录每个请求的 (路径, 状态码)"""
+
+    def send_response(self, code, message=None):
+        self.server.log.append((self.path, code))
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipUnless(AIOHTTP_AVAILABLE, 'aiohttp 未安装')
+class AsyncCrawlerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(FixtureHandler, directory=FIXTURES))
+        cls.server.log = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    def setUp(self):
+        self.server.log.clear()
+        self.parse = functools.partial(extract_page, is_news=False)
+
+    def crawl(self, path, cache=None):
+        crawler = AsyncCrawler(delay=0, cache=cache)
+        try:
+            return crawler.crawl(self.base + path, self.parse)
+        finally:
+            crawler.close()
+
+    def assertChapterOrder(self, chapters):
+        self.assertEqual(len(chapters), len(MARKERS))
+        for chapter, marker in zip(chapters, MARKERS):
+            self.assertIn(marker, chapter)
+
+    def test_toc_fans_out_in_toc_order(self):
+        title, chapters = self.crawl('toc.html')
+        self.assertEqual(title, 'The Lantern Keeper')
+        self.assertChapterOrder(chapters)
+        self.assertEqual(sorted(path for path, _ in self.server.log),
+                         ['/chapter1.html', '/chapter2.html', '/chapter3.html', '/toc.html'])
+
+    def test_follows_next_chapter_links(self):
+        title, chapters = self.crawl('chapter1.html')
+        self.assertEqual(title, 'The Lantern Keeper - Chapter 1')
+        self.assertChapterOrder(chapters)
+        self.assertEqual([path for path, _ in self.server.log],
+                         ['/chapter1.html', '/chapter2.html', '/chapter3.html'])
+
+    def test_stale_cache_revalidates_with_304(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # ttl=0：缓存条目立即过期，再次抓取时发送 If-Modified-Since
+            cache = CrawlCache(os.path.join(tmp, 'crawl_cache.db'), EXTRACTOR_VERSION, ttl=0)
+            _, first = self.crawl('toc.html', cache)
+            self.assertTrue(all(code == 200 for _, code in self.server.log))
+
+            self.server.log.clear()
+            _, second = self.crawl('toc.html', cache)
+            self.assertEqual(second, first)
+            self.assertChapterOrder(second)
+            self.assertEqual([code for _, code in self.server.log], [304] * 4)
+            self.assertEqual(cache.revalidated, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
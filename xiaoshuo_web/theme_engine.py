@@ -0,0 +1,112 @@
+import hashlib
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+from embedding_cache import EmbeddingCache
+
+# 嵌入模型每批处理的文本数
+EMBED_BATCH_SIZE = 256
+# 参与嵌入打分的候选短语数 (按覆盖的文本块数预筛选)
+CANDIDATE_LIMIT = 500
+# 进入多样性筛选的高分候选数与最终输出数
+NR_CANDIDATES = 20
+TOP_N = 8
+# MMR 多样性系数 (0 只看相关性，1 只看差异)
+DIVERSITY = 0.5
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ThemeEngine:
+    """
+    基于 KeyBERT 嵌入模型的整本书主题提取。
+    全书切成若干文本块，候选短语在所有块上一次统计；
+    文本块与候选短语分批嵌入，短语向量按短语缓存到磁盘，文本块向量按内容哈希缓存。
+    每个候选的得分为它出现的各块与其嵌入相似度之和 (按块数归一)，
+    再用 MMR 从高分候选中选出差异较大的主题词。
+    """
+
+    def __init__(self, embed: Callable[[List[str]], np.ndarray], stop_words: Iterable[str],
+                 cache: Optional[EmbeddingCache] = None, batch_size: int = EMBED_BATCH_SIZE,
+                 candidate_limit: int = CANDIDATE_LIMIT):
+        self.embed = embed
+        self.stop_words = set(stop_words)
+        self.cache = cache
+        self.batch_size = batch_size
+        self.candidate_limit = candidate_limit
+
+    def _embed(self, texts: List[str], keys: List[str]) -> Tuple[np.ndarray, int]:
+        """嵌入一组文本，先查缓存，未命中的分批送入模型后写回。返回 (向量, 实际嵌入的条数)"""
+        cached = self.cache.get(keys) if self.cache else {}
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        computed = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = np.asarray(self.embed([texts[i] for i in batch]), dtype=np.float32)
+            computed.update((keys[i], vector) for i, vector in zip(batch, vectors))
+        if self.cache:
+            self.cache.put(computed)
+        vectors = np.stack([cached[key] if key in cached else computed[key] for key in keys])
+        return vectors, len(missing)
+
+    def _candidates(self, chunks: List[str]):
+        vectorizer = CountVectorizer(ngram_range=(1, 2), stop_words='english')
+        presence = vectorizer.fit_transform(chunks).tocsc()
+        presence.data[:] = 1
+        phrases = vectorizer.get_feature_names_out()
+        # 过滤含停用词 (含小说常见噪音词)、过短或以数字开头的短语
+        valid = np.array([len(p) > 3 and not p[0].isdigit() and not any(w in self.stop_words for w in p.split())
+                          for p in phrases], dtype=bool)
+        coverage = np.asarray(presence.sum(axis=0)).ravel() * valid
+        top = np.argsort(-coverage, kind='stable')[:self.candidate_limit]
+        top = top[coverage[top] > 0]
+        return [str(phrases[i]) for i in top], presence[:, top]
+
+    @staticmethod
+    def _mmr(scores: np.ndarray, vectors: np.ndarray, top_n: int, diversity: float) -> List[int]:
+        """最大边际相关性：每次选取与已选结果最不相似、自身得分又高的候选"""
+        selected = [int(np.argmax(scores))]
+        similarity = vectors @ vectors.T
+        while len(selected) < min(top_n, len(scores)):
+            remaining = np.setdiff1d(np.arange(len(scores)), selected)
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            mmr = (1 - diversity) * scores[remaining] - diversity * redundancy
+            selected.append(int(remaining[np.argmax(mmr)]))
+        return selected
+
+    def extract(self, chunks: List[str], top_n: int = TOP_N, nr_candidates: int = NR_CANDIDATES,
+                diversity: float = DIVERSITY) -> Tuple[List[Tuple[str, float]], Dict[str, Any]]:
+        """返回 ([(主题短语, 得分)], 各阶段耗时与嵌入统计)"""
+        timings = {}
+        start = time.time()
+        chunks = [c for c in chunks if c.strip()]
+        phrases, presence = self._candidates(chunks) if chunks else ([], None)
+        timings['candidates'] = round(time.time() - start, 3)
+        if not phrases:
+            return [], {'timings': timings, 'chunks': len(chunks), 'candidates': 0, 'embedded': 0}
+
+        start = time.time()
+        chunk_keys = ['chunk:' + hashlib.sha1(c.encode('utf-8')).hexdigest() for c in chunks]
+        chunk_vectors, embedded_chunks = self._embed(chunks, chunk_keys)
+        phrase_vectors, embedded_phrases = self._embed(phrases, phrases)
+        timings['embedding'] = round(time.time() - start, 3)
+
+        start = time.time()
+        chunk_vectors = _normalize(chunk_vectors)
+        phrase_vectors = _normalize(phrase_vectors)
+        similarity = chunk_vectors @ phrase_vectors.T
+        # 只在短语实际出现的块上累计相似度
+        scores = np.asarray(presence.multiply(similarity).sum(axis=0)).ravel() / len(chunks)
+        top = np.argsort(-scores)[:nr_candidates]
+        chosen = top[self._mmr(scores[top], phrase_vectors[top], top_n, diversity)]
+        timings['scoring'] = round(time.time() - start, 3)
+
+        keywords = [(phrases[i], round(float(scores[i]), 4)) for i in chosen]
+        return keywords, {'timings': timings, 'chunks': len(chunks), 'candidates': len(phrases),
+                          'embedded': embedded_chunks + embedded_phrases}